@@ -1,8 +1,9 @@
 # app/__init__.py
 from flask_sqlalchemy import SQLAlchemy
+from app.utils.sqlite_profile import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # IMPORT MODELS HERE - This is needed for Flask-Migrate to detect them
-from app.models import Folder, Image
+from app.models import Folder, Image, Blob, UploadSession, Job, NoteRevision, JournalState
 
@@ -1,27 +1,77 @@
 # app/models.py
 from app import db
+from app.utils.blob_store import BLOB_DIR, blob_relpath, normalize_ext
+from app.utils.image_service import build_srcset
 from datetime import datetime
+import uuid
+from itertools import chain
+from sqlalchemy.orm import Session
 
 class Folder(db.Model):
     __tablename__ = 'folders'
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD
+    # One folder per day; DATE is still stored as 'YYYY-MM-DD' text in SQLite,
+    # so range scans on the unique index work for months and years
+    date = db.Column(db.Date, nullable=False, unique=True, index=True)
     notes_html = db.Column(db.Text, default='')
+    notes_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    notes_hash = db.Column(db.String(64))  # sha256 of notes_html, for no-op save detection
+    # Blob urls embedded in the notes; each entry holds one reference on its blob
+    notes_images = db.Column(db.JSON, default=list)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set to the journal version on every write to the folder or any of its
+    # images, so it only ever goes up; used as the ETag
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     images = db.relationship('Image', backref='folder', cascade='all, delete-orphan', lazy=True)
+    note_revisions = db.relationship('NoteRevision', backref='folder', cascade='all, delete-orphan',
+                                     lazy='dynamic', order_by='NoteRevision.revision')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, image_count=None, include_notes=True):
+        if image_count is None:
+            # COUNT(*) instead of len(self.images), which would load every Image row
+            image_count = db.session.query(db.func.count(Image.id)).filter(Image.folder_id == self.id).scalar()
+        data = {
             'id': self.id,
-            'date': self.date,
-            'notes_html': self.notes_html or '',
+            'date': self.date.isoformat(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'image_count': len(self.images)
+            'image_count': image_count
         }
+        if include_notes:
+            data['notes_html'] = self.notes_html or ''
+            data['notes_revision'] = self.notes_revision or 0
+        return data
+    
+    @classmethod
+    def list_with_image_counts(cls, summary=False, limit=None, before=None, between=None):
+        """Folders newest first, with image counts in the same single query.
+        
+        summary=True leaves notes_html out of both the SELECT and the dicts.
+        limit/before page through the list by (date, id) keyset, so any page
+        is an index range scan no matter how deep it is; before is the
+        (date, id) of the last folder on the previous page. between is a
+        half-open (start, end) date range, see utils.dates.date_range.
+        """
+        # Correlated COUNT rather than JOIN + GROUP BY so only the folders
+        # on the requested page get counted
+        image_count = (db.select(db.func.count(Image.id))
+                       .where(Image.folder_id == cls.id)
+                       .scalar_subquery())
+        query = (db.session.query(cls, image_count)
+                 .order_by(cls.date.desc(), cls.id.desc()))
+        if summary:
+            query = query.options(db.load_only(cls.id, cls.date, cls.created_at, cls.updated_at))
+        if before is not None:
+            query = query.filter(db.tuple_(cls.date, cls.id) < before)
+        if between is not None:
+            query = query.filter(cls.date >= between[0], cls.date < between[1])
+        if limit is not None:
+            query = query.limit(limit)
+        return [folder.to_dict(image_count=count, include_notes=not summary)
+                for folder, count in query.all()]
 
 class Image(db.Model):
     __tablename__ = 'images'
@@ -32,13 +82,356 @@ class Image(db.Model):
     url = db.Column(db.String(500), nullable=False)
     folder_id = db.Column(db.Integer, db.ForeignKey('folders.id'), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    variants = db.Column(db.JSON, default=dict)  # {"thumb": {"url", "width", "height"}, ...}
+    # NULL for uploads made before the blob store, which live flat in uploads/
+    blob_hash = db.Column(db.String(64), db.ForeignKey('blobs.hash'), nullable=True, index=True)
+    # pending -> ready/failed while the background job builds derivatives
+    processing_status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    # Filled by the image job (dimensions already at upload); NULL until then
+    # or when the file can't be decoded
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    byte_size = db.Column(db.Integer)
+    mime_type = db.Column(db.String(50))
+    taken_at = db.Column(db.DateTime)  # EXIF capture time
+    dominant_color = db.Column(db.String(7))  # "#rrggbb"
+    # ~20px WebP data: URI, inlined in the JSON so tiles paint before loading
+    placeholder = db.Column(db.Text)
+    METADATA_FIELDS = ('width', 'height', 'byte_size', 'mime_type', 'taken_at', 'dominant_color',
+                       'placeholder')
+
+    # Gallery query: WHERE folder_id = ? ORDER BY uploaded_at, straight off the index
+    __table_args__ = (db.Index('ix_images_folder_id_uploaded_at', 'folder_id', 'uploaded_at'),)
     
     def to_dict(self):
+        variants = self.variants or {}
         return {
             'id': self.id,
             'filename': self.filename,
             'original_filename': self.original_filename,
             'url': self.url,
+            'thumb_url': variants.get('thumb', {}).get('url', self.url),
+            'srcset': build_srcset(variants),
+            'variants': variants,
+            'processing_status': self.processing_status,
+            'width': self.width,
+            'height': self.height,
+            'byte_size': self.byte_size,
+            'mime_type': self.mime_type,
+            'taken_at': self.taken_at.isoformat() if self.taken_at else None,
+            'dominant_color': self.dominant_color,
+            'placeholder': self.placeholder,
             'folder_id': self.folder_id,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None
-        }
\ No newline at end of file
+        }
+
+
+class Blob(db.Model):
+    """Stored bytes keyed by SHA-256, shared by every Image with the same content."""
+    __tablename__ = 'blobs'
+    
+    hash = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), nullable=False)  # relative to UPLOAD_FOLDER
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    # Set when ref_count drops to 0; the storage collector deletes the blob
+    # once this is older than its grace period (see app/utils/storage_gc.py)
+    unreferenced_at = db.Column(db.DateTime, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def url(self):
+        return '/uploads/' + self.path
+    
+    @staticmethod
+    def hash_from_url(url):
+        """The digest in a blob url (/uploads/blobs/ab/cd/<digest>.ext), else None."""
+        prefix = '/uploads/' + BLOB_DIR + '/'
+        if not isinstance(url, str) or not url.startswith(prefix):
+            return None
+        digest = url.rsplit('/', 1)[1].split('.', 1)[0]
+        return digest if len(digest) == 64 else None
+    
+    @classmethod
+    def store(cls, store, stream, filename):
+        """Write stream into the blob store; returns (blob, created).
+        
+        Bytes that are already stored only cost the hashing pass: the temp
+        copy is dropped and the existing blob is returned.
+        """
+        digest, size, temp_path = store.write_temp(stream)
+        return cls.from_temp(store, digest, size, temp_path, filename)
+    
+    @classmethod
+    def from_temp(cls, store, digest, size, temp_path, filename):
+        blob = db.session.get(cls, digest)
+        if blob is not None:
+            store.discard(temp_path)
+            return blob, False
+        blob = cls(hash=digest, path=blob_relpath(digest, normalize_ext(filename)), size=size, ref_count=0)
+        store.adopt(temp_path, blob.path)
+        db.session.add(blob)
+        return blob, True
+
+
+class UploadSession(db.Model):
+    """A resumable chunked upload; chunks are appended to temp_path in order."""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    folder_id = db.Column(db.Integer, db.ForeignKey('folders.id', ondelete='CASCADE'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger)  # optional, checked on complete
+    next_chunk = db.Column(db.Integer, nullable=False, default=0)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    temp_path = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'folder_id': self.folder_id,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'next_chunk': self.next_chunk,
+            'received_bytes': self.received_bytes,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class Job(db.Model):
+    """A unit of background work; see app/utils/jobs.py."""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued/running/done/failed
+    run_after = db.Column(db.DateTime)  # not claimed before this time; NULL = right away
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class NoteRevision(db.Model):
+    """One entry of a folder's notes history.
+    
+    Snapshots hold the full zlib-compressed HTML; every other revision holds
+    a compressed splice against the revision before it. snapshot_revision
+    and chain_bytes describe the chain back to the last snapshot, which is
+    what decides when to start a new one (see app/utils/notes.py).
+    """
+    __tablename__ = 'note_revisions'
+    __table_args__ = (db.UniqueConstraint('folder_id', 'revision'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    folder_id = db.Column(db.Integer, db.ForeignKey('folders.id', ondelete='CASCADE'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    snapshot_revision = db.Column(db.Integer, nullable=False)
+    chain_bytes = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'revision': self.revision,
+            'is_snapshot': self.is_snapshot,
+            'size': len(self.data),
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class JournalState(db.Model):
+    """Single row whose version is bumped on every folder or image write."""
+    __tablename__ = 'journal_state'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # Identifies this database to change feed clients: a restore into a new
+    # database starts seq over, so their cursors must not carry across
+    feed_id = db.Column(db.String(32), default=lambda: uuid.uuid4().hex)
+    
+    @classmethod
+    def current_version(cls):
+        return db.session.query(cls.version).filter_by(id=1).scalar() or 0
+    
+    @classmethod
+    def current_feed_id(cls):
+        return db.session.query(cls.feed_id).filter_by(id=1).scalar()
+
+
+class Change(db.Model):
+    """The latest change to each folder and image, in commit order.
+    
+    Every write replaces the entity's row with a new one, so seq only grows
+    and GET /api/changes; returns one row per entity changed since the
+    client's cursor, however many edits that was. Deletes leave a row with
+    deleted=True (a tombstone). AUTOINCREMENT keeps SQLite from handing out
+    a seq again after the row holding it is replaced.
+    """
+    __tablename__ = 'changes'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'entity_id', name='uq_changes_kind_entity_id'),
+        {'sqlite_autoincrement': True},
+    )
+    
+    seq = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # folder / image
+    entity_id = db.Column(db.Integer, nullable=False)
+    folder_id = db.Column(db.Integer)  # the folder itself, or the image's folder
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @classmethod
+    def latest_seq(cls):
+        return db.session.query(db.func.max(cls.seq)).scalar() or 0
+
+
+# ===== VERSION COUNTERS =====
+# Folder.version and JournalState.version back the ETags on the JSON
+# endpoints, so they have to move on every write path. Doing it at flush
+# time means no route can forget to bump them. A written folder takes the
+# journal's new version rather than its own + 1: SQLite reuses the rowid of
+# a deleted newest folder, and a fresh count from 1 would hand the new folder
+# the ETags of the old one.
+
+@db.event.listens_for(Session, 'before_flush')
+def _collect_journal_changes(session, flush_context, instances):
+    touched = session.info.setdefault('touched_folder_ids', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, Folder):
+            folder_id = obj.id
+            if folder_id is not None and obj not in session.deleted:
+                touched.add(folder_id)
+            elif obj in session.new:
+                session.info.setdefault('new_folders', []).append(obj)
+        elif isinstance(obj, Image):
+            folder_id = obj.folder_id if obj.folder_id is not None else getattr(obj.folder, 'id', None)
+            if folder_id is not None:
+                touched.add(folder_id)
+        else:
+            continue
+        session.info['journal_changed'] = True
+        session.info.setdefault('feed_objects', {})[obj] = obj in session.deleted
+        # Kept until the transaction ends (deleted folders included), for
+        # the response cache to drop on commit
+        stale = session.info.setdefault('stale_folder_ids', set())
+        if folder_id is not None:
+            stale.add(folder_id)
+
+@db.event.listens_for(Session, 'after_flush')
+def _bump_journal_versions(session, flush_context):
+    if not session.info.pop('journal_changed', False):
+        return
+    folder_ids = session.info.pop('touched_folder_ids', set())
+    folder_ids.update(folder.id for folder in session.info.pop('new_folders', []))
+    conn = session.connection()
+    state = JournalState.__table__
+    bumped = conn.execute(db.update(state).where(state.c.id == 1).values(version=state.c.version + 1))
+    if bumped.rowcount == 0:
+        conn.execute(db.insert(state).values(id=1, version=1))
+    if folder_ids:
+        folders = Folder.__table__
+        version = conn.execute(db.select(state.c.version).where(state.c.id == 1)).scalar()
+        conn.execute(db.update(folders)
+                     .where(folders.c.id.in_(folder_ids))
+                     .values(version=version))
+
+@db.event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    objects = session.info.pop('feed_objects', None)
+    if not objects:
+        return
+    rows = {}  # (kind, id) -> (folder_id, deleted)
+    for obj, deleted in objects.items():
+        if isinstance(obj, Folder):
+            rows[('folder', obj.id)] = (obj.id, deleted)
+        else:
+            rows[('image', obj.id)] = (obj.folder_id, deleted)
+            if obj.folder_id is not None:
+                # Its folder's image_count moved too (unless the folder is gone)
+                rows.setdefault(('folder', obj.folder_id), (obj.folder_id, False))
+    changes = Change.__table__
+    conn = session.connection()
+    conn.execute(db.delete(changes).where(changes.c.kind == db.bindparam('k'),
+                                          changes.c.entity_id == db.bindparam('i')),
+                 [{'k': kind, 'i': entity_id} for kind, entity_id in rows])
+    now = datetime.utcnow()
+    inserted = conn.execute(db.insert(changes).returning(changes.c.seq, sort_by_parameter_order=True),
+                            [{'kind': kind, 'entity_id': entity_id, 'folder_id': folder_id,
+                              'deleted': deleted, 'changed_at': now}
+                             for (kind, entity_id), (folder_id, deleted) in rows.items()])
+    # (seq, kind, id, folder_id, deleted) for the live event stream, which
+    # publishes them on commit (app/utils/events.py)
+    session.info.setdefault('flushed_changes', []).extend(
+        (seq, kind, entity_id, folder_id, deleted)
+        for seq, ((kind, entity_id), (folder_id, deleted)) in zip(inserted.scalars(), rows.items()))
+
+
+# Blob.ref_count follows the Image rows pointing at it, including images
+# removed by the Folder delete cascade, and the urls in Folder.notes_images,
+# so it is maintained at flush time too. Nothing is deleted here: a blob that
+# drops to 0 only gets unreferenced_at, and the storage collector removes it.
+
+def _notes_image_hashes(urls):
+    return [h for h in map(Blob.hash_from_url, urls or []) if h]
+
+@db.event.listens_for(Session, 'before_flush')
+def _collect_blob_refs(session, flush_context, instances):
+    deltas = session.info.setdefault('blob_ref_deltas', {})
+    def add(blob_hash, delta):
+        deltas[blob_hash] = deltas.get(blob_hash, 0) + delta
+    for obj in session.new:
+        if isinstance(obj, Image) and obj.blob_hash:
+            add(obj.blob_hash, 1)
+        elif isinstance(obj, Folder):
+            for blob_hash in _notes_image_hashes(obj.notes_images):
+                add(blob_hash, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Image) and obj.blob_hash:
+            add(obj.blob_hash, -1)
+        elif isinstance(obj, Folder):
+            history = db.inspect(obj).attrs.notes_images.history
+            for blob_hash in _notes_image_hashes(history.deleted[0] if history.deleted else obj.notes_images):
+                add(blob_hash, -1)
+    for obj in session.dirty:
+        if isinstance(obj, Folder) and obj not in session.deleted:
+            history = db.inspect(obj).attrs.notes_images.history
+            if history.added or history.deleted:
+                for blob_hash in _notes_image_hashes(history.added[0] if history.added else None):
+                    add(blob_hash, 1)
+                for blob_hash in _notes_image_hashes(history.deleted[0] if history.deleted else None):
+                    add(blob_hash, -1)
+
+@db.event.listens_for(Session, 'after_flush')
+def _apply_blob_refs(session, flush_context):
+    deltas = session.info.pop('blob_ref_deltas', {})
+    blobs = Blob.__table__
+    conn = session.connection()
+    now = datetime.utcnow()
+    for blob_hash, delta in deltas.items():
+        if not delta:
+            continue
+        updated = conn.execute(db.update(blobs)
+                               .where(blobs.c.hash == blob_hash)
+                               .values(ref_count=blobs.c.ref_count + delta,
+                                       unreferenced_at=db.case((blobs.c.ref_count + delta <= 0, now),
+                                                               else_=None)))
+        if updated.rowcount == 0 and delta > 0:
+            # The collector deleted it between our lookup and this flush
+            raise RuntimeError(f'Blob {blob_hash} was garbage-collected, retry the upload')
@@ -1,31 +1,35 @@
 from flask import Blueprint, request, jsonify
 from .. import db
-from ..models import Folder, Image
+from ..models import Folder
+from ..utils.dates import parse_date
 from ..utils.file_service import allowed_file, save_uploaded_file
-import os
+from ..utils.notes import set_notes
 
 bp = Blueprint("folders", __name__)
 
 def ensure_folder(date_str):
-    f = Folder.query.filter_by(date=date_str).first()
+    day = parse_date(date_str)
+    f = Folder.query.filter_by(date=day).first()
     if not f:
-        f = Folder(date=date_str, notes_html=None, notes_images=[])
+        f = Folder(date=day, notes_html=None, notes_images=[])
         db.session.add(f)
         db.session.commit()
     return f
 
 @bp.route("", methods=["GET"])
 def list_folders():
-    folders = Folder.query.order_by(Folder.date.desc()).all()
-    return jsonify([f.to_dict() for f in folders]), 200
+    return jsonify(Folder.list_with_image_counts()), 200
 
 @bp.route("/<date_str>", methods=["GET"])
 def get_folder(date_str):
-    folder = Folder.query.filter_by(date=date_str).first()
+    try:
+        folder = Folder.query.filter_by(date=parse_date(date_str)).first()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     if not folder:
         return jsonify({"message": "folder not found"}), 404
     images = [img.to_dict() for img in folder.images]
-    res = folder.to_dict()
+    res = folder.to_dict(image_count=len(images))
     res["images"] = images
     return jsonify(res), 200
 
@@ -35,14 +39,20 @@ def update_notes(date_str):
     html = data.get("notes_html")
     if html is None:
         return jsonify({"message": "notes_html is required"}), 400
-    folder = ensure_folder(date_str)
-    folder.notes_html = html
-    db.session.commit()
+    try:
+        folder = ensure_folder(date_str)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if set_notes(folder, html):
+        db.session.commit()
     return jsonify(folder.to_dict()), 200
 
 @bp.route("/<date_str>/notes/images", methods=["POST"])
 def upload_note_images(date_str):
-    folder = ensure_folder(date_str)
+    try:
+        folder = ensure_folder(date_str)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     if "file" not in request.files:
         return jsonify({"message": "file field required"}), 400
     file = request.files["file"]
@@ -51,10 +61,9 @@ def upload_note_images(date_str):
     if not allowed_file(file.filename):
         return jsonify({"message": "file type not allowed"}), 400
 
-    saved_name, saved_path, url_path = save_uploaded_file(file, os.path.join("notes", date_str))
-    images_list = folder.notes_images or []
-    images_list.append(url_path)
-    folder.notes_images = images_list
+    saved_name, saved_path, url_path = save_uploaded_file(file)
+    # A new list, so the change (and the blob reference) is picked up at flush
+    folder.notes_images = (folder.notes_images or []) + [url_path]
     db.session.commit()
     return jsonify({"url": url_path}), 201
 
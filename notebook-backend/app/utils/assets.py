@@ -0,0 +1,49 @@
+import hashlib
+import mimetypes
+import os
+
+ASSET_URL_PREFIX = "/assets/"
+HASH_LENGTH = 12
+
+
+class AssetManifest:
+    """Frontend files under static/, addressed by a hash of their content.
+
+    css/app.css is served as /assets/css/app.<hash>.css, so the URL changes
+    whenever the file does and the response can be cached forever. Files are
+    read once at startup and kept in memory (they are a few dozen KB), which
+    also lets precompressed_response() compress each of them only once.
+    """
+
+    def __init__(self, directory, names):
+        self.directory = directory
+        self.names = names
+        self.files = {}   # hashed name -> (source name, text)
+        self.urls = {}    # source name -> url
+        self.load()
+
+    def load(self):
+        files, urls = {}, {}
+        for name in self.names:
+            with open(os.path.join(self.directory, *name.split("/")), encoding="utf-8") as f:
+                text = f.read()
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+            stem, ext = os.path.splitext(name)
+            hashed = f"{stem}.{digest}{ext}"
+            files[hashed] = (name, text)
+            urls[name] = ASSET_URL_PREFIX + hashed
+        self.files, self.urls = files, urls
+
+    def paths(self):
+        return [os.path.join(self.directory, *name.split("/")) for name in self.names]
+
+    def url(self, name):
+        return self.urls[name]
+
+    def get(self, hashed):
+        """(text, mimetype) for a hashed name, or None if it isn't current."""
+        entry = self.files.get(hashed)
+        if entry is None:
+            return None
+        name, text = entry
+        return text, mimetypes.guess_type(name)[0] or "application/octet-stream"
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tempfile
+
+BLOB_DIR = "blobs"
+CHUNK_SIZE = 1024 * 1024
+
+# Same bytes under a different spelling of the extension still share one blob
+EXT_ALIASES = {".jpeg": ".jpg"}
+
+
+def normalize_ext(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return EXT_ALIASES.get(ext, ext)
+
+
+def blob_relpath(digest, ext):
+    """blobs/ab/cd/abcd...ef.jpg - two levels of 256 shards keeps every
+    directory small even with millions of uploads."""
+    return "/".join((BLOB_DIR, digest[:2], digest[2:4], digest + ext))
+
+
+class BlobStore:
+    """Content-addressed files under <root>/blobs, named by SHA-256.
+
+    Writes go to a temp file in the same tree (hashing as they stream) and
+    are renamed into place, so a blob path only ever holds complete bytes.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, BLOB_DIR, "tmp")
+
+    def path(self, relpath):
+        return os.path.join(self.root, *relpath.split("/"))
+
+    def new_temp(self, prefix="tmp"):
+        """Create an empty temp file inside the store (same filesystem as the
+        blobs, so adopt() is an atomic rename). Returns its path."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.tmp_dir, prefix=prefix)
+        os.close(fd)
+        return temp_path
+
+    def write_temp(self, stream):
+        """Copy stream to a temp file. Returns (digest, size, temp_path)."""
+        sha = hashlib.sha256()
+        size = 0
+        temp_path = self.new_temp()
+        try:
+            with open(temp_path, "wb") as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+        except BaseException:
+            self.discard(temp_path)
+            raise
+        return sha.hexdigest(), size, temp_path
+
+    def hash_file(self, path):
+        """(digest, size) of a file already on disk."""
+        sha = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+                size += len(chunk)
+        return sha.hexdigest(), size
+
+    def adopt(self, temp_path, relpath):
+        """Move a fully written temp file to its content address."""
+        final_path = self.path(relpath)
+        if os.path.exists(final_path):
+            self.discard(temp_path)
+            return
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+
+    def discard(self, temp_path):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def remove(self, relpath):
+        try:
+            os.remove(self.path(relpath))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,119 @@
+import zlib
+from functools import lru_cache
+from flask import request, Response
+from .http_cache import ENCODING_SUFFIXES
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip covers every browser anyway
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+COMPRESSIBLE_TYPES = {"text/html", "text/css", "text/plain", "text/javascript",
+                      "application/javascript", "application/json", "image/svg+xml"}
+MIN_COMPRESS_SIZE = 1024        # below this the headers cost more than they save
+GZIP_LEVEL = 6                  # per request; static bodies get the max, once
+BROTLI_QUALITY = 5
+GZIP_WBITS = 31                 # zlib container = gzip
+
+
+def _encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding():
+    """Best encoding the client accepts, or None for identity."""
+    return request.accept_encodings.best_match(_encodings())
+
+
+def _compressor(encoding):
+    """(process, finish) pair for an incremental compressor."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def _compress_chunks(chunks, encoding):
+    process, finish = _compressor(encoding)
+    for chunk in chunks:
+        out = process(chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+def _compress(data, encoding):
+    process, finish = _compressor(encoding)
+    return process(data) + finish()
+
+
+def _tag_encoding(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # Each encoding is a different byte sequence, so it needs its own strong
+    # ETag; http_cache.is_not_modified strips the suffix again
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ENCODING_SUFFIXES[encoding], weak)
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli text responses the client accepts."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or request.method == "HEAD"):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # Generator bodies are compressed as they are produced
+        response.response = _compress_chunks(response.iter_encoded(), encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return response
+        # Already in memory, so compressed in one call; keeps Content-Length
+        response.set_data(_compress(data, encoding))
+    _tag_encoding(response, encoding)
+    return response
+
+
+@lru_cache(maxsize=16)
+def _compress_static(body, encoding):
+    data = body.encode("utf-8")
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def precompressed_response(body, mimetype="text/html", etag=None):
+    """Response for a body that never changes while the process runs.
+
+    Each encoding is compressed once at maximum level and reused, instead of
+    paying for it on every request. etag, if given, gets the same per-encoding
+    suffix as compress_response() would add.
+    """
+    encoding = negotiate_encoding()
+    compress = encoding is not None and len(body) >= MIN_COMPRESS_SIZE
+    response = Response(_compress_static(body, encoding) if compress else body, mimetype=mimetype)
+    if etag:
+        response.set_etag(etag)
+    if compress:
+        _tag_encoding(response, encoding)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
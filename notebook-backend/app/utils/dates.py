@@ -0,0 +1,31 @@
+from datetime import date
+
+
+def parse_date(value):
+    """'YYYY-MM-DD' (or a date) -> date. Raises ValueError for anything else.
+
+    Unpadded parts like '2024-4-8' are accepted too, the new-folder prompt is
+    free text and older rows were saved that way.
+    """
+    if isinstance(value, date):
+        return value
+    try:
+        year, month, day = (int(part) for part in value.strip().split("-"))
+        if year < 1000:
+            raise ValueError
+        return date(year, month, day)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD") from None
+
+
+def date_range(year, month=None):
+    """Half-open [start, end) covering a whole year or month.
+
+    Filtering with date >= start AND date < end keeps it an index range scan,
+    unlike strftime() or LIKE on the column.
+    """
+    if month is None:
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
@@ -0,0 +1,155 @@
+import json
+import queue
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import Folder, Image
+
+QUEUE_SIZE = 256            # events a subscriber may fall behind before it gets "resync"
+HEARTBEAT_INTERVAL = 15     # seconds between pings on an idle stream
+MAX_SUBSCRIBERS = 100       # each open stream holds a server thread
+RETRY_MS = 3000             # EventSource reconnect delay
+
+
+def format_event(name, data, event_id=None):
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {name}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def _change_payloads(conn, rows):
+    """Feed-style dicts for flushed (seq, kind, id, folder_id, deleted) rows.
+
+    Runs inside the flush on its connection, so the stream itself never
+    touches the database. Data has the same shape as GET /api/changes;.
+    """
+    wanted = {"folder": set(), "image": set()}
+    for seq, kind, entity_id, folder_id, deleted in rows:
+        if not deleted:
+            wanted[kind].add(entity_id)
+    data = {}
+    folders, images = Folder.__table__, Image.__table__
+    if wanted["folder"]:
+        image_count = (db.select(db.func.count())
+                       .where(images.c.folder_id == folders.c.id)
+                       .scalar_subquery())
+        query = (db.select(folders.c.id, folders.c.date, folders.c.created_at,
+                           folders.c.updated_at, image_count.label("image_count"))
+                 .where(folders.c.id.in_(wanted["folder"])))
+        for row in conn.execute(query).mappings():
+            fields = dict(row)
+            count = fields.pop("image_count")
+            # Transient instance, never added to a session: just reuses to_dict()
+            data[("folder", fields["id"])] = Folder(**fields).to_dict(image_count=count,
+                                                                       include_notes=False)
+    if wanted["image"]:
+        for row in conn.execute(db.select(images).where(images.c.id.in_(wanted["image"]))).mappings():
+            data[("image", row["id"])] = Image(**row).to_dict()
+
+    payloads = []
+    for seq, kind, entity_id, folder_id, deleted in rows:
+        payload = {"seq": seq, "kind": kind, "id": entity_id,
+                   "folder_id": folder_id, "deleted": deleted}
+        if not deleted:
+            payload["data"] = data.get((kind, entity_id))
+            if payload["data"] is None:
+                continue
+        payloads.append(payload)
+    return payloads
+
+
+class Subscription:
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.overflowed = False
+
+
+class EventBroker:
+    """Fans committed folder/image changes out to Server-Sent Events streams.
+
+    Payloads are built during the flush that wrote the change and published
+    after commit, into a bounded queue per subscriber. A subscriber that falls
+    QUEUE_SIZE events behind is sent "resync" instead (it catches up from the
+    change feed), so one slow client can't grow memory. In-process only:
+    writes made by another process show up at the client's next resync.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE, heartbeat=HEARTBEAT_INTERVAL,
+                 max_subscribers=MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """A new Subscription, or None when max_subscribers streams are open."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self.queue_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, payloads):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for payload in payloads:
+                try:
+                    subscription.queue.put_nowait(payload)
+                except queue.Full:
+                    subscription.overflowed = True
+                    break
+
+    def stream(self, subscription):
+        """SSE text for one subscriber, until the client goes away."""
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                while True:
+                    try:
+                        subscription.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                yield format_event("resync", {})
+                continue
+            try:
+                payload = subscription.queue.get(timeout=self.heartbeat)
+            except queue.Empty:
+                # A real event rather than a comment, so the page can tell a
+                # dead connection from a quiet one
+                yield format_event("ping", {})
+                continue
+            yield format_event("change", payload, payload["seq"])
+
+    def listen(self):
+        event.listen(Session, "after_flush", self._after_flush)
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        # Set by models._record_changes, which runs first
+        rows = session.info.pop("flushed_changes", None)
+        if rows and self.subscriber_count():
+            session.info.setdefault("pending_events", []).extend(
+                _change_payloads(session.connection(), rows))
+
+    def _after_commit(self, session):
+        payloads = session.info.pop("pending_events", None)
+        if payloads:
+            self.publish(payloads)
+
+    def _after_rollback(self, session):
+        session.info.pop("pending_events", None)
@@ -1,17 +1,20 @@
-import os
+from flask import current_app
 from werkzeug.utils import secure_filename
+from ..models import Blob
+from .blob_store import BlobStore
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_uploaded_file(file, subfolder):
-    folder_path = os.path.join("uploads", subfolder)
-    os.makedirs(folder_path, exist_ok=True)
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(folder_path, filename)
-    file.save(file_path)
-    url_path = f"/uploads/{subfolder}/{filename}"
-    return filename, file_path, url_path
+def save_uploaded_file(file):
+    """Store an uploaded file in the content-addressed blob store.
 
+    The blob is counted as referenced once its url is saved somewhere that
+    holds a reference (an Image row or folder.notes_images), at flush time.
+    """
+    store = BlobStore(current_app.config.get("UPLOAD_FOLDER", "uploads"))
+    filename = secure_filename(file.filename)
+    blob, created = Blob.store(store, file.stream, filename)
+    return filename, store.path(blob.path), blob.url
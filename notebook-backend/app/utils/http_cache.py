@@ -0,0 +1,43 @@
+import hashlib
+from flask import request, make_response
+
+# Appended to the ETag of compressed responses (see compression.py)
+ENCODING_SUFFIXES = {"gzip": "-gzip", "br": "-br"}
+
+
+def make_etag(*parts):
+    """Build a strong ETag value from version counters / ids."""
+    return "-".join(str(p) for p in parts)
+
+
+def query_fingerprint():
+    """Short hash of the query string, for endpoints whose body depends on it."""
+    if not request.query_string:
+        return "all"
+    return hashlib.sha1(request.query_string).hexdigest()[:10]
+
+
+def _matching_etag(etag):
+    # The client may hold the identity or any compressed variant
+    for candidate in (etag, *(etag + suffix for suffix in ENCODING_SUFFIXES.values())):
+        if candidate in request.if_none_match:
+            return candidate
+    return None
+
+
+def is_not_modified(etag):
+    return _matching_etag(etag) is not None
+
+
+def not_modified(etag):
+    """304 with no body; callers return this before touching the ORM."""
+    response = make_response("", 304)
+    # Echo the variant the client has, so its cached entry keeps matching
+    return with_etag(response, _matching_etag(etag) or etag)
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    # Always revalidate, the ETag check makes that nearly free
+    response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from .. import db
+from ..models import Image
+from .image_service import extract_metadata
+from .storage_gc import URL_PREFIX
+
+BACKFILL_BATCH_SIZE = 200  # images per commit in backfill_metadata()
+
+
+def backfill_metadata(store, batch_size=BACKFILL_BATCH_SIZE, workers=None, redo=False):
+    """Fill Image metadata columns for rows uploaded before they existed.
+
+    Walks images by id in batches; each batch's files are read on a thread
+    pool (Pillow releases the GIL while decoding, and JPEGs decode at reduced
+    size), then the rows are updated through the ORM and committed, so folder
+    versions and the change feed move as for any other edit. Images sharing
+    a file are read once. Pending images are left to their job. redo also
+    re-reads rows that already have metadata. Returns (updated, unreadable).
+    """
+    last_id = 0
+    updated = unreadable = 0
+    with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+        while True:
+            query = Image.query.filter(Image.id > last_id, Image.processing_status != "pending")
+            if not redo:
+                query = query.filter(db.or_(Image.dominant_color.is_(None),
+                                            Image.placeholder.is_(None)))
+            images = query.order_by(Image.id).limit(batch_size).all()
+            if not images:
+                return updated, unreadable
+            last_id = images[-1].id
+
+            paths = {image.url: store.path(image.url[len(URL_PREFIX):])
+                     for image in images if image.url.startswith(URL_PREFIX)}
+            results = dict(zip(paths, pool.map(extract_metadata, paths.values())))
+            for image in images:
+                metadata = results.get(image.url)
+                if not metadata:
+                    unreadable += 1
+                    continue
+                for field, value in metadata.items():
+                    setattr(image, field, value)
+                updated += 1
+            db.session.commit()
+            db.session.expunge_all()  # keeps memory flat on big journals
@@ -0,0 +1,160 @@
+import base64
+import io
+import os
+from datetime import datetime
+
+try:
+    from PIL import Image as PILImage, ImageOps
+except ImportError:  # Pillow is optional, uploads still work without derivatives
+    PILImage = None
+
+# Derivative name -> target width in px. The gallery tile is ~180px wide,
+# so "thumb" covers it at 2x; "medium" is for previews / the lightbox.
+DERIVATIVE_WIDTHS = {"thumb": 360, "medium": 1280}
+DERIVATIVE_FORMAT = "WEBP"
+DERIVATIVE_EXT = ".webp"
+DERIVATIVE_QUALITY = 80
+
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132
+COLOR_SAMPLE_SIZE = 64   # dominant colour is computed on a thumbnail this big
+COLOR_PALETTE_SIZE = 8
+PLACEHOLDER_SIZE = 20     # px on the long side; the page blurs it up to the tile
+PLACEHOLDER_QUALITY = 40  # a few hundred bytes as a data URI
+
+
+def derivative_filename(filename, width):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_w{width}{DERIVATIVE_EXT}"
+
+
+def _normalize_mode(im):
+    if im.mode in ("RGB", "RGBA"):
+        return im
+    if im.mode in ("P", "LA") or "transparency" in im.info:
+        return im.convert("RGBA")
+    return im.convert("RGB")
+
+
+def generate_derivatives(source_path, url_prefix):
+    """Write fixed-width WebP copies of source_path next to it.
+
+    Returns a dict like {"original": {...}, "medium": {...}, "thumb": {...}}
+    where each entry has url/width/height. Widths the original is already
+    narrower than are skipped. Returns {} if Pillow is missing or the file
+    can't be decoded, so callers can fall back to the original url.
+    """
+    if PILImage is None:
+        return {}
+
+    directory, filename = os.path.split(source_path)
+    try:
+        with PILImage.open(source_path) as im:
+            width, height = im.size
+            if im.getexif().get(0x0112) in (5, 6, 7, 8):  # EXIF orientation rotates 90deg
+                width, height = height, width
+            variants = {"original": {"url": url_prefix + filename, "width": width, "height": height}}
+
+            # JPEG can decode at 1/2, 1/4, 1/8 scale, which is much cheaper than full size
+            largest = max(DERIVATIVE_WIDTHS.values())
+            im.draft("RGB", (largest, largest))
+            im = ImageOps.exif_transpose(im)
+            im = _normalize_mode(im)
+
+            # Largest first so each step resamples from the previous, smaller image
+            for name, width in sorted(DERIVATIVE_WIDTHS.items(), key=lambda kv: -kv[1]):
+                if im.width <= width:
+                    continue
+                height = max(1, round(im.height * width / im.width))
+                im = im.resize((width, height), PILImage.LANCZOS)
+                out_name = derivative_filename(filename, width)
+                im.save(os.path.join(directory, out_name), DERIVATIVE_FORMAT,
+                        quality=DERIVATIVE_QUALITY, method=4)
+                variants[name] = {"url": url_prefix + out_name, "width": width, "height": height}
+            return variants
+    except (OSError, ValueError, PILImage.DecompressionBombError):
+        return {}
+
+
+def _taken_at(exif):
+    """EXIF capture time (DateTimeOriginal, else DateTime) as a naive datetime."""
+    for value in (exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL), exif.get(EXIF_DATETIME)):
+        if isinstance(value, bytes):
+            value = value.decode("ascii", "ignore")
+        if not isinstance(value, str):
+            continue
+        try:
+            return datetime.strptime(value.strip("\0 ")[:19], "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            continue  # "0000:00:00 00:00:00" and other camera junk
+    return None
+
+
+def _sample(im):
+    """Upright RGB copy at most COLOR_SAMPLE_SIZE px, decoded as cheaply as possible."""
+    im.draft("RGB", (COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+    im = ImageOps.exif_transpose(im)
+    im = _normalize_mode(im)
+    if im.mode == "RGBA":
+        # Transparent areas count as white, like they show on the page
+        background = PILImage.new("RGB", im.size, (255, 255, 255))
+        background.paste(im, mask=im.getchannel("A"))
+        im = background
+    im.thumbnail((COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+    return im
+
+
+def _dominant_color(im):
+    """Most common colour of a quantized sample, as "#rrggbb"."""
+    palette_image = im.quantize(COLOR_PALETTE_SIZE)
+    _, index = max(palette_image.getcolors())
+    r, g, b = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _placeholder(im):
+    """Tiny WebP of the sample as a data: URI, painted while the real image loads."""
+    im = im.copy()
+    im.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buf = io.BytesIO()
+    im.save(buf, "WEBP", quality=PLACEHOLDER_QUALITY, method=6)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def extract_metadata(source_path, decode=True):
+    """Dimensions, MIME type, byte size, EXIF capture time, dominant colour
+    and a placeholder image.
+
+    Width/height are as displayed (after EXIF rotation), so the page can
+    reserve the tile's space before the image loads. Everything but the
+    colour and placeholder comes from the file header; decode=False skips
+    those two. Returns {} if Pillow is missing or the file isn't an image.
+    """
+    if PILImage is None:
+        return {}
+    try:
+        with PILImage.open(source_path) as im:
+            width, height = im.size
+            exif = im.getexif()
+            if exif.get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+            metadata = {
+                "width": width,
+                "height": height,
+                "byte_size": os.path.getsize(source_path),
+                "mime_type": PILImage.MIME.get(im.format),
+                "taken_at": _taken_at(exif),
+            }
+            if decode:
+                sample = _sample(im)
+                metadata["dominant_color"] = _dominant_color(sample)
+                metadata["placeholder"] = _placeholder(sample)
+            return metadata
+    except (OSError, ValueError, PILImage.DecompressionBombError):
+        return {}
+
+
+def build_srcset(variants):
+    entries = sorted((v for v in (variants or {}).values()), key=lambda v: v["width"])
+    return ", ".join(f"{v['url']} {v['width']}w" for v in entries)
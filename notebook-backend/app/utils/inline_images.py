@@ -0,0 +1,63 @@
+import base64
+import binascii
+import io
+import re
+from flask import current_app
+from ..models import Blob
+from .blob_store import BlobStore
+
+# Pasting a screenshot into the contenteditable editor inserts it as a
+# data: URI, a third bigger than the image and resent with every save
+DATA_URI_RE = re.compile(r"data:image/(png|jpe?g|gif|webp);base64,([A-Za-z0-9+/=\s]+)", re.IGNORECASE)
+EXTENSIONS = {"png": ".png", "jpg": ".jpg", "jpeg": ".jpg", "gif": ".gif", "webp": ".webp"}
+
+
+def _matches_type(kind, data):
+    if kind == "png":
+        return data.startswith(b"\x89PNG\r\n\x1a\n")
+    if kind in ("jpg", "jpeg"):
+        return data.startswith(b"\xff\xd8\xff")
+    if kind == "gif":
+        return data[:6] in (b"GIF87a", b"GIF89a")
+    return data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+
+
+def _decode(kind, payload):
+    try:
+        data = base64.b64decode("".join(payload.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return data if _matches_type(kind, data) else None
+
+
+def has_inline_images(html):
+    return bool(html) and DATA_URI_RE.search(html) is not None
+
+
+def extract_inline_images(html, store=None):
+    """Move data:image URIs in html into the blob store.
+
+    Returns (html, urls): html with each data URI replaced by its blob url,
+    and those urls in order of first appearance. Payloads that don't decode
+    to the image type they claim are left in place.
+    """
+    if not has_inline_images(html):
+        return html, []
+    store = store or BlobStore(current_app.config.get("UPLOAD_FOLDER", "uploads"))
+    urls = []
+
+    def replace(match):
+        kind = match.group(1).lower()
+        payload = match.group(2)
+        # \s may have run into whitespace after the URI (CSS url(), srcset)
+        stripped = payload.rstrip()
+        data = _decode(kind, stripped)
+        if data is None:
+            return match.group(0)
+        blob, _ = Blob.store(store, io.BytesIO(data), "pasted" + EXTENSIONS[kind])
+        if blob.url not in urls:
+            urls.append(blob.url)
+        return blob.url + payload[len(stripped):]
+
+    return DATA_URI_RE.sub(replace, html), urls
+
@@ -0,0 +1,166 @@
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import Job
+
+POLL_INTERVAL = 5  # seconds; enqueues wake the workers immediately anyway
+MAX_ATTEMPTS = 3
+ERROR_BACKOFF = 5  # seconds a worker waits after an error outside a handler (e.g. "database is locked")
+CLAIM_TIMEOUT = 60 * 60  # seconds; a job "running" longer than this is taken to have lost its worker
+
+
+class JobQueue:
+    """Background jobs stored in the `jobs` table, run by a fixed pool of threads.
+
+    Rows are claimed one at a time with a conditional UPDATE, so the pool
+    size bounds how much CPU work runs at once. Anything still queued is
+    picked up again by the next start(), and so is a job left running by a
+    crash once its claim is older than CLAIM_TIMEOUT.
+    """
+
+    def __init__(self, app, workers=2):
+        self.app = app
+        self.workers = workers
+        self.handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        event.listen(Session, "after_commit", self._after_commit)
+
+    def handler(self, kind, on_failure=None):
+        """Register fn(payload) for jobs of this kind.
+
+        on_failure(payload, error) runs once a job has used up its attempts.
+        """
+        def decorator(fn):
+            self.handlers[kind] = (fn, on_failure)
+            return fn
+        return decorator
+
+    def enqueue(self, kind, payload, delay=None):
+        """Add a job to the current session; it runs once the caller commits.
+
+        delay (seconds) holds it back at least that long.
+        """
+        job = Job(kind=kind, payload=payload)
+        if delay:
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        db.session.add(job)
+        db.session.info["jobs_enqueued"] = True
+        return job
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            with self.app.app_context():
+                # Other processes may share the database, so a "running" job
+                # only goes back to the queue once its claim (updated_at, set
+                # by _claim) is too old for any live worker to still hold it
+                cutoff = datetime.utcnow() - timedelta(seconds=CLAIM_TIMEOUT)
+                db.session.execute(db.update(Job)
+                                   .where(Job.status == "running", Job.updated_at < cutoff)
+                                   .values(status="queued", updated_at=datetime.utcnow()))
+                db.session.commit()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.wake()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _after_commit(self, session):
+        if session.info.pop("jobs_enqueued", False):
+            self.wake()
+
+    def _work(self):
+        while not self._stop.is_set():
+            job_id = None
+            with self.app.app_context():
+                try:
+                    job_id = self._claim()
+                    if job_id is not None:
+                        self._run(job_id)
+                except Exception:
+                    # Never let the thread die: the queue would silently stall
+                    self.app.logger.exception("Job worker error (job %s)", job_id)
+                    self._recover(job_id)
+                    self._stop.wait(ERROR_BACKOFF)
+                    continue
+            if job_id is None:
+                with self._cond:
+                    self._cond.wait(POLL_INTERVAL)
+
+    def _recover(self, job_id):
+        """Roll back, and put a claimed job back in the queue (or fail it once out of attempts)."""
+        try:
+            db.session.rollback()
+            if job_id is not None:
+                db.session.execute(db.update(Job)
+                                   .where(Job.id == job_id, Job.status == "running")
+                                   .values(status=db.case((Job.attempts >= MAX_ATTEMPTS, "failed"),
+                                                          else_="queued"),
+                                           updated_at=datetime.utcnow()))
+                db.session.commit()
+        except Exception:
+            # Still broken; a later start() requeues the job once its claim is stale
+            db.session.rollback()
+            self.app.logger.exception("Could not requeue job %s", job_id)
+
+    def _claim(self):
+        while True:
+            job_id = (db.session.query(Job.id)
+                      .filter(Job.status == "queued",
+                              db.or_(Job.run_after.is_(None), Job.run_after <= datetime.utcnow()))
+                      .order_by(Job.id)
+                      .limit(1)
+                      .scalar())
+            if job_id is None:
+                return None
+            claimed = db.session.execute(db.update(Job)
+                                         .where(Job.id == job_id, Job.status == "queued")
+                                         .values(status="running",
+                                                 attempts=Job.attempts + 1,
+                                                 updated_at=datetime.utcnow()))
+            db.session.commit()
+            if claimed.rowcount == 1:
+                return job_id
+            # Another worker got there first, try the next one
+
+    def _run(self, job_id):
+        # Handlers mostly read then write once at the end; keep the single
+        # writer connection free while they work
+        db.session.info["read_only"] = True
+        job = db.session.get(Job, job_id)
+        fn, on_failure = self.handlers.get(job.kind, (None, None))
+        try:
+            if fn is None:
+                raise LookupError(f"No handler for job kind {job.kind!r}")
+            fn(job.payload)
+            job.status = "done"
+            job.error = None
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.error = traceback.format_exc()
+            job.status = "queued" if job.attempts < MAX_ATTEMPTS else "failed"
+            db.session.commit()
+            if job.status == "failed" and on_failure is not None:
+                try:
+                    on_failure(job.payload, job.error)
+                    db.session.commit()
+                except Exception:
+                    # The job stays "failed"; only its cleanup is lost
+                    db.session.rollback()
+                    self.app.logger.exception("on_failure of job %s failed", job_id)
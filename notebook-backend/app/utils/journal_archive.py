@@ -0,0 +1,283 @@
+import base64
+import gzip
+import io
+import json
+import os
+import tarfile
+import time
+import uuid
+from datetime import date, datetime
+from .. import db
+from ..models import Folder, Image, Blob, NoteRevision, JournalState, Change
+from .search import notes_text
+from .sqlite_profile import READER_BIND
+
+ARCHIVE_FORMAT = "notebook-journal"
+ARCHIVE_VERSION = 1
+RECORDS_PER_MEMBER = 1000  # rows per NDJSON member, also the import batch size
+COPY_SIZE = 1024 * 1024
+URL_PREFIX = "/uploads/"
+
+# Parents before children, so the importer can insert each member as it arrives
+TABLES = [Folder.__table__, Blob.__table__, Image.__table__, NoteRevision.__table__]
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+# ===== EXPORT =====
+# The archive is an uncompressed tar built by hand: a tar member needs its
+# size up front, which every file here has and every records chunk gets by
+# being gzipped in memory (at most RECORDS_PER_MEMBER rows). So the response
+# streams with bounded memory, no temp files, and `tar -x` can read it.
+#
+#   manifest.json
+#   files/<path under uploads/>            originals and derivatives
+#   records/<table>-000001.ndjson.gz       one JSON object per row
+#   summary.json                           row counts; marks a complete archive
+
+def _tar_header(name, size):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+def _tar_padding(size):
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def _relpath_from_url(url):
+    if url and url.startswith(URL_PREFIX):
+        return url[len(URL_PREFIX):]
+    return None
+
+
+def _file_paths(conn):
+    """Paths (relative to uploads/) of every original and derivative file."""
+    blobs, images = Blob.__table__, Image.__table__
+    variants = (db.select(images.c.variants)
+                .where(images.c.blob_hash == blobs.c.hash)
+                .limit(1)
+                .scalar_subquery())
+    blob_rows = conn.execution_options(yield_per=RECORDS_PER_MEMBER).execute(
+        db.select(blobs.c.path, variants).order_by(blobs.c.hash))
+    # Legacy files go by url: filename is the (renamable) display name
+    legacy_rows = conn.execution_options(yield_per=RECORDS_PER_MEMBER).execute(
+        db.select(images.c.url, images.c.variants)
+        .where(images.c.blob_hash.is_(None))
+        .order_by(images.c.id))
+    seen = set()
+    for rows, to_path in ((blob_rows, lambda path: path), (legacy_rows, _relpath_from_url)):
+        for value, image_variants in rows:
+            path = to_path(value)
+            if path is None or path in seen:
+                continue
+            seen.add(path)
+            yield path
+            for name, info in (image_variants or {}).items():
+                relpath = _relpath_from_url(info.get("url"))
+                if name != "original" and relpath:
+                    yield relpath
+
+
+def export_journal(upload_root):
+    """Yield the whole journal as a tar stream, chunk by chunk.
+
+    Runs on one reader connection inside a single read transaction, so the
+    records and file list are a consistent snapshot even while autosaves go on.
+    """
+    engine = db.engines.get(READER_BIND, db.engine)
+    written = 0
+
+    def emit(*chunks):
+        nonlocal written
+        for chunk in chunks:
+            written += len(chunk)
+        return b"".join(chunks)
+
+    manifest = json.dumps({"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION,
+                           "exported_at": datetime.utcnow().isoformat(),
+                           "tables": [table.name for table in TABLES]}).encode()
+    yield emit(_tar_header("manifest.json", len(manifest)), manifest, _tar_padding(len(manifest)))
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN")
+        try:
+            for relpath in _file_paths(conn):
+                path = os.path.join(upload_root, *relpath.split("/"))
+                try:
+                    source = open(path, "rb")
+                except FileNotFoundError:
+                    continue
+                with source:
+                    size = os.fstat(source.fileno()).st_size
+                    yield emit(_tar_header("files/" + relpath, size))
+                    remaining = size
+                    while remaining:
+                        chunk = source.read(min(COPY_SIZE, remaining))
+                        if not chunk:
+                            # Shrunk under us; the header already promised size bytes
+                            chunk = b"\0" * remaining
+                        remaining -= len(chunk)
+                        yield emit(chunk)
+                    yield emit(_tar_padding(size))
+
+            counts = {}
+            for table in TABLES:
+                counts[table.name] = 0
+                result = conn.execution_options(yield_per=RECORDS_PER_MEMBER).execute(
+                    db.select(table).order_by(*table.primary_key.columns))
+                for number, rows in enumerate(result.mappings().partitions(), start=1):
+                    lines = (json.dumps({key: _encode_value(value) for key, value in row.items()},
+                                        separators=(",", ":"))
+                             for row in rows)
+                    counts[table.name] += len(rows)
+                    data = gzip.compress(("\n".join(lines) + "\n").encode(), mtime=0)
+                    name = f"records/{table.name}-{number:06d}.ndjson.gz"
+                    yield emit(_tar_header(name, len(data)), data, _tar_padding(len(data)))
+        finally:
+            conn.rollback()
+
+    summary = json.dumps({"rows": counts}).encode()
+    yield emit(_tar_header("summary.json", len(summary)), summary, _tar_padding(len(summary)))
+
+    # End-of-archive marker, then pad to a whole tar record like tarfile does
+    end = b"\0" * (tarfile.BLOCKSIZE * 2)
+    yield end + b"\0" * (-(written + len(end)) % tarfile.RECORDSIZE)
+
+
+# ===== IMPORT =====
+
+def _decode_record(table, record):
+    row = {}
+    for column in table.columns:
+        if column.name not in record:
+            continue
+        value = record[column.name]
+        if value is not None:
+            if isinstance(column.type, db.DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, db.Date):
+                value = date.fromisoformat(value)
+            elif isinstance(column.type, db.LargeBinary):
+                value = base64.b64decode(value)
+        row[column.name] = value
+    return row
+
+
+def _safe_relpath(name):
+    relpath = name[len("files/"):]
+    parts = relpath.split("/")
+    if not relpath or relpath.startswith("/") or "\\" in relpath or any(p in ("", ".", "..") for p in parts):
+        raise ArchiveError(f"Unsafe path in archive: {name!r}")
+    return relpath
+
+
+def import_journal(stream, blob_store):
+    """Load an export_journal() archive from a readable stream into an empty journal.
+
+    Reads the tar strictly front to back (works on pipes and stdin), writes
+    files straight into the upload store and inserts records in batches of
+    RECORDS_PER_MEMBER with Core INSERTs, then fills the search index and
+    bumps the journal version once. Records go in one transaction, so a
+    failed import leaves the database empty again. Returns row/file counts.
+    """
+    for table in (Folder.__table__, Image.__table__, Blob.__table__):
+        if db.session.execute(db.select(db.func.count()).select_from(table)).scalar():
+            raise ArchiveError("Import needs an empty journal; the database already has data")
+
+    tables = {table.name: table for table in TABLES}
+    counts = {"files": 0, **{name: 0 for name in tables}}
+    seen_manifest = False
+    summary = None
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                if member.name == "manifest.json":
+                    manifest = json.load(tar.extractfile(member))
+                    if manifest.get("format") != ARCHIVE_FORMAT or manifest.get("version") != ARCHIVE_VERSION:
+                        raise ArchiveError("Not a notebook journal archive (or an unsupported version)")
+                    seen_manifest = True
+                    continue
+                if not seen_manifest:
+                    raise ArchiveError("Archive does not start with manifest.json")
+                if not member.isfile():
+                    continue
+                if member.name == "summary.json":
+                    summary = json.load(tar.extractfile(member))
+                    continue
+
+                if member.name.startswith("files/"):
+                    relpath = _safe_relpath(member.name)
+                    source = tar.extractfile(member)
+                    temp_path = blob_store.new_temp("import")
+                    with open(temp_path, "wb") as out:
+                        while True:
+                            chunk = source.read(COPY_SIZE)
+                            if not chunk:
+                                break
+                            out.write(chunk)
+                    blob_store.adopt(temp_path, relpath)
+                    counts["files"] += 1
+
+                elif member.name.startswith("records/"):
+                    table_name = member.name[len("records/"):].rsplit("-", 1)[0]
+                    table = tables.get(table_name)
+                    if table is None:
+                        continue
+                    with gzip.GzipFile(fileobj=tar.extractfile(member)) as lines:
+                        batch = [_decode_record(table, json.loads(line))
+                                 for line in io.TextIOWrapper(lines, encoding="utf-8") if line.strip()]
+                    if batch:
+                        db.session.execute(db.insert(table), batch)
+                        counts[table_name] += len(batch)
+                        if table is Folder.__table__:
+                            db.session.execute(
+                                db.text("INSERT INTO notes_fts (rowid, body) VALUES (:id, :body)"),
+                                [{"id": row["id"], "body": notes_text(row.get("notes_html"))} for row in batch])
+
+        if not seen_manifest:
+            raise ArchiveError("Empty archive")
+        # A pipe cut exactly between members still reads as a valid tar
+        if summary is None:
+            raise ArchiveError("Archive is truncated (no summary.json)")
+        expected = {name: summary.get("rows", {}).get(name, 0) for name in tables}
+        if expected != {name: counts[name] for name in tables}:
+            raise ArchiveError(f"Archive row counts don't match its summary: {expected}")
+        # Core INSERTs skip the flush hooks: record every row in the change
+        # feed and move the ETag counter by hand. A new feed_id sends change
+        # feed clients back to a full sync, so tombstones left from the data
+        # that was deleted before the import can go.
+        changes = Change.__table__
+        db.session.execute(db.delete(changes))
+        for kind, table, folder_column in (("folder", Folder.__table__, "id"),
+                                           ("image", Image.__table__, "folder_id")):
+            db.session.execute(db.insert(changes).from_select(
+                ["kind", "entity_id", "folder_id", "deleted", "changed_at"],
+                db.select(db.literal(kind), table.c.id, table.c[folder_column],
+                          db.false(), db.func.current_timestamp())
+                .order_by(table.c.id)))
+        state = JournalState.__table__
+        bumped = db.session.execute(db.update(state).where(state.c.id == 1)
+                                    .values(version=state.c.version + 1, feed_id=uuid.uuid4().hex))
+        if bumped.rowcount == 0:
+            db.session.execute(db.insert(state).values(id=1, version=1))
+        db.session.commit()
+    except tarfile.TarError as e:
+        db.session.rollback()
+        raise ArchiveError(f"Corrupt archive: {e}") from e
+    except Exception:
+        db.session.rollback()
+        raise
+    return counts
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import zlib
+from .. import db
+from ..models import Folder, NoteRevision
+from .inline_images import extract_inline_images, has_inline_images
+
+# A new full snapshot is stored once the deltas since the last one add up to
+# the snapshot's own size (so history grows with how much was edited, not
+# with how many autosaves happened), or once the chain gets this long (so
+# rebuilding any revision applies at most this many deltas).
+MAX_DELTA_CHAIN = 100
+COMPACT_BATCH_SIZE = 50  # folders per commit in compact_notes()
+
+
+class PatchError(ValueError):
+    pass
+
+
+def notes_hash(html):
+    return hashlib.sha256((html or "").encode("utf-8")).hexdigest()
+
+
+def apply_patch(text, ops):
+    """Apply splice ops to text and return the result.
+
+    Each op is {"at": offset, "remove": count, "insert": str}, applied in
+    order to the result of the previous one. Offsets and counts are in
+    UTF-16 code units, because that's how the browser indexes strings.
+    """
+    buf = bytearray((text or "").encode("utf-16-le"))
+    for op in ops:
+        try:
+            at = int(op.get("at", 0))
+            remove = int(op.get("remove", 0))
+            insert = str(op.get("insert", ""))
+        except (AttributeError, TypeError, ValueError):
+            raise PatchError("Malformed patch operation")
+        if at < 0 or remove < 0 or (at + remove) * 2 > len(buf):
+            raise PatchError("Patch does not fit the base revision")
+        buf[at * 2:(at + remove) * 2] = insert.encode("utf-16-le", "surrogatepass")
+    try:
+        return buf.decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise PatchError("Patch splits a character")
+
+
+def set_notes(folder, html):
+    """Set folder.notes_html, skipping the write if the content is unchanged.
+
+    Every notes write path goes through here. Pasted data:image URIs are
+    moved into the blob store first and their urls added to
+    folder.notes_images, so the stored notes (and every payload carrying
+    them) hold a link instead of the bytes. Returns True when the notes
+    actually changed (and notes_revision was bumped).
+    """
+    html, image_urls = extract_inline_images(html or "")
+    digest = notes_hash(html)
+    current = folder.notes_hash or notes_hash(folder.notes_html)
+    if digest == current:
+        return False
+    previous_html = folder.notes_html or ""
+    previous_revision = folder.notes_revision or 0
+    folder.notes_html = html
+    folder.notes_hash = digest
+    folder.notes_revision = previous_revision + 1
+    if image_urls:
+        # A new list, so the blob reference hooks see the change
+        existing = folder.notes_images or []
+        folder.notes_images = existing + [url for url in image_urls if url not in existing]
+    record_revision(folder, previous_revision, previous_html, html)
+    return True
+
+
+def compact_notes(batch_size=COMPACT_BATCH_SIZE, dry_run=False):
+    """Run every folder whose notes still hold data URIs through set_notes.
+
+    For notes saved before extraction existed. Commits every batch_size
+    folders. Returns (folders changed, bytes before, bytes after); dry_run
+    counts the folders with data URIs and changes nothing.
+    """
+    ids = db.session.execute(db.select(Folder.id)
+                             .where(Folder.notes_html.like("%data:image/%"))
+                             .order_by(Folder.id)).scalars().all()
+    folders = before = after = 0
+    for start in range(0, len(ids), batch_size):
+        for folder in Folder.query.filter(Folder.id.in_(ids[start:start + batch_size])):
+            html = folder.notes_html or ""
+            if not has_inline_images(html) or (not dry_run and not set_notes(folder, html)):
+                continue
+            folders += 1
+            before += len(html.encode("utf-8"))
+            after += len(folder.notes_html.encode("utf-8"))
+        if not dry_run:
+            db.session.commit()
+        db.session.expunge_all()  # keeps memory flat on big journals
+    return folders, before, after
+
+
+# ===== REVISION HISTORY =====
+
+def _delta(old, new):
+    """Single splice [at, remove, insert] between the common prefix and suffix."""
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[len(old) - 1 - end] == new[len(new) - 1 - end]:
+        end += 1
+    return [start, len(old) - start - end, new[start:len(new) - end]]
+
+
+def _compress(value):
+    return zlib.compress(value.encode("utf-8"))
+
+
+def _decompress(data):
+    return zlib.decompress(data).decode("utf-8")
+
+
+def record_revision(folder, previous_revision, previous_html, html):
+    revision = previous_revision + 1
+    last = None
+    if folder.id is not None:
+        last = (NoteRevision.query
+                .filter_by(folder_id=folder.id)
+                .order_by(NoteRevision.revision.desc())
+                .first())
+
+    snapshot = _compress(html)
+    # Deltas need an unbroken chain back to a snapshot; folders with notes
+    # from before history existed start with one.
+    if last is not None and last.revision == previous_revision:
+        delta = zlib.compress(json.dumps(_delta(previous_html, html)).encode("utf-8"))
+        chain_bytes = last.chain_bytes + len(delta)
+        chain_length = revision - last.snapshot_revision
+        if chain_bytes < len(snapshot) and chain_length <= MAX_DELTA_CHAIN:
+            db.session.add(NoteRevision(folder=folder, revision=revision, is_snapshot=False,
+                                        snapshot_revision=last.snapshot_revision,
+                                        chain_bytes=chain_bytes, data=delta))
+            return
+
+    db.session.add(NoteRevision(folder=folder, revision=revision, is_snapshot=True,
+                                snapshot_revision=revision, chain_bytes=0, data=snapshot))
+
+
+def reconstruct_revision(folder_id, revision):
+    """Notes HTML as of the given revision, or None if it isn't in the history."""
+    target = NoteRevision.query.filter_by(folder_id=folder_id, revision=revision).first()
+    if target is None:
+        return None
+    entries = (NoteRevision.query
+               .filter(NoteRevision.folder_id == folder_id,
+                       NoteRevision.revision >= target.snapshot_revision,
+                       NoteRevision.revision <= revision)
+               .order_by(NoteRevision.revision)
+               .all())
+    html = _decompress(entries[0].data)
+    for entry in entries[1:]:
+        at, remove, insert = json.loads(_decompress(entry.data))
+        html = html[:at] + insert + html[at + remove:]
+    return html
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+JOURNAL_WIDE = None  # tag of entries that change with any folder (the folder list)
+
+
+class ResponseCache:
+    """In-process LRU of serialized JSON bodies, bounded by their total size.
+
+    Entries are keyed by the response's ETag, which already carries the
+    folder / journal version, so an entry can never be served after its data
+    changed, even when another process did the write. Invalidation is about
+    memory: a commit that touches the journal drops every list entry and the
+    entries of the folders it changed, instead of leaving them to age out.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self._entries = OrderedDict()  # etag -> (body, tag)
+        self._tags = {}                # tag -> set of etags
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, etag):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, etag, body, tag=JOURNAL_WIDE):
+        """Store body (bytes) under etag; tag is the folder id it depends on."""
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            self._discard(etag)
+            self._entries[etag] = (body, tag)
+            self._tags.setdefault(tag, set()).add(etag)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, folder_ids):
+        """Drop the journal-wide entries and those of the given folders."""
+        with self._lock:
+            for tag in (JOURNAL_WIDE, *folder_ids):
+                for etag in list(self._tags.get(tag, ())):
+                    self._discard(etag)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def _discard(self, etag):
+        entry = self._entries.pop(etag, None)
+        if entry is None:
+            return
+        body, tag = entry
+        self._size -= len(body)
+        etags = self._tags.get(tag)
+        etags.discard(etag)
+        if not etags:
+            del self._tags[tag]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def listen(self):
+        """Invalidate from committed sessions (see _collect_journal_changes in models)."""
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_rollback", self._after_rollback)
+
+    def _after_commit(self, session):
+        folder_ids = session.info.pop("stale_folder_ids", None)
+        if folder_ids is not None:
+            self.invalidate(folder_ids)
+
+    def _after_rollback(self, session):
+        session.info.pop("stale_folder_ids", None)
@@ -0,0 +1,126 @@
+import html
+import re
+from html.parser import HTMLParser
+from itertools import chain
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import Folder
+
+# rowid is the folder id; body is the notes text with tags and entities stripped
+CREATE_NOTES_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts "
+    "USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+)
+
+BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "tr", "td", "th", "pre", "hr"}
+SKIP_TAGS = {"script", "style"}
+
+# Control characters can't appear in stripped notes, so they're safe markers
+MARK_START, MARK_END = "\x02", "\x03"
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def notes_text(notes_html):
+    """Plain text of a notes body: tags dropped, entities decoded."""
+    parser = _TextExtractor()
+    parser.feed(notes_html or "")
+    parser.close()
+    return re.sub(r"\s+", " ", "".join(parser.parts)).strip()
+
+
+def ensure_search_index():
+    """Create notes_fts if missing and fill it from the existing folders."""
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")).first()
+    if exists:
+        return
+    db.session.execute(text(CREATE_NOTES_FTS))
+    rows = db.session.execute(db.select(Folder.id, Folder.notes_html)).yield_per(500)
+    for folder_id, notes_html in rows:
+        db.session.execute(text("INSERT INTO notes_fts (rowid, body) VALUES (:id, :body)"),
+                           {"id": folder_id, "body": notes_text(notes_html)})
+    db.session.commit()
+
+
+def build_match_query(q):
+    """Turn free text into an FTS5 query: every word must match, the last
+    one as a prefix so results show up while typing."""
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    terms = ['"%s"' % w.replace('"', '""') for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_notes(q, limit=20):
+    match = build_match_query(q)
+    if match is None:
+        return []
+    rows = db.session.execute(text(
+        "SELECT folders.id, folders.date, "
+        "snippet(notes_fts, 0, :start, :end, '…', 16) AS snippet, "
+        "bm25(notes_fts) AS rank "
+        "FROM notes_fts JOIN folders ON folders.id = notes_fts.rowid "
+        "WHERE notes_fts MATCH :match "
+        "ORDER BY rank LIMIT :limit"
+    ), {"start": MARK_START, "end": MARK_END, "match": match, "limit": limit})
+    return [{
+        "id": row.id,
+        "date": row.date,
+        "snippet": html.escape(row.snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"),
+        "rank": row.rank
+    } for row in rows]
+
+
+# ===== INCREMENTAL SYNC =====
+# Every notes write (set_notes in run.py and the folders blueprint, folder
+# create and delete) ends in a flush, so the index is updated right there,
+# in the same transaction as the notes themselves.
+
+@db.event.listens_for(Session, "before_flush")
+def _collect_notes_changes(session, flush_context, instances):
+    pending = session.info.setdefault("notes_fts_pending", {})
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Folder) and db.inspect(obj).attrs.notes_html.history.has_changes():
+            pending[obj] = True
+    for obj in session.deleted:
+        if isinstance(obj, Folder):
+            pending[obj] = False
+
+
+@db.event.listens_for(Session, "after_flush")
+def _apply_notes_changes(session, flush_context):
+    pending = session.info.pop("notes_fts_pending", {})
+    if not pending:
+        return
+    conn = session.connection()
+    for folder, keep in pending.items():
+        conn.execute(text("DELETE FROM notes_fts WHERE rowid = :id"), {"id": folder.id})
+        if keep:
+            conn.execute(text("INSERT INTO notes_fts (rowid, body) VALUES (:id, :body)"),
+                         {"id": folder.id, "body": notes_text(folder.notes_html)})
@@ -0,0 +1,82 @@
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READER_BIND = "reader"
+
+# Applied to every new connection. WAL lets readers keep going while the
+# autosave writer commits; NORMAL is still crash-safe in WAL mode (only the
+# last transactions can be lost on power failure, never corruption).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32000,       # KiB, i.e. ~32 MB of page cache per connection
+    "mmap_size": 268435456,     # 256 MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # ms to wait on a lock before "database is locked"
+}
+
+# journal_mode is stored in the database file, a reader can't (and needn't) set it
+READER_SKIP = {"journal_mode"}
+
+
+def apply_sqlite_profile(engine, read_only=False):
+    """Run SQLITE_PRAGMAS on each new connection of engine.
+
+    Reader connections also get query_only, so a stray write through the
+    reader pool fails loudly instead of taking the write lock.
+    """
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            if read_only and name in READER_SKIP:
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+
+def sqlite_engine_config(database_uri, readers=8):
+    """Config for one writer connection plus a pool of reader connections.
+
+    SQLite only ever has one writer, so a bigger write pool just moves the
+    queueing from the pool into busy_timeout waits.
+    """
+    return {
+        "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": 1, "max_overflow": 0, "pool_timeout": 30},
+        "SQLALCHEMY_BINDS": {READER_BIND: {"url": database_uri, "pool_size": readers,
+                                           "max_overflow": readers}},
+    }
+
+
+def init_sqlite_profile(db):
+    """Hook the pragmas onto the writer and reader engines (needs an app context)."""
+    for key, engine in db.engines.items():
+        if engine.dialect.name == "sqlite":
+            apply_sqlite_profile(engine, read_only=key == READER_BIND)
+
+
+class RoutingSession(Session):
+    """Session that reads through the reader pool when marked read-only.
+
+    Set session.info["read_only"] for requests/jobs that mostly read. Queries
+    then use a reader connection and the writer is only checked out when the
+    session flushes (or executes a Core INSERT/UPDATE/DELETE); after that
+    the rest of the transaction stays on the writer so it sees its own changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        writes = clause is not None and getattr(clause, "is_dml", False)
+        if bind is None and self.info.get("read_only") and not self._flushing and not writes:
+            reader = self._db.engines.get(READER_BIND)
+            if reader is not None and not self._writer_in_transaction():
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _writer_in_transaction(self):
+        transaction = self.get_transaction()
+        if transaction is None:
+            return False
+        writer = self._db.engines.get(None)
+        return any(getattr(key, "engine", key) is writer for key in transaction._connections)
@@ -0,0 +1,40 @@
+import mimetypes
+import os
+from flask import current_app, make_response, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+# Uploaded filenames are unique per upload, so their bytes never change
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def send_immutable(directory, filename):
+    """Serve an upload with long-lived, immutable caching.
+
+    If UPLOADS_ACCEL_REDIRECT is set (e.g. "/_uploads/"), the response is an
+    empty X-Accel-Redirect so nginx streams the file and handles Range and
+    conditional requests itself. Otherwise send_from_directory does the
+    conditional/Range handling, and hands the body to the front server via
+    X-Sendfile when Flask's USE_X_SENDFILE is on.
+    """
+    accel_prefix = current_app.config.get("UPLOADS_ACCEL_REDIRECT")
+    if accel_prefix:
+        path = safe_join(directory, filename)
+        if path is None:
+            raise NotFound()
+        internal_path = os.path.relpath(path, current_app.config["UPLOAD_FOLDER"]).replace(os.sep, "/")
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + internal_path
+        response.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    else:
+        # Raises NotFound itself, no need for an os.path.exists() first
+        response = send_from_directory(directory, filename, max_age=IMMUTABLE_MAX_AGE)
+
+    return mark_immutable(response)
+
+
+def mark_immutable(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,246 @@
+import os
+import time
+from datetime import datetime, timedelta
+from .. import db
+from ..models import Folder, Image, Blob, Job, UploadSession
+from .blob_store import BLOB_DIR
+from .image_service import DERIVATIVE_WIDTHS, derivative_filename
+
+GC_JOB = "storage.gc"
+GC_GRACE = 10 * 60           # seconds a blob stays unreferenced (or a file unowned) before removal
+GC_BATCH_SIZE = 500          # blobs deleted per transaction
+TEMP_MAX_AGE = 24 * 60 * 60  # abandoned temp files in blobs/tmp
+UPLOAD_SESSION_MAX_AGE = 24 * 60 * 60  # resumable uploads with no chunk for this long are dropped
+URL_PREFIX = "/uploads/"
+
+
+def _relpath_from_url(url):
+    if isinstance(url, str) and url.startswith(URL_PREFIX):
+        return url[len(URL_PREFIX):]
+    return None
+
+
+def blob_file_paths(path):
+    """The blob itself plus every derivative the image job may have written."""
+    directory, filename = path.rsplit("/", 1)
+    return [path] + [f"{directory}/{derivative_filename(filename, width)}"
+                     for width in DERIVATIVE_WIDTHS.values()]
+
+
+def legacy_file_paths(url, variants):
+    """Files of a pre-blob-store upload and its derivatives.
+
+    Goes by url, not filename: rename changes the filename, and several old
+    rows share one file.
+    """
+    relpath = _relpath_from_url(url)
+    paths = [relpath] if relpath else []
+    for name, info in (variants or {}).items():
+        relpath = _relpath_from_url(info.get("url"))
+        if name != "original" and relpath:
+            paths.append(relpath)
+    return paths
+
+
+def schedule_collection(job_queue, paths=(), delay=GC_GRACE):
+    """Queue a collector run after delay seconds, in the caller's transaction.
+
+    paths are files (relative to uploads/) whose rows are being deleted now;
+    blobs need nothing extra, their ref_count going to 0 marks them.
+    """
+    if paths:
+        job_queue.enqueue(GC_JOB, {"paths": list(paths)}, delay=delay)
+        return
+    pending = (db.session.query(Job.id)
+               .filter(Job.kind == GC_JOB, Job.status == "queued")
+               .limit(1).scalar())
+    if pending is None:
+        job_queue.enqueue(GC_JOB, {}, delay=delay)
+
+
+def _remove(store, relpath):
+    try:
+        os.remove(store.path(relpath))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def collect_unreferenced(store, grace=GC_GRACE, batch_size=GC_BATCH_SIZE):
+    """Delete blobs whose ref_count has been 0 for longer than grace seconds.
+
+    Each batch deletes rows with a DELETE that re-checks ref_count, commits,
+    and only then unlinks files, so an upload that re-referenced a blob in
+    the meantime either keeps it or fails its flush (see _apply_blob_refs).
+    Returns the number of blobs removed.
+    """
+    blobs = Blob.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    removed = 0
+    while True:
+        rows = db.session.execute(db.select(blobs.c.hash, blobs.c.path)
+                                  .where(blobs.c.ref_count <= 0,
+                                         blobs.c.unreferenced_at <= cutoff)
+                                  .limit(batch_size)).all()
+        if not rows:
+            return removed
+        gone = []
+        for blob_hash, path in rows:
+            deleted = db.session.execute(db.delete(blobs)
+                                         .where(blobs.c.hash == blob_hash,
+                                                blobs.c.ref_count <= 0,
+                                                blobs.c.unreferenced_at <= cutoff))
+            if deleted.rowcount:
+                gone.append(path)
+        db.session.commit()
+        for path in gone:
+            for relpath in blob_file_paths(path):
+                _remove(store, relpath)
+        removed += len(gone)
+        if len(rows) < batch_size:
+            return removed
+
+
+def expire_upload_sessions(store, max_age=UPLOAD_SESSION_MAX_AGE):
+    """Delete resumable uploads idle for longer than max_age, then their temp files.
+
+    Like collect_unreferenced, the DELETE re-checks the age and commits
+    before any file goes, so a chunk that lands in between (moving
+    updated_at) keeps its session. Returns the number of sessions removed.
+    """
+    sessions = UploadSession.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    last_activity = db.func.coalesce(sessions.c.updated_at, sessions.c.created_at)
+    rows = db.session.execute(db.select(sessions.c.id, sessions.c.temp_path)
+                              .where(last_activity < cutoff)).all()
+    gone = []
+    for upload_id, temp_path in rows:
+        deleted = db.session.execute(db.delete(sessions)
+                                     .where(sessions.c.id == upload_id, last_activity < cutoff))
+        if deleted.rowcount:
+            gone.append(temp_path)
+    db.session.commit()
+    for temp_path in gone:
+        store.discard(temp_path)
+    return len(gone)
+
+
+def remove_unowned_paths(store, paths):
+    """Unlink files left by deleted legacy images, unless a row uses them again."""
+    removed = 0
+    for relpath in paths:
+        if Image.query.filter_by(url=URL_PREFIX + relpath).first():
+            continue
+        removed += _remove(store, relpath)
+    return removed
+
+
+def _walk_files(root, relroot=""):
+    """(relpath, DirEntry) for every file under root, using os.scandir."""
+    try:
+        entries = os.scandir(root)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            relpath = f"{relroot}/{entry.name}" if relroot else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(entry.path, relpath)
+            elif entry.is_file(follow_symlinks=False):
+                yield relpath, entry
+
+
+def _referenced_paths():
+    """Every path under uploads/ that some row points at."""
+    paths = set()
+    for (path,) in db.session.execute(db.select(Blob.path)).yield_per(1000):
+        paths.update(blob_file_paths(path))
+    legacy = (db.select(Image.url, Image.variants)
+              .where(Image.blob_hash.is_(None)))
+    for url, variants in db.session.execute(legacy).yield_per(1000):
+        paths.update(legacy_file_paths(url, variants))
+    notes = db.select(Folder.notes_images).where(Folder.notes_images.is_not(None))
+    for (entries,) in db.session.execute(notes).yield_per(1000):
+        for entry in entries or []:
+            # Old rows hold bare filenames in uploads/, newer ones blob urls
+            relpath = _relpath_from_url(entry) or (entry if isinstance(entry, str) else None)
+            if relpath:
+                paths.add(relpath)
+    return paths
+
+
+def _recount_refs():
+    """Set every blob's ref_count from the rows that actually reference it."""
+    counts = dict(db.session.execute(db.select(Image.blob_hash, db.func.count())
+                                     .where(Image.blob_hash.is_not(None))
+                                     .group_by(Image.blob_hash)).all())
+    notes = db.select(Folder.notes_images).where(Folder.notes_images.is_not(None))
+    for (urls,) in db.session.execute(notes).yield_per(1000):
+        for url in urls or []:
+            blob_hash = Blob.hash_from_url(url)
+            if blob_hash:
+                counts[blob_hash] = counts.get(blob_hash, 0) + 1
+
+    fixed = 0
+    now = datetime.utcnow()
+    for blob in Blob.query.yield_per(1000):
+        actual = counts.get(blob.hash, 0)
+        if blob.ref_count != actual or (actual == 0 and blob.unreferenced_at is None):
+            blob.ref_count = actual
+            blob.unreferenced_at = (blob.unreferenced_at or now) if actual == 0 else None
+            fixed += 1
+    db.session.commit()
+    return fixed
+
+
+def reconcile(store, delete_orphans=False, dry_run=False, grace=GC_GRACE):
+    """Bring the database and uploads/ back in line.
+
+    - recomputes Blob.ref_count (and unreferenced_at) from images and notes,
+      so the collector picks up anything the counters missed;
+    - finds files no row references (older than grace, so in-flight uploads
+      are left alone) and removes them only with delete_orphans, since
+      uploads/ may hold files copied in by hand; stale temp files always go,
+      except the partial files of open upload sessions (those expire with
+      their session, see expire_upload_sessions);
+    - reports rows whose file is missing; those need a re-upload, not a delete.
+
+    Returns a summary dict. dry_run only reports.
+    """
+    summary = {"refs_fixed": 0, "orphan_files": 0, "orphan_bytes": 0,
+               "temp_files": 0, "missing_blobs": [], "missing_images": []}
+    if not dry_run:
+        summary["refs_fixed"] = _recount_refs()
+
+    referenced = _referenced_paths()
+    # temp_path is absolute; a paused resumable upload may be days old
+    for (temp_path,) in db.session.execute(db.select(UploadSession.temp_path)):
+        referenced.add(os.path.relpath(temp_path, store.root).replace(os.sep, "/"))
+    now = time.time()
+    tmp_prefix = BLOB_DIR + "/tmp/"
+    for relpath, entry in _walk_files(store.root):
+        if relpath in referenced:
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        max_age = TEMP_MAX_AGE if relpath.startswith(tmp_prefix) else grace
+        if now - stat.st_mtime < max_age:
+            continue
+        if relpath.startswith(tmp_prefix):
+            summary["temp_files"] += 1
+            if not dry_run:
+                _remove(store, relpath)
+            continue
+        summary["orphan_files"] += 1
+        summary["orphan_bytes"] += stat.st_size
+        if delete_orphans and not dry_run:
+            _remove(store, relpath)
+
+    for blob_hash, path in db.session.execute(db.select(Blob.hash, Blob.path)).yield_per(1000):
+        if not os.path.exists(store.path(path)):
+            summary["missing_blobs"].append(blob_hash)
+    legacy = db.select(Image.id, Image.url).where(Image.blob_hash.is_(None))
+    for image_id, url in db.session.execute(legacy).yield_per(1000):
+        relpath = _relpath_from_url(url)
+        if relpath is None or not os.path.exists(store.path(relpath)):
+            summary["missing_images"].append(image_id)
+    return summary
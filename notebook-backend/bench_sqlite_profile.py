@@ -0,0 +1,147 @@
+# bench_sqlite_profile.py - read latency under autosave load, default vs tuned SQLite
+#
+#   python bench_sqlite_profile.py [--seconds 10] [--readers 4] [--autosave-ms 50]
+#
+# Builds a throwaway database shaped like the journal (folders with a few KB
+# of notes, images per folder), then runs one thread doing autosave-style
+# UPDATE + COMMIT in a loop while reader threads run the folder-list and
+# gallery queries. Each profile gets a fresh copy of the same database.
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from app.utils.sqlite_profile import apply_sqlite_profile
+
+SCHEMA = [
+    """CREATE TABLE folders (id INTEGER PRIMARY KEY, date VARCHAR(10) NOT NULL,
+       notes_html TEXT, version INTEGER NOT NULL DEFAULT 1, updated_at DATETIME)""",
+    """CREATE TABLE images (id INTEGER PRIMARY KEY, folder_id INTEGER NOT NULL REFERENCES folders(id),
+       filename VARCHAR(255), uploaded_at DATETIME)""",
+    "CREATE INDEX ix_images_folder_id ON images (folder_id)",
+]
+
+LIST_QUERY = text("""
+    SELECT f.id, f.date, f.version,
+           (SELECT count(*) FROM images i WHERE i.folder_id = f.id) AS image_count
+    FROM folders f ORDER BY f.date DESC, f.id DESC LIMIT 50""")
+GALLERY_QUERY = text("SELECT id, filename FROM images WHERE folder_id = :id ORDER BY uploaded_at")
+AUTOSAVE_QUERY = text("UPDATE folders SET notes_html = :html, version = version + 1, "
+                      "updated_at = CURRENT_TIMESTAMP WHERE id = :id")
+
+
+def seed(path, folders):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        for i in range(1, folders + 1):
+            conn.execute(text("INSERT INTO folders (id, date, notes_html) VALUES (:id, :date, :html)"),
+                         {"id": i, "date": f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+                          "html": "<p>" + "note text " * 400 + "</p>"})
+            conn.execute(text("INSERT INTO images (folder_id, filename, uploaded_at) "
+                              "VALUES (:id, 'img.jpg', CURRENT_TIMESTAMP)"),
+                         [{"id": i}] * 8)
+    engine.dispose()
+
+
+def make_engines(path, tuned):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        # What run.py used to do: one default pool for everything
+        engine = create_engine(url)
+        return engine, engine
+    writer = create_engine(url, pool_size=1, max_overflow=0)
+    reader = create_engine(url, pool_size=8, max_overflow=8)
+    apply_sqlite_profile(writer)
+    apply_sqlite_profile(reader, read_only=True)
+    return writer, reader
+
+
+def run_profile(path, tuned, seconds, readers, autosave_ms, folders):
+    writer, reader = make_engines(path, tuned)
+    stop = threading.Event()
+    latencies, errors, saves = [], [], [0]
+    lock = threading.Lock()
+
+    def autosave():
+        rng = random.Random(1)
+        while not stop.is_set():
+            with writer.begin() as conn:
+                conn.execute(AUTOSAVE_QUERY, {"id": rng.randint(1, folders),
+                                              "html": "<p>" + "edited " * rng.randint(300, 600) + "</p>"})
+            saves[0] += 1
+            time.sleep(autosave_ms / 1000)
+
+    def read(seed_value):
+        rng = random.Random(seed_value)
+        local, failed = [], 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with reader.connect() as conn:
+                    conn.execute(LIST_QUERY).fetchall()
+                    conn.execute(GALLERY_QUERY, {"id": rng.randint(1, folders)}).fetchall()
+                local.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=autosave)]
+    threads += [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    writer.dispose()
+    reader.dispose()
+    return latencies, sum(errors), saves[0]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--autosave-ms", type=int, default=50, help="pause between autosaves")
+    parser.add_argument("--folders", type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="nb-bench-")
+    try:
+        template = os.path.join(workdir, "template.db")
+        seed(template, args.folders)
+        print(f"{args.readers} readers, autosave every {args.autosave_ms} ms, {args.seconds:g}s per profile\n")
+        print(f"{'profile':<10}{'reads/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+              f"{'errors':>8}{'saves':>7}")
+        for name, tuned in (("default", False), ("tuned", True)):
+            path = os.path.join(workdir, f"{name}.db")
+            shutil.copy(template, path)
+            latencies, errors, saves = run_profile(path, tuned, args.seconds, args.readers,
+                                                   args.autosave_ms, args.folders)
+            if not latencies:
+                print(f"{name:<10} no successful reads ({errors} errors)")
+                continue
+            print(f"{name:<10}{len(latencies) / args.seconds:>9.0f}"
+                  f"{statistics.median(latencies):>9.2f}{percentile(latencies, 95):>9.2f}"
+                  f"{percentile(latencies, 99):>9.2f}{max(latencies):>9.2f}{errors:>8}{saves:>7}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
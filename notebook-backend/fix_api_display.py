@@ -1,7 +1,11 @@
 import re
+import textwrap
 
-# Read current run.py
-with open('run.py', 'r') as f:
+# The page shell and the styles live in separate files now, not inline in run.py
+TEMPLATE_PATH = 'templates/index.html'
+CSS_PATH = 'static/css/app.css'
+
+with open(TEMPLATE_PATH, 'r') as f:
     content = f.read()
 
 # Define the clean API endpoints HTML
@@ -50,8 +54,11 @@ replacement = clean_api_html + '\n            </div>\n        </div>'
 
 content = re.sub(pattern, replacement, content, flags=re.DOTALL)
 
+with open(TEMPLATE_PATH, 'w') as f:
+    f.write(content)
+
 # Now add CSS for the new API display
-new_css = '''
+new_css = textwrap.dedent('''
         /* API Endpoints Styles */
         .endpoints-grid {
             display: grid;
@@ -129,15 +136,11 @@ new_css = '''
         h2 {
             margin: 15px 0 10px 0;
             font-size: 18px;
-        }'''
+        }''')
 
-# Add this CSS before the closing </style> tag
-if '</style>' in content:
-    content = content.replace('</style>', new_css + '\n    </style>')
-
-# Write back
-with open('run.py', 'w') as f:
-    f.write(content)
+# Append it to the stylesheet (later rules win)
+with open(CSS_PATH, 'a') as f:
+    f.write(new_css + '\n')
 
 print("✅ Updated API endpoints display!")
 print("✅ Added clean, organized API documentation")
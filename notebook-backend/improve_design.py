@@ -1,10 +1,14 @@
 import re
+import textwrap
 
-with open('run.py', 'r') as f:
+# The styles live in the static bundle now, not inline in run.py
+CSS_PATH = 'static/css/app.css'
+
+with open(CSS_PATH, 'r') as f:
     content = f.read()
 
 # Find and update the body background (make it cleaner)
-new_body_style = '''
+new_body_style = textwrap.dedent('''
         body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
             line-height: 1.6;
@@ -12,13 +16,13 @@ new_body_style = '''
             background: linear-gradient(135deg, #f6f9fc 0%, #edf2f7 100%);
             min-height: 100vh;
             padding: 20px;
-        }'''
+        }''')
 
 # Replace the body style
 content = re.sub(r'body\s*{[^}]*}', new_body_style, content, flags=re.DOTALL)
 
 # Update container background (make it cleaner)
-new_container_style = '''
+new_container_style = textwrap.dedent('''
         .container {
             max-width: 1400px;
             margin: 0 auto;
@@ -34,14 +38,14 @@ new_container_style = '''
             box-shadow: 0 4px 20px rgba(0,0,0,0.08);
             backdrop-filter: blur(10px);
             border: 1px solid rgba(255, 255, 255, 0.2);
-        }'''
+        }''')
 
 # Replace container styles
 container_pattern = r'\.container\s*{[^}]*}\s*\.sidebar\s*{[^}]*}\s*\.main-content\s*{[^}]*}'
 content = re.sub(container_pattern, new_container_style, content, flags=re.DOTALL)
 
 # Update buttons for cleaner look
-new_buttons = '''
+new_buttons = textwrap.dedent('''
         .btn {
             display: inline-block;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -68,13 +72,13 @@ new_buttons = '''
         
         .btn-success {
             background: linear-gradient(135deg, #48bb78 0%, #38a169 100%);
-        }'''
+        }''')
 
 # Replace button styles
 content = re.sub(r'\.btn\s*{[^}]*}\s*\.btn:hover\s*{[^}]*}\s*\.btn-secondary\s*{[^}]*}\s*\.btn-secondary:hover\s*{[^}]*}', new_buttons, content, flags=re.DOTALL)
 
 # Update image cards for better look
-new_image_cards = '''
+new_image_cards = textwrap.dedent('''
         .image-gallery {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(220px, 1fr));
@@ -122,13 +126,13 @@ new_image_cards = '''
             overflow: hidden;
             text-overflow: ellipsis;
             font-size: 14px;
-        }'''
+        }''')
 
 # Update image card styles
 content = re.sub(r'\.image-gallery\s*{[^}]*}\s*\.image-card\s*{[^}]*}\s*\.image-card:hover\s*{[^}]*}', new_image_cards, content, flags=re.DOTALL)
 
 # Update folder items
-new_folder_items = '''
+new_folder_items = textwrap.dedent('''
         .folder-list {
             list-style: none;
             margin-bottom: 25px;
@@ -177,13 +181,13 @@ new_folder_items = '''
         .active .folder-count {
             background: rgba(102, 126, 234, 0.2);
             color: #4c51bf;
-        }'''
+        }''')
 
 # Update folder styles
 content = re.sub(r'\.folder-list\s*{[^}]*}\s*\.folder-item\s*{[^}]*}', new_folder_items, content, flags=re.DOTALL)
 
 # Write back
-with open('run.py', 'w') as f:
+with open(CSS_PATH, 'w') as f:
     f.write(content)
 
 print("✅ Updated overall design!")
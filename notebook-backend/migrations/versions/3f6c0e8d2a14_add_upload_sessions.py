@@ -0,0 +1,39 @@
+"""add upload sessions for chunked uploads
+
+Revision ID: 3f6c0e8d2a14
+Revises: e27a9d5f1b60
+Create Date: 2026-10-17 15:26:10.093417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c0e8d2a14'
+down_revision = 'e27a9d5f1b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # run.py calls db.create_all() on import, so the table may already exist
+    if sa.inspect(op.get_bind()).has_table('upload_sessions'):
+        return
+    op.create_table('upload_sessions',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('folder_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('total_size', sa.BigInteger(), nullable=True),
+    sa.Column('next_chunk', sa.Integer(), nullable=False),
+    sa.Column('received_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('temp_path', sa.String(length=500), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['folder_id'], ['folders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('upload_sessions')
@@ -0,0 +1,26 @@
+"""add variants to images
+
+Revision ID: 5b8e2d41c9a7
+Revises: 43f922a6e171
+Create Date: 2026-10-17 09:12:31.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2d41c9a7'
+down_revision = '43f922a6e171'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('variants')
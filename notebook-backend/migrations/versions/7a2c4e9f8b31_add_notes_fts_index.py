@@ -0,0 +1,33 @@
+"""add FTS5 full-text index over folder notes
+
+Revision ID: 7a2c4e9f8b31
+Revises: d5e7b3c1a908
+Create Date: 2026-10-17 20:44:02.315870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.search import CREATE_NOTES_FTS, notes_text
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2c4e9f8b31'
+down_revision = 'd5e7b3c1a908'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # run.py creates and fills the index on import if it is missing
+    if sa.inspect(bind).has_table('notes_fts'):
+        return
+    op.execute(CREATE_NOTES_FTS)
+    for folder_id, notes_html in bind.execute(sa.text('SELECT id, notes_html FROM folders')).fetchall():
+        bind.execute(sa.text('INSERT INTO notes_fts (rowid, body) VALUES (:id, :body)'),
+                     {'id': folder_id, 'body': notes_text(notes_html)})
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS notes_fts')
@@ -0,0 +1,37 @@
+"""add folder version and journal state
+
+Revision ID: 9c41f7ab03de
+Revises: 5b8e2d41c9a7
+Create Date: 2026-10-17 11:40:07.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41f7ab03de'
+down_revision = '5b8e2d41c9a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('folders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    # run.py calls db.create_all() on import, so `flask db upgrade` may find
+    # the new table already there
+    if not sa.inspect(op.get_bind()).has_table('journal_state'):
+        op.create_table('journal_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.execute("INSERT OR IGNORE INTO journal_state (id, version) VALUES (1, 1)")
+
+
+def downgrade():
+    op.drop_table('journal_state')
+    with op.batch_alter_table('folders', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,55 @@
+"""add change feed
+
+Revision ID: a6d3f8c1e472
+Revises: f41c7d2b9e85
+Create Date: 2026-10-18 00:12:40.227513
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3f8c1e472'
+down_revision = 'f41c7d2b9e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # run.py calls db.create_all() on import, so the table may already exist
+    if not inspector.has_table('changes'):
+        op.create_table('changes',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('folder_id', sa.Integer(), nullable=True),
+        sa.Column('deleted', sa.Boolean(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('seq'),
+        sa.UniqueConstraint('kind', 'entity_id', name='uq_changes_kind_entity_id'),
+        sqlite_autoincrement=True
+        )
+
+    # Rows from before the feed enter it once, so a first sync returns everything
+    for kind, table, folder_column in (('folder', 'folders', 'id'), ('image', 'images', 'folder_id')):
+        op.execute(f"INSERT INTO changes (kind, entity_id, folder_id, deleted, changed_at) "
+                   f"SELECT '{kind}', id, {folder_column}, 0, CURRENT_TIMESTAMP FROM {table} "
+                   f"WHERE id NOT IN (SELECT entity_id FROM changes WHERE kind = '{kind}') ORDER BY id")
+
+    if 'feed_id' not in {c['name'] for c in inspector.get_columns('journal_state')}:
+        with op.batch_alter_table('journal_state', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('feed_id', sa.String(length=32), nullable=True))
+    bind.execute(sa.text('UPDATE journal_state SET feed_id = :feed_id WHERE feed_id IS NULL'),
+                 {'feed_id': uuid.uuid4().hex})
+
+
+def downgrade():
+    with op.batch_alter_table('journal_state', schema=None) as batch_op:
+        batch_op.drop_column('feed_id')
+
+    op.drop_table('changes')
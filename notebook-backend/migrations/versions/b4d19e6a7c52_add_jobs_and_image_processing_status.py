@@ -0,0 +1,44 @@
+"""add jobs table and image processing status
+
+Revision ID: b4d19e6a7c52
+Revises: 3f6c0e8d2a14
+Create Date: 2026-10-17 16:48:33.610275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d19e6a7c52'
+down_revision = '3f6c0e8d2a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # run.py calls db.create_all() on import, so the table may already exist
+    if not sa.inspect(op.get_bind()).has_table('jobs'):
+        op.create_table('jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_jobs_status'), 'jobs', ['status'], unique=False)
+
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_status', sa.String(length=20), nullable=False, server_default='ready'))
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('processing_status')
+
+    op.drop_index(op.f('ix_jobs_status'), table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,47 @@
+"""image metadata: dimensions, size, type, capture time, dominant colour
+
+Revision ID: b92e6c4f1d37
+Revises: a6d3f8c1e472
+Create Date: 2026-10-18 01:20:33.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b92e6c4f1d37'
+down_revision = 'a6d3f8c1e472'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('width', sa.Integer()),
+    ('height', sa.Integer()),
+    ('byte_size', sa.Integer()),
+    ('mime_type', sa.String(length=50)),
+    ('taken_at', sa.DateTime()),
+    ('dominant_color', sa.String(length=7)),
+]
+
+
+def upgrade():
+    # run.py calls db.create_all() on import, but that never adds columns to
+    # an existing table; check anyway in case an earlier run got partway
+    existing = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('images')}
+    missing = [(name, type_) for name, type_ in COLUMNS if name not in existing]
+    if missing:
+        with op.batch_alter_table('images', schema=None) as batch_op:
+            for name, type_ in missing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+    # Byte size is already known for blob images; the rest needs the files,
+    # which `flask backfill-image-metadata` reads (too slow for a migration)
+    op.execute("UPDATE images SET byte_size = "
+               "(SELECT size FROM blobs WHERE blobs.hash = images.blob_hash) "
+               "WHERE byte_size IS NULL AND blob_hash IS NOT NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,29 @@
+"""image placeholder (tiny inlined WebP)
+
+Revision ID: c3f7a9d2e614
+Revises: b92e6c4f1d37
+Create Date: 2026-10-18 02:04:51.662190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f7a9d2e614'
+down_revision = 'b92e6c4f1d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by the image job, and for existing rows by `flask backfill-image-metadata`
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('images')}
+    if 'placeholder' not in columns:
+        with op.batch_alter_table('images', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('placeholder', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_column('placeholder')
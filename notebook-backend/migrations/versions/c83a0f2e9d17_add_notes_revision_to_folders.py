@@ -0,0 +1,28 @@
+"""add notes revision and hash to folders
+
+Revision ID: c83a0f2e9d17
+Revises: b4d19e6a7c52
+Create Date: 2026-10-17 18:05:44.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83a0f2e9d17'
+down_revision = 'b4d19e6a7c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('folders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notes_revision', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('notes_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('folders', schema=None) as batch_op:
+        batch_op.drop_column('notes_hash')
+        batch_op.drop_column('notes_revision')
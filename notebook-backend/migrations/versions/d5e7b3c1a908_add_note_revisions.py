@@ -0,0 +1,39 @@
+"""add note revisions history
+
+Revision ID: d5e7b3c1a908
+Revises: c83a0f2e9d17
+Create Date: 2026-10-17 19:31:18.447026
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e7b3c1a908'
+down_revision = 'c83a0f2e9d17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # run.py calls db.create_all() on import, so the table may already exist
+    if sa.inspect(op.get_bind()).has_table('note_revisions'):
+        return
+    op.create_table('note_revisions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('folder_id', sa.Integer(), nullable=False),
+    sa.Column('revision', sa.Integer(), nullable=False),
+    sa.Column('is_snapshot', sa.Boolean(), nullable=False),
+    sa.Column('snapshot_revision', sa.Integer(), nullable=False),
+    sa.Column('chain_bytes', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['folder_id'], ['folders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('folder_id', 'revision')
+    )
+
+
+def downgrade():
+    op.drop_table('note_revisions')
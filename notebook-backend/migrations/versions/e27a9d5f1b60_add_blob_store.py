@@ -0,0 +1,43 @@
+"""add content-addressed blob store
+
+Revision ID: e27a9d5f1b60
+Revises: 9c41f7ab03de
+Create Date: 2026-10-17 14:03:52.771904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e27a9d5f1b60'
+down_revision = '9c41f7ab03de'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # run.py calls db.create_all() on import, so the table may already exist
+    if not sa.inspect(op.get_bind()).has_table('blobs'):
+        op.create_table('blobs',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('hash')
+        )
+
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_images_blob_hash'), ['blob_hash'], unique=False)
+        batch_op.create_foreign_key('fk_images_blob_hash_blobs', 'blobs', ['blob_hash'], ['hash'])
+
+
+def downgrade():
+    with op.batch_alter_table('images', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_images_blob_hash_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_images_blob_hash'))
+        batch_op.drop_column('blob_hash')
+
+    op.drop_table('blobs')
@@ -0,0 +1,77 @@
+"""typed folder date and access-path indexes
+
+Revision ID: e8b1d4a6c203
+Revises: 7a2c4e9f8b31
+Create Date: 2026-10-17 21:32:51.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.dates import parse_date
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b1d4a6c203'
+down_revision = '7a2c4e9f8b31'
+branch_labels = None
+depends_on = None
+
+
+def _normalize_dates(bind):
+    # DATE is stored as 'YYYY-MM-DD' text, so the rebuild copies rows as-is.
+    # Pad hand-typed dates like '2024-4-8' first; anything unparseable would
+    # only blow up later when the ORM reads it.
+    bad, dupes, seen = [], [], set()
+    for folder_id, value in bind.execute(sa.text('SELECT id, date FROM folders')).fetchall():
+        try:
+            normalized = parse_date(value).isoformat()
+        except ValueError:
+            bad.append(f'{folder_id}={value!r}')
+            continue
+        if normalized != value:
+            bind.execute(sa.text('UPDATE folders SET date = :date WHERE id = :id'),
+                         {'date': normalized, 'id': folder_id})
+        if normalized in seen:
+            dupes.append(normalized)
+        seen.add(normalized)
+    if bad or dupes:
+        raise RuntimeError('Fix folders.date before upgrading. '
+                           f'Not a date: {bad or "none"}; duplicated: {dupes or "none"}')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'ix_images_folder_id_uploaded_at' not in {i['name'] for i in inspector.get_indexes('images')}:
+        op.create_index('ix_images_folder_id_uploaded_at', 'images', ['folder_id', 'uploaded_at'])
+
+    # run.py's create_all may already have built folders with the new schema
+    if 'ix_folders_date' in {i['name'] for i in inspector.get_indexes('folders')}:
+        return
+    _normalize_dates(bind)
+
+    # Rebuild from the reflected table minus the old unnamed UNIQUE(date),
+    # which the named unique index replaces. The type is swapped on the copy
+    # source rather than with alter_column, which would copy the rows through
+    # CAST(date AS DATE) -- NUMERIC affinity in SQLite, '2024-03-01' -> 2024.
+    folders = sa.Table('folders', sa.MetaData(), autoload_with=bind)
+    for constraint in list(folders.constraints):
+        if isinstance(constraint, sa.UniqueConstraint):
+            folders.constraints.discard(constraint)
+    folders.c.date.type = sa.Date()
+    with op.batch_alter_table('folders', copy_from=folders, recreate='always') as batch_op:
+        batch_op.create_index('ix_folders_date', ['date'], unique=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    folders = sa.Table('folders', sa.MetaData(), autoload_with=bind)
+    folders.c.date.type = sa.String(length=10)
+    # Back to the UNIQUE(date) of the initial schema that upgrade() dropped
+    if not any(isinstance(c, sa.UniqueConstraint) for c in folders.constraints):
+        folders.append_constraint(sa.UniqueConstraint('date'))
+    with op.batch_alter_table('folders', copy_from=folders, recreate='always') as batch_op:
+        batch_op.drop_index('ix_folders_date')
+    op.drop_index('ix_images_folder_id_uploaded_at', table_name='images')
@@ -0,0 +1,51 @@
+"""deferred file deletion: blob unreferenced_at, delayed jobs
+
+Revision ID: f41c7d2b9e85
+Revises: e8b1d4a6c203
+Create Date: 2026-10-17 23:05:12.318840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f41c7d2b9e85'
+down_revision = 'e8b1d4a6c203'
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    return {c['name'] for c in inspector.get_columns(table)}
+
+
+def upgrade():
+    # run.py calls db.create_all() on import, so new tables may already have these
+    inspector = sa.inspect(op.get_bind())
+
+    if 'unreferenced_at' not in _columns(inspector, 'blobs'):
+        with op.batch_alter_table('blobs', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('unreferenced_at', sa.DateTime(), nullable=True))
+            batch_op.create_index(batch_op.f('ix_blobs_unreferenced_at'), ['unreferenced_at'], unique=False)
+    # Blobs already at zero start their grace period now
+    op.execute("UPDATE blobs SET unreferenced_at = CURRENT_TIMESTAMP "
+               "WHERE ref_count <= 0 AND unreferenced_at IS NULL")
+
+    if 'run_after' not in _columns(inspector, 'jobs'):
+        with op.batch_alter_table('jobs', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('run_after', sa.DateTime(), nullable=True))
+
+    if 'notes_images' not in _columns(inspector, 'folders'):
+        with op.batch_alter_table('folders', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('notes_images', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    # folders.notes_images predates this revision in most databases; leave it
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('run_after')
+
+    with op.batch_alter_table('blobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blobs_unreferenced_at'))
+        batch_op.drop_column('unreferenced_at')
@@ -1,1213 +1,366 @@
 # run.py - ENHANCED VERSION WITH FASTER LOADING AND RICH TEXT EDITOR
-from flask import Flask, jsonify, request, send_from_directory, render_template_string
+from flask import Flask, jsonify, request, render_template, Response, stream_with_context
 from flask_migrate import Migrate
 from datetime import datetime
+from functools import lru_cache
+import hashlib
 import os
+import sys
+import threading
 from werkzeug.utils import secure_filename
-import time
+from sqlalchemy.exc import IntegrityError
+import uuid
+import click
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows: chunk requests for one upload aren't serialized
+    fcntl = None
 
 # Import db from app module
 from app import db
-from app.models import Folder, Image
+from app.models import Folder, Image, Blob, UploadSession, NoteRevision, JournalState, Change
+from app.utils.assets import AssetManifest
+from app.utils.blob_store import BlobStore
+from app.utils.dates import parse_date, date_range
+from app.utils.jobs import JobQueue
+from app.utils.journal_archive import ArchiveError, export_journal, import_journal
+from app.utils.sqlite_profile import sqlite_engine_config, init_sqlite_profile
+from app.utils.search import ensure_search_index, search_notes
+from app.utils.response_cache import ResponseCache
+from app.utils.events import EventBroker
+from app.utils.compression import init_compression, precompressed_response
+from app.utils.http_cache import make_etag, query_fingerprint, is_not_modified, not_modified, with_etag
+from app.utils.image_service import generate_derivatives, extract_metadata
+from app.utils.image_metadata import backfill_metadata
+from app.utils.notes import PatchError, apply_patch, set_notes, reconstruct_revision, compact_notes
+from app.utils.static_files import send_immutable, mark_immutable
+from app.utils.storage_gc import (GC_JOB, collect_unreferenced, legacy_file_paths,
+                                  reconcile, remove_unowned_paths, schedule_collection,
+                                  expire_upload_sessions, UPLOAD_SESSION_MAX_AGE)
 
 app = Flask(__name__)
 
 # Use absolute path for database to avoid permission issues
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Database setup
-os.makedirs(os.path.join(basedir, 'instance'), exist_ok=True)
-db_path = os.path.join(basedir, 'instance', 'notebook.db')
+# Database setup (NOTEBOOK_DB_PATH points it elsewhere, e.g. for the tests)
+db_path = os.environ.get('NOTEBOOK_DB_PATH') or os.path.join(basedir, 'instance', 'notebook.db')
+os.makedirs(os.path.dirname(db_path), exist_ok=True)
 database_uri = f'sqlite:///{db_path}'
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# WAL + tuned pragmas, one writer connection and a pool of read-only ones
+app.config.update(sqlite_engine_config(database_uri))
 
 # File upload configuration
-UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'uploads')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp'}
 
+# Behind nginx set UPLOADS_ACCEL_REDIRECT to an `internal` location aliased to
+# UPLOAD_FOLDER; behind Apache/lighttpd set USE_X_SENDFILE=1. Either way the
+# front server streams image bytes instead of a Python worker.
+app.config['UPLOADS_ACCEL_REDIRECT'] = os.environ.get('UPLOADS_ACCEL_REDIRECT')
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+
 # Create upload folder
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-print(f"✓ Database: {database_uri}")
-print(f"✓ Upload folder: {UPLOAD_FOLDER}")
+# New uploads are content-addressed under UPLOAD_FOLDER/blobs/
+blob_store = BlobStore(UPLOAD_FOLDER)
+
+# Startup notes go to stderr: `flask export-journal > backup.tar` writes the
+# archive to stdout, and this module is imported first
+print(f"✓ Database: {database_uri}", file=sys.stderr)
+print(f"✓ Upload folder: {UPLOAD_FOLDER}", file=sys.stderr)
 
 # Initialize db with app
 db.init_app(app)
 
+# gzip (and brotli when installed) for text responses
+init_compression(app)
+
 # Don't initialize migrate if you don't have flask_migrate installed
 try:
     migrate = Migrate(app, db)
-    print("✓ Flask-Migrate initialized")
+    print("✓ Flask-Migrate initialized", file=sys.stderr)
 except:
-    print("⚠ Flask-Migrate not installed, continuing without migrations")
+    print("⚠ Flask-Migrate not installed, continuing without migrations", file=sys.stderr)
 
 # ===== HELPER FUNCTIONS =====
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def create_image_record(folder_id, stream, filename):
+    """Store an upload's bytes and add (not commit) its Image row.
+    
+    Identical bytes are stored once: a repeat upload reuses the existing
+    blob and its derivatives, so only a new row is written.
+    """
+    filename = secure_filename(filename)
+    blob, created = Blob.store(blob_store, stream, filename)
+    return add_image_for_blob(folder_id, blob, created, filename)
+
+def add_image_for_blob(folder_id, blob, created, filename):
+    name, ext = os.path.splitext(filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+    unique_filename = f"{name}_{timestamp}{ext}"
+    
+    sibling = None
+    if not created:
+        metadata_columns = [getattr(Image, field) for field in Image.METADATA_FIELDS]
+        sibling = (db.session.query(Image.variants, Image.processing_status, *metadata_columns)
+                   .filter_by(blob_hash=blob.hash).limit(1).first())
+    
+    image = Image(
+        filename=unique_filename,
+        original_filename=filename,
+        url=blob.url,
+        folder_id=folder_id,
+        blob_hash=blob.hash
+    )
+    if sibling is not None:
+        # Same bytes already processed (or being processed) for another image
+        image.variants, image.processing_status = sibling.variants, sibling.processing_status
+        for field in Image.METADATA_FIELDS:
+            setattr(image, field, getattr(sibling, field))
+    else:
+        # Derivatives are built off the request thread, see process_image_job;
+        # the header is cheap, so the gallery gets dimensions right away
+        image.variants = {}
+        image.processing_status = 'pending'
+        for field, value in extract_metadata(blob_store.path(blob.path), decode=False).items():
+            setattr(image, field, value)
+        job_queue.enqueue('image.process', {'blob_hash': blob.hash})
+    db.session.add(image)
+    return image
+
+# Chunked uploads: each chunk is one request, so MAX_CONTENT_LENGTH caps the
+# chunk size and this caps the whole file
+app.config['MAX_CHUNKED_UPLOAD_SIZE'] = 1024 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # suggested to clients
+STREAM_COPY_SIZE = 1024 * 1024
+
+# Folder list pagination: the cursor is "<date>,<id>" of the last folder sent
+MAX_FOLDER_PAGE_SIZE = 500
+
+# folders.date is UNIQUE: moving a folder onto a taken day is a 409, not a 500
+DATE_TAKEN_ERROR = 'Folder for that date already exists'
+
+def date_taken(folder, day):
+    return db.session.query(Folder.id).filter(Folder.date == day, Folder.id != folder.id).first() is not None
+
+def is_date_conflict(error):
+    # A concurrent write took the day between the check and the commit
+    return 'folders.date' in str(error.orig)
+
+def make_folder_cursor(folder_dict):
+    return f"{folder_dict['date']},{folder_dict['id']}"
+
+def parse_folder_cursor(cursor):
+    date_str, _, id_str = cursor.rpartition(',')
+    if not date_str or not id_str.isdigit():
+        return None
+    try:
+        return parse_date(date_str), int(id_str)
+    except ValueError:
+        return None
+
 # ===== CREATE DATABASE TABLES =====
 with app.app_context():
+    init_sqlite_profile(db)
     db.create_all()
-    print("✓ Database tables created")
+    ensure_search_index()
+    print("✓ Database tables created", file=sys.stderr)
+
+# ===== BACKGROUND JOBS =====
+# CPU-heavy image work runs here instead of in the request thread. Job rows
+# live in SQLite, so work queued before a restart still gets done.
+job_queue = JobQueue(app, workers=2)
+
+@job_queue.handler('image.process', on_failure=lambda payload, error: mark_blob_images(payload['blob_hash'], 'failed'))
+def process_image_job(payload):
+    blob = db.session.get(Blob, payload['blob_hash'])
+    if blob is None:
+        return
+    # Gallery thumb + medium preview, so tiles don't pull the full original
+    path = blob_store.path(blob.path)
+    variants = generate_derivatives(path, blob.url.rsplit('/', 1)[0] + '/')
+    mark_blob_images(blob.hash, 'ready', variants, extract_metadata(path))
+
+# Files are never unlinked inside a request: deletes only drop rows (blob
+# ref_counts fall to 0 and get stamped), and this job removes the files once
+# the grace period is over, after its own DELETE has committed
+@job_queue.handler(GC_JOB)
+def storage_gc_job(payload):
+    remove_unowned_paths(blob_store, payload.get('paths', []))
+    collect_unreferenced(blob_store)
+    expire_upload_sessions(blob_store)
+    # Come back while resumable uploads are open, so abandoned ones expire
+    if db.session.query(UploadSession.id).limit(1).scalar() is not None:
+        schedule_collection(job_queue, delay=UPLOAD_SESSION_MAX_AGE)
+
+def mark_blob_images(blob_hash, status, variants=None, metadata=None):
+    # Through the ORM (not a bulk UPDATE) so folder versions / ETags move
+    for image in Image.query.filter_by(blob_hash=blob_hash, processing_status='pending'):
+        image.processing_status = status
+        if variants is not None:
+            image.variants = variants
+        for field, value in (metadata or {}).items():
+            setattr(image, field, value)
+
+@app.before_request
+def route_reads():
+    # GETs read through the reader pool and never queue behind an autosave
+    db.session.info['read_only'] = request.method in ('GET', 'HEAD')
+
+@app.before_request
+def start_job_workers():
+    # Started lazily so the debug reloader's parent process never runs workers
+    job_queue.start()
+
+# ===== RESPONSE CACHE =====
+# Serialized bodies of the folder list / folder / images / bundle endpoints,
+# keyed by their ETag, so a repeat read costs one version lookup instead of
+# the query, the dicts and the JSON encoding. Commits drop the entries they
+# made stale (app/utils/response_cache.py).
+app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_MAX_BYTES'])
+response_cache.listen()
+
+# Image fields the gallery renders on folder open; the page reads this list
+# from the shell (data-bundle-image-fields), so the warm-up below requests
+# the exact URL the page will and hits the same cache entry
+BUNDLE_IMAGE_FIELDS = ','.join(['filename', 'url', 'thumb_url', 'srcset', 'processing_status',
+                                'uploaded_at', 'width', 'height', 'byte_size', 'taken_at',
+                                'dominant_color', 'placeholder'])
+
+# What the page asks for first (FOLDER_PAGE_SIZE in app.js)
+WARM_FOLDER_LIST_URL = '/api/folder=;?view=summary&limit=60'
+WARM_BUNDLE_URL = '/api/folder=./{id}/bundle;?fields[image]=' + BUNDLE_IMAGE_FIELDS
+WARM_FOLDERS = 5
+_cache_warmup = threading.Event()
+
+def cached_json(etag, folder_id, build):
+    """jsonify(build()) with the ETag, reusing the body while the etag is current.
+    
+    folder_id is the folder the body depends on, None for journal-wide ones.
+    """
+    body = response_cache.get(etag)
+    if body is None:
+        body = jsonify(build()).get_data()
+        response_cache.put(etag, body, folder_id)
+    return with_etag(app.response_class(body, mimetype='application/json'), etag)
+
+def warm_response_cache():
+    client = app.test_client()
+    client.get(WARM_FOLDER_LIST_URL)
+    with app.app_context():
+        folder_ids = db.session.execute(db.select(Folder.id)
+                                        .order_by(Folder.date.desc())
+                                        .limit(WARM_FOLDERS)).scalars().all()
+    for folder_id in folder_ids:
+        client.get(WARM_BUNDLE_URL.format(id=folder_id))
+
+@app.before_request
+def start_cache_warmup():
+    # Lazily for the same reason as the workers; in the background so the
+    # first request doesn't wait for it
+    if not _cache_warmup.is_set():
+        _cache_warmup.set()
+        threading.Thread(target=warm_response_cache, name='cache-warmup', daemon=True).start()
+
+@app.route('/api/cache;', methods=['GET'])
+def response_cache_stats_api():
+    response = jsonify({'success': True, 'cache': response_cache.stats()})
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# ===== FRONTEND =====
+# templates/index.html is a small shell; the CSS and JS live in static/ and
+# are served from /assets/ under content-hashed names (app/utils/assets.py),
+# so browsers keep them forever and only revalidate the shell.
+assets = AssetManifest(os.path.join(basedir, 'static'), ['css/app.css', 'js/app.js'])
+
+@app.context_processor
+def asset_helpers():
+    return {'asset_url': assets.url, 'bundle_image_fields': BUNDLE_IMAGE_FIELDS}
+
+@lru_cache(maxsize=1)
+def index_shell():
+    html = render_template('index.html')
+    return html, make_etag('index', hashlib.sha256(html.encode('utf-8')).hexdigest()[:16])
 
-# ===== ENHANCED FRONTEND WITH RICH TEXT EDITOR =====
 @app.route('/')
 def index():
-    return '''
-<!DOCTYPE html>
-<html>
-<head>
-    <title>Notebook</title>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-        }
-        
-        body {
-            background: #f5f5f7;
-            color: #1d1d1f;
-            line-height: 1.5;
-            padding: 20px;
-        }
-        
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            display: grid;
-            grid-template-columns: 280px 1fr;
-            gap: 30px;
-        }
-        
-        .sidebar {
-            background: white;
-            border-radius: 12px;
-            padding: 20px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-            height: fit-content;
-        }
-        
-        .main-content {
-            background: white;
-            border-radius: 12px;
-            padding: 25px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-        }
-        
-        h1 {
-            font-size: 32px;
-            font-weight: 600;
-            color: #1d1d1f;
-            margin-bottom: 25px;
-            padding-bottom: 15px;
-            border-bottom: 1px solid #e5e5e7;
-        }
-        
-        h2 {
-            font-size: 20px;
-            font-weight: 500;
-            color: #1d1d1f;
-            margin: 25px 0 15px 0;
-            padding-bottom: 10px;
-            border-bottom: 1px solid #e5e5e7;
-        }
-        
-        .folder-controls {
-            display: flex;
-            gap: 10px;
-            margin-bottom: 20px;
-        }
-        
-        .btn {
-            padding: 10px 18px;
-            border: none;
-            border-radius: 8px;
-            font-weight: 500;
-            cursor: pointer;
-            transition: all 0.2s;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
-        
-        .btn-primary {
-            background: #007aff;
-            color: white;
-            flex: 1;
-        }
-        
-        .btn-primary:hover {
-            background: #0056cc;
-        }
-        
-        .btn-secondary {
-            background: #8e8e93;
-            color: white;
-            flex: 1;
-        }
-        
-        .btn-secondary:hover {
-            background: #6d6d72;
-        }
-        
-        .folder-list {
-            list-style: none;
-        }
-        
-        .folder-item {
-            padding: 15px;
-            margin: 8px 0;
-            background: #f5f5f7;
-            border-radius: 8px;
-            border-left: 4px solid transparent;
-            cursor: pointer;
-            transition: all 0.2s;
-        }
-        
-        .folder-item:hover {
-            background: #e5e5e7;
-            transform: translateX(2px);
-        }
-        
-        .folder-item.active {
-            background: #e8f4ff;
-            border-left-color: #007aff;
-        }
-        
-        .folder-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 8px;
-        }
-        
-        .folder-date {
-            font-weight: 500;
-            color: #1d1d1f;
-        }
-        
-        .folder-image-count {
-            color: #ff3b30;
-            font-size: 14px;
-            font-weight: 500;
-        }
-        
-        .image-indicator {
-            color: #ff3b30;
-            font-size: 12px;
-            margin-top: 5px;
-            display: flex;
-            align-items: center;
-            gap: 5px;
-        }
-        
-        .image-gallery {
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(180px, 1fr));
-            gap: 20px;
-            margin: 20px 0 30px 0;
-        }
-        
-        .image-item {
-            background: #f5f5f7;
-            border-radius: 8px;
-            overflow: hidden;
-            border: 1px solid #e5e5e7;
-            transition: transform 0.2s;
-        }
-        
-        .image-item:hover {
-            transform: translateY(-4px);
-        }
-        
-        .image-preview {
-            width: 100%;
-            height: 120px;
-            object-fit: cover;
-            background: #e5e5e7;
-        }
-        
-        .image-info {
-            padding: 12px;
-        }
-        
-        .image-name {
-            font-weight: 500;
-            margin-bottom: 5px;
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-        }
-        
-        .image-date {
-            color: #8e8e93;
-            font-size: 12px;
-        }
-        
-        .notes-controls {
-            display: flex;
-            gap: 10px;
-            margin: 20px 0;
-        }
-        
-        .btn-danger {
-            background: #ff3b30;
-            color: white;
-        }
-        
-        .btn-danger:hover {
-            background: #d70015;
-        }
-        
-        /* RICH TEXT EDITOR STYLES */
-        .editor-container {
-            border: 1px solid #e5e5e7;
-            border-radius: 8px;
-            overflow: hidden;
-            margin-bottom: 20px;
-        }
-        
-        .editor-toolbar {
-            background: #f5f5f7;
-            padding: 12px;
-            border-bottom: 1px solid #e5e5e7;
-            display: flex;
-            flex-wrap: wrap;
-            gap: 8px;
-            align-items: center;
-        }
-        
-        .toolbar-btn {
-            background: white;
-            border: 1px solid #d1d1d6;
-            padding: 8px 12px;
-            border-radius: 6px;
-            cursor: pointer;
-            transition: all 0.2s;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-            font-size: 14px;
-        }
-        
-        .toolbar-btn:hover {
-            background: #e5e5e7;
-        }
-        
-        .toolbar-btn.active {
-            background: #007aff;
-            color: white;
-            border-color: #007aff;
-        }
-        
-        .toolbar-separator {
-            width: 1px;
-            height: 24px;
-            background: #d1d1d6;
-            margin: 0 4px;
-        }
-        
-        .editor-content {
-            min-height: 300px;
-            padding: 20px;
-            outline: none;
-            font-size: 16px;
-            line-height: 1.6;
-            overflow-y: auto;
-        }
-        
-        .editor-content:empty:before {
-            content: "Start typing your notes here...";
-            color: #8e8e93;
-        }
-        
-        .editor-content h1, .editor-content h2, .editor-content h3 {
-            margin: 20px 0 10px 0;
-            color: #1d1d1f;
-        }
-        
-        .editor-content p {
-            margin-bottom: 15px;
-        }
-        
-        .editor-content ul, .editor-content ol {
-            margin-left: 24px;
-            margin-bottom: 15px;
-        }
-        
-        .editor-content blockquote {
-            border-left: 4px solid #007aff;
-            padding-left: 16px;
-            margin: 15px 0;
-            font-style: italic;
-            color: #48484a;
-        }
-        
-        .save-section {
-            display: flex;
-            justify-content: flex-end;
-            margin-top: 20px;
-        }
-        
-        .btn-save {
-            background: #34c759;
-            color: white;
-            padding: 12px 30px;
-            font-size: 16px;
-        }
-        
-        .btn-save:hover {
-            background: #2da84e;
-        }
-        
-        .status-message {
-            padding: 12px 16px;
-            border-radius: 8px;
-            margin: 15px 0;
-            display: none;
-        }
-        
-        .status-success {
-            background: #d4f7e2;
-            color: #1d7c47;
-            border: 1px solid #34c759;
-            display: block;
-        }
-        
-        .status-error {
-            background: #ffe5e5;
-            color: #d70015;
-            border: 1px solid #ff3b30;
-            display: block;
-        }
-        
-        .upload-btn {
-            background: #5856d6;
-            color: white;
-        }
-        
-        .upload-btn:hover {
-            background: #4745c4;
-        }
-        
-        .api-section {
-            background: #f5f5f7;
-            border-radius: 8px;
-            padding: 20px;
-            margin-top: 30px;
-        }
-        
-        .api-endpoint {
-            font-family: 'Menlo', 'Monaco', monospace;
-            background: white;
-            padding: 8px 12px;
-            border-radius: 6px;
-            margin: 5px 0;
-            border-left: 3px solid #007aff;
-        }
-        
-        hr {
-            border: none;
-            border-top: 1px solid #e5e5e7;
-            margin: 25px 0;
-        }
-        
-        /* UPLOAD PROGRESS */
-        .upload-progress {
-            display: none;
-            margin: 15px 0;
-        }
-        
-        .progress-bar {
-            width: 100%;
-            height: 8px;
-            background: #e5e5e7;
-            border-radius: 4px;
-            overflow: hidden;
-            margin-bottom: 8px;
-        }
-        
-        .progress-fill {
-            height: 100%;
-            background: #34c759;
-            width: 0%;
-            transition: width 0.3s ease;
-        }
-        
-        .upload-status {
-            text-align: center;
-            color: #48484a;
-            font-size: 14px;
-        }
-        
-        /* DELETE CONFIRMATION MODAL */
-        .modal-overlay {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: rgba(0,0,0,0.5);
-            z-index: 1000;
-            justify-content: center;
-            align-items: center;
-        }
-        
-        .modal-content {
-            background: white;
-            border-radius: 12px;
-            padding: 30px;
-            max-width: 400px;
-            width: 90%;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-        }
-        
-        .modal-title {
-            font-size: 20px;
-            font-weight: 600;
-            margin-bottom: 15px;
-            color: #1d1d1f;
-        }
-        
-        .modal-message {
-            color: #48484a;
-            margin-bottom: 25px;
-            line-height: 1.5;
-        }
-        
-        .modal-actions {
-            display: flex;
-            gap: 12px;
-            justify-content: flex-end;
-        }
-        
-        .modal-btn {
-            padding: 10px 20px;
-            border-radius: 8px;
-            border: none;
-            cursor: pointer;
-            font-weight: 500;
-        }
-        
-        .modal-btn-cancel {
-            background: #f5f5f7;
-            color: #48484a;
-        }
-        
-        .modal-btn-cancel:hover {
-            background: #e5e5e7;
-        }
-        
-        .modal-btn-delete {
-            background: #ff3b30;
-            color: white;
-        }
-        
-        .modal-btn-delete:hover {
-            background: #d70015;
-        }
-        
-        /* FAST LOADING ANIMATION */
-        .image-placeholder {
-            background: linear-gradient(90deg, #f0f0f0 25%, #e0e0e0 50%, #f0f0f0 75%);
-            background-size: 200% 100%;
-            animation: loading 1.5s infinite;
-        }
-        
-        @keyframes loading {
-            0% { background-position: 200% 0; }
-            100% { background-position: -200% 0; }
-        }
-    </style>
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-</head>
-<body>
-    <div class="container">
-        <!-- Sidebar (Left) -->
-        <div class="sidebar">
-            <h1>Notebook</h1>
-            
-            <div class="folder-controls">
-                <button class="btn btn-primary" onclick="createNewFolder()">
-                    <i class="fas fa-plus"></i> New Folder
-                </button>
-                <button class="btn btn-secondary" onclick="loadFolders()">
-                    <i class="fas fa-sync-alt"></i> Refresh
-                </button>
-            </div>
-            
-            <h2>Folders</h2>
-            <ul class="folder-list" id="folderList">
-                <div style="color: #8e8e93; text-align: center; padding: 20px;">
-                    <i class="fas fa-spinner fa-spin"></i> Loading folders...
-                </div>
-            </ul>
-        </div>
-        
-        <!-- Main Content (Right) -->
-        <div class="main-content">
-            <div id="contentArea">
-                <div style="text-align: center; padding: 60px 20px; color: #8e8e93;">
-                    <i class="fas fa-folder-open" style="font-size: 48px; margin-bottom: 20px;"></i>
-                    <h2>Select a folder to view content</h2>
-                    <p>Choose a folder from the sidebar</p>
-                </div>
-            </div>
-        </div>
-    </div>
-    
-    <!-- Hidden file input for image upload -->
-    <input type="file" id="fileInput" accept="image/*" multiple style="display: none;">
-    
-    <!-- Delete Confirmation Modal -->
-    <div class="modal-overlay" id="deleteModal">
-        <div class="modal-content">
-            <div class="modal-title" id="modalTitle">Delete Folder</div>
-            <div class="modal-message" id="modalMessage">
-                Are you sure you want to delete this folder? All images and notes will be permanently deleted.
-            </div>
-            <div class="modal-actions">
-                <button class="modal-btn modal-btn-cancel" onclick="closeDeleteModal()">Cancel</button>
-                <button class="modal-btn modal-btn-delete" onclick="confirmDelete()">Delete</button>
-            </div>
-        </div>
-    </div>
-    
-    <script>
-        let currentFolderId = null;
-        let pendingDeleteFolderId = null;
-        let pendingDeleteImageId = null;
-        
-        // Load folders on page load
-        document.addEventListener('DOMContentLoaded', () => {
-            loadFolders();
-        });
-        
-        // Load all folders
-        async function loadFolders() {
-            try {
-                const folderList = document.getElementById('folderList');
-                folderList.innerHTML = '<div style="color: #8e8e93; text-align: center; padding: 20px;"><i class="fas fa-spinner fa-spin"></i> Loading folders...</div>';
-                
-                const response = await fetch('/api/folder=;');
-                const data = await response.json();
-                
-                if (!data.folders || data.folders.length === 0) {
-                    folderList.innerHTML = '<div style="color: #8e8e93; text-align: center; padding: 20px;">No folders yet. Create one!</div>';
-                    return;
-                }
-                
-                // Sort folders by date (newest first)
-                const sortedFolders = data.folders.sort((a, b) => 
-                    new Date(b.date) - new Date(a.date)
-                );
-                
-                folderList.innerHTML = sortedFolders.map(folder => `
-                    <li class="folder-item" onclick="loadFolder(${folder.id})">
-                        <div class="folder-header">
-                            <span class="folder-date">${folder.date}</span>
-                            <span class="folder-image-count">${folder.image_count || 0} images</span>
-                        </div>
-                        <div class="image-indicator">
-                            <i class="fas fa-circle"></i> images
-                        </div>
-                    </li>
-                `).join('');
-                
-            } catch (error) {
-                console.error('Error loading folders:', error);
-                showMessage('Error loading folders', 'error');
-            }
-        }
-        
-        // Load a specific folder
-        async function loadFolder(folderId) {
-            try {
-                currentFolderId = folderId;
-                
-                // Update active state
-                document.querySelectorAll('.folder-item').forEach(item => {
-                    item.classList.remove('active');
-                });
-                event.currentTarget.classList.add('active');
-                
-                // Show loading state
-                const contentArea = document.getElementById('contentArea');
-                contentArea.innerHTML = `
-                    <div style="text-align: center; padding: 40px;">
-                        <i class="fas fa-spinner fa-spin" style="font-size: 24px; color: #007aff;"></i>
-                        <p style="margin-top: 15px; color: #8e8e93;">Loading folder content...</p>
-                    </div>
-                `;
-                
-                // Load folder data and images in parallel for faster loading
-                const [folderResponse, imagesResponse] = await Promise.all([
-                    fetch(`/api/folder=./${folderId};`),
-                    fetch(`/api/folder=./${folderId}/images;`)
-                ]);
-                
-                const folder = await folderResponse.json();
-                const imagesData = await imagesResponse.json();
-                const images = imagesData.images || [];
-                
-                // Render the folder content
-                renderFolderContent(folder, images);
-                
-            } catch (error) {
-                console.error('Error loading folder:', error);
-                showMessage('Error loading folder content', 'error');
-            }
-        }
-        
-        // Render folder content with rich text editor
-        function renderFolderContent(folder, images) {
-            const contentArea = document.getElementById('contentArea');
-            
-            contentArea.innerHTML = `
-                <h1 style="margin-bottom: 10px;">${folder.date}</h1>
-                <p style="color: #8e8e93; margin-bottom: 30px; font-size: 14px;">
-                    Created: ${new Date(folder.created_at).toLocaleDateString()}
-                </p>
-                
-                <hr>
-                
-                <div style="margin: 25px 0;">
-                    <h2>Images (${images.length})</h2>
-                    
-                    <div style="margin: 15px 0;">
-                        <button class="btn upload-btn" onclick="uploadImage()">
-                            <i class="fas fa-plus"></i> Add Image
-                        </button>
-                    </div>
-                    
-                    <!-- Upload Progress -->
-                    <div class="upload-progress" id="uploadProgress">
-                        <div class="progress-bar">
-                            <div class="progress-fill" id="progressFill"></div>
-                        </div>
-                        <div class="upload-status" id="uploadStatus">Uploading...</div>
-                    </div>
-                    
-                    <div class="image-gallery" id="imageGallery">
-                        ${images.length > 0 ? renderImagesFast(images) : 
-                        '<div style="color: #8e8e93; text-align: center; padding: 40px; grid-column: 1/-1;">No images yet</div>'}
-                    </div>
-                </div>
-                
-                <hr>
-                
-                <div style="margin: 25px 0;">
-                    <h2>Notes</h2>
-                    
-                    <div class="notes-controls">
-                        <button class="btn btn-danger" onclick="clearNotes()">
-                            <i class="fas fa-eraser"></i> Clear
-                        </button>
-                        <button class="btn btn-danger" onclick="showDeleteFolderModal(${folder.id})">
-                            <i class="fas fa-trash"></i> Delete Folder
-                        </button>
-                    </div>
-                    
-                    <!-- Rich Text Editor -->
-                    <div class="editor-container">
-                        <div class="editor-toolbar" id="toolbar">
-                            <button class="toolbar-btn" onclick="formatText('bold')" title="Bold">
-                                <i class="fas fa-bold"></i>
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('italic')" title="Italic">
-                                <i class="fas fa-italic"></i>
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('underline')" title="Underline">
-                                <i class="fas fa-underline"></i>
-                            </button>
-                            
-                            <div class="toolbar-separator"></div>
-                            
-                            <button class="toolbar-btn" onclick="formatText('justifyLeft')" title="Align Left">
-                                <i class="fas fa-align-left"></i>
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('justifyCenter')" title="Center">
-                                <i class="fas fa-align-center"></i>
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('justifyRight')" title="Align Right">
-                                <i class="fas fa-align-right"></i>
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('justifyFull')" title="Justify">
-                                <i class="fas fa-align-justify"></i>
-                            </button>
-                            
-                            <div class="toolbar-separator"></div>
-                            
-                            <button class="toolbar-btn" onclick="formatText('insertUnorderedList')" title="Bullet List">
-                                <i class="fas fa-list-ul"></i>
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('insertOrderedList')" title="Numbered List">
-                                <i class="fas fa-list-ol"></i>
-                            </button>
-                            
-                            <div class="toolbar-separator"></div>
-                            
-                            <button class="toolbar-btn" onclick="formatText('formatBlock', '<h1>')" title="Heading 1">
-                                H1
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('formatBlock', '<h2>')" title="Heading 2">
-                                H2
-                            </button>
-                            <button class="toolbar-btn" onclick="formatText('formatBlock', '<h3>')" title="Heading 3">
-                                H3
-                            </button>
-                        </div>
-                        
-                        <div class="editor-content" id="editor" contenteditable="true" oninput="autoSave()">
-                            ${folder.notes_html || ''}
-                        </div>
-                    </div>
-                    
-                    <div class="save-section">
-                        <button class="btn btn-save" onclick="saveNotes(${folder.id})">
-                            <i class="fas fa-save"></i> Save Notes
-                        </button>
-                    </div>
-                </div>
-                
-                <div class="api-section">
-                    <h2>API Endpoints</h2>
-                    <div style="color: #8e8e93; margin-bottom: 15px;">
-                        Available backend endpoints for this application
-                    </div>
-                    
-                    <div class="api-endpoint">GET /api/folder=;</div>
-                    <div class="api-endpoint">GET /api/folder=./:id;</div>
-                    <div class="api-endpoint">PUT /api/folder=./:id;</div>
-                    <div class="api-endpoint">POST /api/images;</div>
-                    <div class="api-endpoint">PUT /api/folder=./:do;</div>
-                    <div class="api-endpoint">PATCH /api/folder=./:do;</div>
-                    <div class="api-endpoint">DELETE /api/folder=./:do;</div>
-                    <div class="api-endpoint">PUT /api/images=./:do;</div>
-                    <div class="api-endpoint">DELETE /api/images=./:do;</div>
-                </div>
-                
-                <div id="statusMessage" class="status-message"></div>
-            `;
-            
-            // Initialize toolbar button states
-            updateToolbarButtons();
-        }
-        
-        // Render images with fast loading
-        function renderImagesFast(images) {
-            return images.map(image => `
-                <div class="image-item">
-                    <img src="${image.url}" class="image-preview" 
-                         alt="${image.filename}"
-                         loading="lazy"
-                         onload="this.classList.remove('image-placeholder')"
-                         onerror="this.src='https://via.placeholder.com/180x120?text=Image+Error'">
-                    <div class="image-info">
-                        <div class="image-name">${image.filename}</div>
-                        <div class="image-date">
-                            ${new Date(image.uploaded_at).toLocaleDateString()}
-                        </div>
-                        <button onclick="showDeleteImageModal(${image.id}, event)" 
-                                style="margin-top: 8px; padding: 4px 8px; background: #ff3b30; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 12px;">
-                            <i class="fas fa-trash"></i> Delete
-                        </button>
-                    </div>
-                </div>
-            `).join('');
-        }
-        
-        // Rich text editor functions
-        function formatText(command, value = null) {
-            document.execCommand(command, false, value);
-            document.getElementById('editor').focus();
-            updateToolbarButtons();
-        }
-        
-        function updateToolbarButtons() {
-            const buttons = document.querySelectorAll('.toolbar-btn');
-            buttons.forEach(btn => btn.classList.remove('active'));
-            
-            // Check for bold
-            if (document.queryCommandState('bold')) {
-                document.querySelector('[onclick*="bold"]').classList.add('active');
-            }
-            
-            // Check for italic
-            if (document.queryCommandState('italic')) {
-                document.querySelector('[onclick*="italic"]').classList.add('active');
-            }
-            
-            // Check for underline
-            if (document.queryCommandState('underline')) {
-                document.querySelector('[onclick*="underline"]').classList.add('active');
-            }
-        }
-        
-        // Create new folder
-        async function createNewFolder() {
-            const date = prompt('Enter date (YYYY-MM-DD):', new Date().toISOString().split('T')[0]);
-            
-            if (!date) return;
-            
-            try {
-                const response = await fetch('/api/folder=;', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        date: date,
-                        notes_html: ''
-                    })
-                });
-                
-                const data = await response.json();
-                
-                if (data.success) {
-                    showMessage('New folder created!', 'success');
-                    loadFolders();
-                    // Load the new folder
-                    setTimeout(() => {
-                        loadFolder(data.folder.id);
-                    }, 100);
-                } else {
-                    showMessage('Error: ' + data.error, 'error');
-                }
-                
-            } catch (error) {
-                console.error('Error creating folder:', error);
-                showMessage('Error creating folder', 'error');
-            }
-        }
-        
-        // Upload image with progress tracking
-        async function uploadImage() {
-            if (!currentFolderId) {
-                showMessage('Please select a folder first', 'error');
-                return;
-            }
-            
-            const fileInput = document.getElementById('fileInput');
-            fileInput.onchange = async (e) => {
-                const files = e.target.files;
-                const uploadProgress = document.getElementById('uploadProgress');
-                const progressFill = document.getElementById('progressFill');
-                const uploadStatus = document.getElementById('uploadStatus');
-                
-                // Show progress bar
-                uploadProgress.style.display = 'block';
-                progressFill.style.width = '0%';
-                
-                let uploadedCount = 0;
-                const totalFiles = files.length;
-                
-                for (let i = 0; i < files.length; i++) {
-                    const file = files[i];
-                    
-                    if (!file.type.startsWith('image/')) {
-                        showMessage(`Skipping non-image: ${file.name}`, 'error');
-                        continue;
-                    }
-                    
-                    uploadStatus.textContent = `Uploading ${file.name}... (${i + 1}/${totalFiles})`;
-                    
-                    const formData = new FormData();
-                    formData.append('file', file);
-                    formData.append('folder_id', currentFolderId);
-                    
-                    try {
-                        // Show image placeholder immediately
-                        const imageGallery = document.getElementById('imageGallery');
-                        const placeholderHtml = `
-                            <div class="image-item">
-                                <div class="image-preview image-placeholder"></div>
-                                <div class="image-info">
-                                    <div class="image-name">${file.name}</div>
-                                    <div class="image-date">Uploading...</div>
-                                </div>
-                            </div>
-                        `;
-                        imageGallery.insertAdjacentHTML('afterbegin', placeholderHtml);
-                        
-                        const response = await fetch('/api/images;', {
-                            method: 'POST',
-                            body: formData
-                        });
-                        
-                        const data = await response.json();
-                        
-                        if (data.success) {
-                            uploadedCount++;
-                        } else {
-                            showMessage(`Failed: ${data.error}`, 'error');
-                        }
-                    } catch (error) {
-                        console.error('Upload error:', error);
-                        showMessage('Upload failed', 'error');
-                    }
-                    
-                    // Update progress
-                    const progress = Math.round((i + 1) / totalFiles * 100);
-                    progressFill.style.width = `${progress}%`;
-                }
-                
-                uploadStatus.textContent = `Upload complete! ${uploadedCount}/${totalFiles} uploaded`;
-                progressFill.style.width = '100%';
-                
-                // Hide progress after 2 seconds and reload images
-                setTimeout(() => {
-                    uploadProgress.style.display = 'none';
-                    if (uploadedCount > 0) {
-                        // FAST RELOAD: Just reload the images, not the whole folder
-                        refreshImages();
-                    }
-                }, 2000);
-                
-                // Reset file input
-                fileInput.value = '';
-            };
-            
-            fileInput.click();
-        }
-        
-        // FAST: Refresh only images without reloading entire folder
-        async function refreshImages() {
-            if (!currentFolderId) return;
-            
-            try {
-                const imagesResponse = await fetch(`/api/folder=./${currentFolderId}/images;`);
-                const imagesData = await imagesResponse.json();
-                const images = imagesData.images || [];
-                
-                // Update only the image gallery
-                const imageGallery = document.getElementById('imageGallery');
-                if (imageGallery) {
-                    imageGallery.innerHTML = images.length > 0 ? renderImagesFast(images) : 
-                        '<div style="color: #8e8e93; text-align: center; padding: 40px; grid-column: 1/-1;">No images yet</div>';
-                }
-                
-            } catch (error) {
-                console.error('Error refreshing images:', error);
-            }
-        }
-        
-        // Delete image with confirmation modal
-        function showDeleteImageModal(imageId, event) {
-            event.stopPropagation();
-            pendingDeleteImageId = imageId;
-            document.getElementById('deleteModal').style.display = 'flex';
-            document.getElementById('modalTitle').textContent = 'Delete Image';
-            document.getElementById('modalMessage').textContent = 'Are you sure you want to delete this image?';
-        }
-        
-        // Delete folder with confirmation modal
-        function showDeleteFolderModal(folderId) {
-            pendingDeleteFolderId = folderId;
-            document.getElementById('deleteModal').style.display = 'flex';
-            document.getElementById('modalTitle').textContent = 'Delete Folder';
-            document.getElementById('modalMessage').textContent = 'Are you sure you want to delete this folder? All images and notes will be permanently deleted.';
-        }
-        
-        function closeDeleteModal() {
-            document.getElementById('deleteModal').style.display = 'none';
-            pendingDeleteFolderId = null;
-            pendingDeleteImageId = null;
-        }
-        
-        async function confirmDelete() {
-            if (pendingDeleteImageId) {
-                await deleteImage(pendingDeleteImageId);
-            } else if (pendingDeleteFolderId) {
-                await deleteFolderAction(pendingDeleteFolderId);
-            }
-            closeDeleteModal();
-        }
-        
-        async function deleteImage(imageId) {
-            try {
-                const response = await fetch(`/api/images=./delete;`, {
-                    method: 'DELETE',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ id: imageId })
-                });
-                
-                const data = await response.json();
-                
-                if (data.success) {
-                    showMessage('Image deleted!', 'success');
-                    // FAST: Refresh only images
-                    refreshImages();
-                } else {
-                    showMessage('Error: ' + data.error, 'error');
-                }
-                
-            } catch (error) {
-                console.error('Error deleting image:', error);
-                showMessage('Error deleting image', 'error');
-            }
-        }
-        
-        // Clear notes
-        function clearNotes() {
-            if (confirm('Clear all notes?')) {
-                document.getElementById('editor').innerHTML = '';
-                document.getElementById('editor').focus();
-            }
-        }
-        
-        // Auto-save notes
-        let saveTimeout;
-        function autoSave() {
-            clearTimeout(saveTimeout);
-            saveTimeout = setTimeout(() => {
-                saveNotes(currentFolderId, true);
-            }, 2000);
-        }
-        
-        // Save notes
-        async function saveNotes(folderId, auto = false) {
-            try {
-                const notes = document.getElementById('editor').innerHTML;
-                
-                const response = await fetch(`/api/folder=./${folderId};`, {
-                    method: 'PUT',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        notes_html: notes
-                    })
-                });
-                
-                const data = await response.json();
-                
-                if (data.success) {
-                    if (!auto) {
-                        showMessage('Notes saved successfully!', 'success');
-                    }
-                } else {
-                    showMessage('Error: ' + data.error, 'error');
-                }
-                
-            } catch (error) {
-                console.error('Error saving notes:', error);
-                showMessage('Error saving notes', 'error');
-            }
-        }
-        
-        // Delete folder action
-        async function deleteFolderAction(folderId) {
-            try {
-                const response = await fetch(`/api/folder=./delete;`, {
-                    method: 'DELETE',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ id: folderId })
-                });
-                
-                const data = await response.json();
-                
-                if (data.success) {
-                    showMessage('Folder deleted!', 'success');
-                    loadFolders();
-                    
-                    // Clear content area
-                    document.getElementById('contentArea').innerHTML = `
-                        <div style="text-align: center; padding: 60px 20px; color: #8e8e93;">
-                            <i class="fas fa-check-circle" style="font-size: 48px; margin-bottom: 20px;"></i>
-                            <h2>Folder deleted successfully</h2>
-                            <p>Select another folder from the sidebar</p>
-                        </div>
-                    `;
-                } else {
-                    showMessage('Error: ' + data.error, 'error');
-                }
-                
-            } catch (error) {
-                console.error('Error deleting folder:', error);
-                showMessage('Error deleting folder', 'error');
-            }
-        }
-        
-        // Show status message
-        function showMessage(message, type = 'success') {
-            const statusDiv = document.getElementById('statusMessage');
-            if (!statusDiv) return;
-            
-            statusDiv.textContent = message;
-            statusDiv.className = `status-message status-${type}`;
-            statusDiv.style.display = 'block';
-            
-            setTimeout(() => {
-                statusDiv.style.display = 'none';
-            }, 3000);
-        }
-        
-        // Keyboard shortcuts for rich text editor
-        document.addEventListener('keydown', (e) => {
-            if ((e.ctrlKey || e.metaKey) && document.activeElement.id === 'editor') {
-                switch(e.key.toLowerCase()) {
-                    case 'b':
-                        e.preventDefault();
-                        formatText('bold');
-                        break;
-                    case 'i':
-                        e.preventDefault();
-                        formatText('italic');
-                        break;
-                    case 'u':
-                        e.preventDefault();
-                        formatText('underline');
-                        break;
-                    case 'l':
-                        e.preventDefault();
-                        formatText('justifyLeft');
-                        break;
-                    case 'e':
-                        e.preventDefault();
-                        formatText('justifyCenter');
-                        break;
-                    case 'r':
-                        e.preventDefault();
-                        formatText('justifyRight');
-                        break;
-                    case 's':
-                        e.preventDefault();
-                        if (currentFolderId) saveNotes(currentFolderId);
-                        break;
-                }
-            }
-        });
-    </script>
-</body>
-</html>
-    '''
+    html, etag = index_shell()
+    if is_not_modified(etag):
+        return not_modified(etag)
+    response = precompressed_response(html, etag=etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    asset = assets.get(filename)
+    if asset is None:
+        return jsonify({'success': False, 'error': 'Asset not found'}), 404
+    text, mimetype = asset
+    return mark_immutable(precompressed_response(text, mimetype))
 
 # ===== API ENDPOINTS =====
 
 # 1. GET /api/folder=; (Get all folders)
+#    ?view=summary       -> omit notes_html (sidebar only needs date + image count)
+#    ?limit=N&cursor=C   -> newest N folders after cursor C, keyset paginated
+#    ?year=Y[&month=M]   -> only folders in that year / month
 @app.route('/api/folder=;', methods=['GET'])
 def get_all_folders_api():
     try:
-        folders = Folder.query.order_by(Folder.date.desc()).all()
-        return jsonify({
-            'success': True,
-            'folders': [folder.to_dict() for folder in folders]
-        })
+        etag = make_etag('folders', JournalState.current_version(), query_fingerprint())
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        summary = request.args.get('view') == 'summary'
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_FOLDER_PAGE_SIZE))
+        
+        before = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            before = parse_folder_cursor(cursor)
+            if before is None:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+        
+        between = None
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        if year is not None or month is not None:
+            try:
+                if year is None:
+                    raise ValueError('month needs a year')
+                between = date_range(year, month)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': f'Invalid year/month: {e}'}), 400
+        
+        def build():
+            folders = Folder.list_with_image_counts(summary=summary, limit=limit, before=before,
+                                                    between=between)
+            next_cursor = None
+            if limit is not None and len(folders) == limit:
+                next_cursor = make_folder_cursor(folders[-1])
+            return {
+                'success': True,
+                'folders': folders,
+                'next_cursor': next_cursor
+            }
+        
+        return cached_json(etag, None, build)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1215,8 +368,12 @@ def get_all_folders_api():
 @app.route('/api/folder=./<int:id>;', methods=['GET'])
 def get_folder_api(id):
     try:
-        folder = Folder.query.get_or_404(id)
-        return jsonify(folder.to_dict())
+        version = db.session.query(Folder.version).filter_by(id=id).scalar()
+        etag = make_etag('folder', id, version)
+        if version is not None and is_not_modified(etag):
+            return not_modified(etag)
+        
+        return cached_json(etag, id, lambda: Folder.query.get_or_404(id).to_dict())
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 404
 
@@ -1227,21 +384,164 @@ def update_folder_api(id):
         folder = Folder.query.get_or_404(id)
         data = request.get_json()
         
-        if 'notes_html' in data:
-            folder.notes_html = data['notes_html']
         if 'date' in data:
-            folder.date = data['date']
+            try:
+                day = parse_date(data['date'])
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            if date_taken(folder, day):
+                db.session.rollback()
+                return jsonify({'success': False, 'error': DATE_TAKEN_ERROR}), 409
+            folder.date = day
+        if 'notes_html' in data:
+            set_notes(folder, data['notes_html'])
         
+        # Nothing is written when neither field actually changed
         db.session.commit()
         
         return jsonify({
             'success': True,
             'folder': folder.to_dict()
         })
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_date_conflict(e):
+            return jsonify({'success': False, 'error': DATE_TAKEN_ERROR}), 409
+        return jsonify({'success': False, 'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# 3b. PATCH /api/folder=./:id/notes; (Revisioned notes save)
+#     {"base_revision": n, "patch": [{"at", "remove", "insert"}, ...]}
+#     or {"base_revision": n, "notes_html": "..."} for a full replace.
+#     A stale base_revision gets 409 without touching the row.
+@app.route('/api/folder=./<int:id>/notes;', methods=['PATCH'])
+def patch_folder_notes_api(id):
+    try:
+        data = request.get_json() or {}
+        if 'base_revision' not in data or ('patch' not in data and 'notes_html' not in data):
+            return jsonify({'success': False, 'error': 'Missing base_revision and patch or notes_html'}), 400
+        
+        # Conditional UPDATE first: it takes SQLite's write lock, so of two
+        # saves on the same base (from any process) the second one waits,
+        # then matches no row. The notes themselves go through the ORM below.
+        claimed = db.session.execute(db.update(Folder)
+                                     .where(Folder.id == id,
+                                            Folder.notes_revision == data['base_revision'])
+                                     .values(notes_revision=Folder.notes_revision))
+        if claimed.rowcount == 0:
+            db.session.rollback()
+            current = db.session.query(Folder.notes_revision).filter_by(id=id).first()
+            if current is None:
+                return jsonify({'success': False, 'error': 'Folder not found'}), 404
+            return jsonify({
+                'success': False,
+                'conflict': True,
+                'error': 'Notes were changed elsewhere',
+                'notes_revision': current.notes_revision
+            }), 409
+        folder = db.session.get(Folder, id)
+        
+        if 'patch' in data:
+            try:
+                html = apply_patch(folder.notes_html, data['patch'])
+            except PatchError as e:
+                db.session.rollback()
+                return jsonify({'success': False, 'error': str(e)}), 400
+        else:
+            html = data['notes_html']
+        
+        changed = set_notes(folder, html)
+        if changed:
+            db.session.commit()
+        else:
+            db.session.rollback()  # just releases the claim
+        
+        result = {
+            'success': True,
+            'unchanged': not changed,
+            'notes_revision': folder.notes_revision
+        }
+        # Pasted images were swapped for urls; the client must patch from this
+        if folder.notes_html != html:
+            result['notes_html'] = folder.notes_html
+        return jsonify(result)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 3c. GET /api/folder=./:id/revisions; (Notes history, newest first)
+#     ?limit=N&before=REV to page back
+@app.route('/api/folder=./<int:id>/revisions;', methods=['GET'])
+def list_note_revisions_api(id):
+    try:
+        if not db.session.get(Folder, id):
+            return jsonify({'success': False, 'error': 'Folder not found'}), 404
+        
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        query = NoteRevision.query.filter_by(folder_id=id)
+        before = request.args.get('before', type=int)
+        if before is not None:
+            query = query.filter(NoteRevision.revision < before)
+        revisions = query.order_by(NoteRevision.revision.desc()).limit(limit).all()
+        
+        return jsonify({
+            'success': True,
+            'revisions': [revision.to_dict() for revision in revisions]
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 3d. GET /api/folder=./:id/revisions=./:rev; (Notes as of a revision)
+@app.route('/api/folder=./<int:id>/revisions=./<int:revision>;', methods=['GET'])
+def get_note_revision_api(id, revision):
+    try:
+        html = reconstruct_revision(id, revision)
+        if html is None:
+            return jsonify({'success': False, 'error': 'Revision not found'}), 404
+        return jsonify({'success': True, 'revision': revision, 'notes_html': html})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 3e. POST /api/folder=./:id/revisions=./:rev/restore; (Point-in-time restore)
+#     Restoring is itself a new revision, so it can be undone the same way.
+@app.route('/api/folder=./<int:id>/revisions=./<int:revision>/restore;', methods=['POST'])
+def restore_note_revision_api(id, revision):
+    try:
+        folder = db.session.get(Folder, id)
+        if not folder:
+            return jsonify({'success': False, 'error': 'Folder not found'}), 404
+        html = reconstruct_revision(id, revision)
+        if html is None:
+            return jsonify({'success': False, 'error': 'Revision not found'}), 404
+        
+        if set_notes(folder, html):
+            db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Notes restored to revision {revision}',
+            'folder': folder.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 3f. GET /api/search;?q=... (Full-text search over notes, best match first)
+@app.route('/api/search;', methods=['GET'])
+def search_notes_api():
+    try:
+        q = request.args.get('q', '').strip()
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        return jsonify({
+            'success': True,
+            'query': q,
+            'results': search_notes(q, limit) if q else []
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # 4. POST /api/images; (Upload/create image) - OPTIMIZED FOR SPEED
 @app.route('/api/images;', methods=['POST'])
 def upload_image_api():
@@ -1263,24 +563,7 @@ def upload_image_api():
             return jsonify({'success': False, 'error': 'Folder not found'}), 404
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            name, ext = os.path.splitext(filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
-            unique_filename = f"{name}_{timestamp}{ext}"
-            
-            # Save file
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
-            
-            # Create image record
-            image = Image(
-                filename=unique_filename,
-                original_filename=filename,
-                url=f'/uploads/{unique_filename}',
-                folder_id=folder_id
-            )
-            
-            db.session.add(image)
+            image = create_image_record(folder.id, file.stream, file.filename)
             db.session.commit()
             
             return jsonify({
@@ -1295,6 +578,52 @@ def upload_image_api():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# 4b. POST /api/images/batch; (Upload many images, one transaction)
+@app.route('/api/images/batch;', methods=['POST'])
+def upload_images_batch_api():
+    try:
+        files = request.files.getlist('files')
+        folder_id = request.form.get('folder_id')
+        
+        if not files:
+            return jsonify({'success': False, 'error': 'No files provided'}), 400
+        if not folder_id:
+            return jsonify({'success': False, 'error': 'No folder specified'}), 400
+        
+        folder = db.session.get(Folder, folder_id)
+        if not folder:
+            return jsonify({'success': False, 'error': 'Folder not found'}), 404
+        
+        results = []
+        images = []
+        for file in files:
+            if not file or file.filename == '':
+                results.append({'filename': '', 'success': False, 'error': 'No file selected'})
+            elif not allowed_file(file.filename):
+                results.append({'filename': file.filename, 'success': False, 'error': 'Invalid file type'})
+            else:
+                image = create_image_record(folder.id, file.stream, file.filename)
+                images.append(image)
+                results.append({'filename': file.filename, 'success': True, 'image': image})
+        
+        # One commit for every row in the batch
+        db.session.commit()
+        
+        for result in results:
+            if 'image' in result:
+                result['image'] = result['image'].to_dict()
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(images)} image(s) uploaded',
+            'uploaded': len(images),
+            'results': results
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # 5. PUT /api/folder=./:do; (Update folder with action)
 @app.route('/api/folder=./<action>;', methods=['PUT'])
 def update_folder_action_api(action):
@@ -1309,7 +638,14 @@ def update_folder_action_api(action):
             if not folder:
                 return jsonify({'success': False, 'error': 'Folder not found'}), 404
             
-            folder.date = data['new_date']
+            try:
+                day = parse_date(data['new_date'])
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            if date_taken(folder, day):
+                db.session.rollback()
+                return jsonify({'success': False, 'error': DATE_TAKEN_ERROR}), 409
+            folder.date = day
             db.session.commit()
             
             return jsonify({
@@ -1320,6 +656,11 @@ def update_folder_action_api(action):
         
         return jsonify({'success': False, 'error': f'Unknown action: {action}'}), 400
         
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_date_conflict(e):
+            return jsonify({'success': False, 'error': DATE_TAKEN_ERROR}), 409
+        return jsonify({'success': False, 'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1339,7 +680,7 @@ def patch_folder_action_api(action):
                 return jsonify({'success': False, 'error': 'Folder not found'}), 404
             
             if 'notes_html' in data:
-                folder.notes_html = data['notes_html']
+                set_notes(folder, data['notes_html'])
             
             db.session.commit()
             
@@ -1369,7 +710,10 @@ def delete_folder_action_api(action):
             if not folder:
                 return jsonify({'success': False, 'error': 'Folder not found'}), 404
             
-            # Delete folder (cascade will delete images)
+            # Delete folder (cascade will delete images); files go later
+            legacy_paths = [path for image in folder.images if image.blob_hash is None
+                            for path in legacy_file_paths(image.url, image.variants)]
+            schedule_collection(job_queue, legacy_paths)
             db.session.delete(folder)
             db.session.commit()
             
@@ -1427,14 +771,12 @@ def delete_image_action_api(action):
             if not image:
                 return jsonify({'success': False, 'error': 'Image not found'}), 404
             
-            # Delete physical file
-            try:
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], image.filename)
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            except:
-                pass
-            
+            # Physical files are removed by the storage GC job after a grace
+            # period (blobs are shared, so only once nothing references them)
+            if image.blob_hash is None:
+                schedule_collection(job_queue, legacy_file_paths(image.url, image.variants))
+            else:
+                schedule_collection(job_queue)
             db.session.delete(image)
             db.session.commit()
             
@@ -1449,18 +791,174 @@ def delete_image_action_api(action):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Folder bundle: metadata, notes and images in one response / one query.
+#    ?fields[folder]=date,notes_html&fields[image]=id,thumb_url   sparse fieldsets
+#    (id is always included; leaving notes_html out also skips loading it)
+def sparse_fields(kind):
+    value = request.args.get(f'fields[{kind}]')
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()} | {'id'}
+
+def pick_fields(data, fields):
+    return data if fields is None else {key: value for key, value in data.items() if key in fields}
+
+@app.route('/api/folder=./<int:folder_id>/bundle;', methods=['GET'])
+def get_folder_bundle_api(folder_id):
+    try:
+        version = db.session.query(Folder.version).filter_by(id=folder_id).scalar()
+        if version is None:
+            return jsonify({'success': False, 'error': 'Folder not found'}), 404
+        etag = make_etag('folder', folder_id, version, 'bundle', query_fingerprint())
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        folder_fields = sparse_fields('folder')
+        image_fields = sparse_fields('image')
+        
+        def build():
+            # Folder row + its images in a single LEFT JOIN, newest image first
+            query = (db.select(Folder)
+                     .outerjoin(Folder.images)
+                     .options(db.contains_eager(Folder.images))
+                     .where(Folder.id == folder_id)
+                     .order_by(Image.uploaded_at.desc(), Image.id.desc()))
+            include_notes = folder_fields is None or 'notes_html' in folder_fields
+            if not include_notes:
+                query = query.options(db.defer(Folder.notes_html))
+            folder = db.session.execute(query).unique().scalar_one()
+            
+            images = folder.images
+            folder_data = folder.to_dict(image_count=len(images), include_notes=include_notes)
+            return {
+                'success': True,
+                'folder': pick_fields(folder_data, folder_fields),
+                'images': [pick_fields(image.to_dict(), image_fields) for image in images]
+            }
+        
+        return cached_json(etag, folder_id, build)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # Additional endpoint: Get images for a folder - OPTIMIZED
 @app.route('/api/folder=./<int:folder_id>/images;', methods=['GET'])
 def get_folder_images_api(folder_id):
     try:
-        images = Image.query.filter_by(folder_id=folder_id).order_by(Image.uploaded_at.desc()).all()
-        return jsonify({
+        version = db.session.query(Folder.version).filter_by(id=folder_id).scalar()
+        etag = make_etag('folder', folder_id, version, 'images')
+        if version is not None and is_not_modified(etag):
+            return not_modified(etag)
+        
+        def build():
+            images = Image.query.filter_by(folder_id=folder_id).order_by(Image.uploaded_at.desc()).all()
+            return {
+                'success': True,
+                'images': [image.to_dict() for image in images]
+            }
+        
+        return cached_json(etag, folder_id, build)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ===== CHANGE FEED =====
+# GET /api/changes;?since=SEQ&epoch=E[&limit=N]
+#   -> {changes: [{seq, kind, id, folder_id, deleted, data}], cursor, epoch, more}
+#   Oldest first, one entry per folder/image changed after SEQ, with its
+#   current summary (folders leave notes_html out) or deleted=true. Pass the
+#   returned cursor and epoch back next time; "reset": true means the cursor
+#   belongs to another database and the client should start over from 0.
+CHANGE_PAGE_SIZE = 500
+
+def change_feed_data(changes):
+    """Current dicts for the upserted folders/images, keyed by (kind, id)."""
+    wanted = {'folder': set(), 'image': set()}
+    for change in changes:
+        if not change.deleted:
+            wanted[change.kind].add(change.entity_id)
+    data = {}
+    if wanted['folder']:
+        counts = dict(db.session.query(Image.folder_id, db.func.count(Image.id))
+                      .filter(Image.folder_id.in_(wanted['folder']))
+                      .group_by(Image.folder_id).all())
+        folders = (Folder.query.options(db.defer(Folder.notes_html))
+                   .filter(Folder.id.in_(wanted['folder'])))
+        for folder in folders:
+            data[('folder', folder.id)] = folder.to_dict(image_count=counts.get(folder.id, 0),
+                                                         include_notes=False)
+    if wanted['image']:
+        for image in Image.query.filter(Image.id.in_(wanted['image'])):
+            data[('image', image.id)] = image.to_dict()
+    return data
+
+@app.route('/api/changes;', methods=['GET'])
+def get_changes_api():
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = max(1, min(request.args.get('limit', CHANGE_PAGE_SIZE, type=int), CHANGE_PAGE_SIZE))
+        epoch = JournalState.current_feed_id()
+        latest = Change.latest_seq()
+        client_epoch = request.args.get('epoch')
+        if since > latest or (since and client_epoch != epoch):
+            response = jsonify({'success': True, 'reset': True, 'changes': [],
+                                'cursor': 0, 'epoch': epoch, 'more': True})
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        
+        etag = make_etag('changes', latest, query_fingerprint())
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        changes = (Change.query.filter(Change.seq > since)
+                   .order_by(Change.seq).limit(limit).all())
+        data = change_feed_data(changes)
+        entries = []
+        for change in changes:
+            entry = {
+                'seq': change.seq,
+                'kind': change.kind,
+                'id': change.entity_id,
+                'folder_id': change.folder_id,
+                'deleted': change.deleted
+            }
+            if not change.deleted:
+                entry['data'] = data.get((change.kind, change.entity_id))
+                if entry['data'] is None:
+                    # Deleted since this page was read; its tombstone comes later
+                    continue
+            entries.append(entry)
+        
+        return with_etag(jsonify({
             'success': True,
-            'images': [image.to_dict() for image in images]
-        })
+            'changes': entries,
+            'cursor': changes[-1].seq if changes else since,
+            'epoch': epoch,
+            'more': len(changes) == limit
+        }), etag)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ===== LIVE UPDATES =====
+# GET /api/events;  Server-Sent Events, one stream per open page:
+#   change  a change feed entry, pushed as its write commits
+#   resync  the client fell behind; catch up from /api/changes;
+#   ping    every 15 s while idle
+# The stream holds a thread but no database connection; payloads are built
+# by the flush that wrote the change (app/utils/events.py).
+event_broker = EventBroker()
+event_broker.listen()
+
+@app.route('/api/events;', methods=['GET'])
+def events_api():
+    subscription = event_broker.subscribe()
+    if subscription is None:
+        return jsonify({'success': False, 'error': 'Too many live connections'}), 503
+    response = Response(event_broker.stream(subscription), mimetype='text/event-stream')
+    # Also runs when the client disconnects before the first chunk
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # Create folder endpoint (POST to /api/folder=;)
 @app.route('/api/folder=;', methods=['POST'])
 def create_folder_api():
@@ -1470,10 +968,15 @@ def create_folder_api():
         if not data or 'date' not in data:
             return jsonify({'success': False, 'error': 'Missing date'}), 400
         
-        folder = Folder(
-            date=data['date'],
-            notes_html=data.get('notes_html', '')
-        )
+        try:
+            date = parse_date(data['date'])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if Folder.query.filter_by(date=date).first():
+            return jsonify({'success': False, 'error': f'A folder for {date.isoformat()} already exists'}), 409
+        
+        folder = Folder(date=date, notes_html='')
+        set_notes(folder, data.get('notes_html', ''))
         
         db.session.add(folder)
         db.session.commit()
@@ -1486,10 +989,270 @@ def create_folder_api():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ===== CHUNKED (RESUMABLE) UPLOADS =====
+# POST /api/uploads;                     {folder_id, filename, size?} -> session
+# GET  /api/uploads=./:id;               session state, to resume after a reload
+# PUT  /api/uploads=./:id/:index;        raw chunk bytes, appended in order
+# POST /api/uploads=./:id/complete;      turn the temp file into an Image
+# DELETE /api/uploads=./:id;             abort and drop the temp file
+
+# The single writer connection is never held while a client sends bytes or a
+# big file is hashed: session state is read through the reader pool, the
+# file work happens with no connection checked out, and the writer is only
+# taken for the final UPDATE / INSERTs. Requests for the same upload are
+# serialized by a lock on its temp file instead.
+@contextmanager
+def locked_upload_file(upload_id):
+    """(upload dict, open temp file) with an exclusive lock on the file; (None, None) if gone."""
+    db.session.info['read_only'] = True
+    upload = db.session.get(UploadSession, upload_id)
+    temp_path = upload.temp_path if upload else None
+    db.session.close()
+    if temp_path is None:
+        yield None, None
+        return
+    try:
+        out = open(temp_path, 'r+b')
+    except FileNotFoundError:  # expired meanwhile
+        yield None, None
+        return
+    with out:
+        if fcntl is not None:
+            fcntl.flock(out, fcntl.LOCK_EX)
+        # Again under the lock: a request for the same upload may just have finished
+        upload = db.session.get(UploadSession, upload_id)
+        state = upload.to_dict() if upload else None
+        if upload:
+            state['temp_path'] = upload.temp_path
+        db.session.close()
+        yield state, (out if state else None)
+
+@app.route('/api/uploads;', methods=['POST'])
+def create_upload_session_api():
+    try:
+        data = request.get_json() or {}
+        folder_id = data.get('folder_id')
+        filename = secure_filename(data.get('filename') or '')
+        size = data.get('size')
+        
+        if not folder_id:
+            return jsonify({'success': False, 'error': 'No folder specified'}), 400
+        if not filename or not allowed_file(filename):
+            return jsonify({'success': False, 'error': 'Invalid file type'}), 400
+        if size is not None and (isinstance(size, bool) or not isinstance(size, int) or size < 0):
+            return jsonify({'success': False, 'error': 'size must be a non-negative integer'}), 400
+        if size is not None and size > app.config['MAX_CHUNKED_UPLOAD_SIZE']:
+            return jsonify({'success': False, 'error': 'File too large'}), 413
+        if not db.session.get(Folder, folder_id):
+            return jsonify({'success': False, 'error': 'Folder not found'}), 404
+        
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            folder_id=folder_id,
+            filename=filename,
+            total_size=size,
+            temp_path=blob_store.new_temp(prefix='upload-')
+        )
+        db.session.add(upload)
+        # Sessions idle for UPLOAD_SESSION_MAX_AGE are dropped by the GC job
+        schedule_collection(job_queue, delay=UPLOAD_SESSION_MAX_AGE)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'upload': upload.to_dict(),
+            'chunk_size': UPLOAD_CHUNK_SIZE
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/uploads=./<upload_id>;', methods=['GET'])
+def get_upload_session_api(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    return jsonify({'success': True, 'upload': upload.to_dict()})
+
+@app.route('/api/uploads=./<upload_id>/<int:index>;', methods=['PUT'])
+def put_upload_chunk_api(upload_id, index):
+    try:
+        with locked_upload_file(upload_id) as (upload, out):
+            if upload is None:
+                return jsonify({'success': False, 'error': 'Upload not found'}), 404
+            del upload['temp_path']
+            
+            # A retry of a chunk we already have (e.g. the response was lost)
+            if index < upload['next_chunk']:
+                return jsonify({'success': True, 'duplicate': True, 'upload': upload, 'next_chunk': upload['next_chunk']})
+            if index > upload['next_chunk']:
+                return jsonify({'success': False, 'error': f"Expected chunk {upload['next_chunk']}", 'next_chunk': upload['next_chunk']}), 409
+            
+            # Write from the last acknowledged offset and truncate, so bytes from
+            # an earlier attempt that died mid-chunk are overwritten, not kept
+            received = upload['received_bytes']
+            written = 0
+            limit = app.config['MAX_CHUNKED_UPLOAD_SIZE'] - received
+            out.seek(received)
+            out.truncate()
+            while True:
+                chunk = request.stream.read(STREAM_COPY_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    out.truncate(received)
+                    return jsonify({'success': False, 'error': 'File too large'}), 413
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+            
+            # The writer, for this UPDATE only; no row if the session expired meanwhile
+            updated = db.session.execute(db.update(UploadSession)
+                                         .where(UploadSession.id == upload_id,
+                                                UploadSession.next_chunk == index)
+                                         .values(received_bytes=received + written,
+                                                 next_chunk=index + 1,
+                                                 updated_at=datetime.utcnow()))
+            if updated.rowcount == 0:
+                db.session.rollback()
+                return jsonify({'success': False, 'error': 'Upload not found'}), 404
+            db.session.commit()
+        
+        upload.update(received_bytes=received + written, next_chunk=index + 1)
+        return jsonify({'success': True, 'upload': upload, 'next_chunk': upload['next_chunk']})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/uploads=./<upload_id>/complete;', methods=['POST'])
+def complete_upload_session_api(upload_id):
+    try:
+        with locked_upload_file(upload_id) as (upload, out):
+            if upload is None:
+                return jsonify({'success': False, 'error': 'Upload not found'}), 404
+            if upload['total_size'] is not None and upload['received_bytes'] != upload['total_size']:
+                return jsonify({
+                    'success': False,
+                    'error': f"Received {upload['received_bytes']} of {upload['total_size']} bytes",
+                    'next_chunk': upload['next_chunk']
+                }), 409
+            
+            # Hash from disk in blocks (no connection held), then move the temp
+            # file into the blob store and add the rows on the writer
+            digest, size = blob_store.hash_file(upload['temp_path'])
+            db.session.info['read_only'] = False
+            deleted = db.session.execute(db.delete(UploadSession).where(UploadSession.id == upload_id))
+            if deleted.rowcount == 0:
+                db.session.rollback()
+                return jsonify({'success': False, 'error': 'Upload not found'}), 404
+            blob, created = Blob.from_temp(blob_store, digest, size, upload['temp_path'], upload['filename'])
+            image = add_image_for_blob(upload['folder_id'], blob, created, upload['filename'])
+            db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Image uploaded',
+            'image': image.to_dict()
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/uploads=./<upload_id>;', methods=['DELETE'])
+def abort_upload_session_api(upload_id):
+    try:
+        upload = db.session.get(UploadSession, upload_id)
+        if not upload:
+            return jsonify({'success': False, 'error': 'Upload not found'}), 404
+        blob_store.discard(upload.temp_path)
+        db.session.delete(upload)
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Upload aborted'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# ===== EXPORT / IMPORT =====
+# GET /api/export;   whole journal as a streamed tar (records + files)
+# flask export-journal backup.tar / flask import-journal backup.tar
+
+@app.route('/api/export;', methods=['GET'])
+def export_journal_api():
+    filename = f"notebook-{datetime.utcnow():%Y%m%d-%H%M%S}.tar"
+    response = Response(stream_with_context(export_journal(app.config['UPLOAD_FOLDER'])),
+                        mimetype='application/x-tar')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Don't let nginx spool a multi-GB body to disk before sending it
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.cli.command('export-journal')
+@click.argument('output', type=click.File('wb'), default='-')
+def export_journal_command(output):
+    """Write the whole journal as a tar archive to OUTPUT (default stdout)."""
+    for chunk in export_journal(app.config['UPLOAD_FOLDER']):
+        output.write(chunk)
+
+@app.cli.command('import-journal')
+@click.argument('archive', type=click.File('rb'), default='-')
+def import_journal_command(archive):
+    """Load an export-journal archive (default stdin) into an empty journal."""
+    try:
+        counts = import_journal(archive, blob_store)
+    except ArchiveError as e:
+        raise click.ClickException(str(e))
+    click.echo(', '.join(f'{count} {name}' for name, count in counts.items()), err=True)
+
+@app.cli.command('compact-notes')
+@click.option('--dry-run', is_flag=True, help='Only count the folders that need it.')
+def compact_notes_command(dry_run):
+    """Move pasted data:image URIs in existing notes into the upload store."""
+    folders, before, after = compact_notes(dry_run=dry_run)
+    if dry_run:
+        click.echo(f"{folders} folders hold inline images ({before} bytes of notes)", err=True)
+    else:
+        click.echo(f"{folders} folders compacted: {before} -> {after} bytes of notes", err=True)
+
+@app.cli.command('backfill-image-metadata')
+@click.option('--batch-size', type=int, default=200, help='Images per commit.')
+@click.option('--workers', type=int, default=None, help='Parallel readers (default: CPU count).')
+@click.option('--redo', is_flag=True, help='Also re-read images that already have metadata.')
+def backfill_image_metadata_command(batch_size, workers, redo):
+    """Fill dimensions, size, type, capture time, colour and placeholder for existing images."""
+    updated, unreadable = backfill_metadata(blob_store, batch_size=batch_size, workers=workers, redo=redo)
+    click.echo(f"{updated} images updated, {unreadable} unreadable", err=True)
+
+@app.cli.command('gc-storage')
+@click.option('--reconcile', 'full', is_flag=True,
+              help='Also recount blob references and scan uploads/ for orphaned files.')
+@click.option('--delete-orphans', is_flag=True,
+              help='With --reconcile, delete files no row references.')
+@click.option('--dry-run', is_flag=True, help='Report only; change nothing.')
+@click.option('--grace', type=int, default=None,
+              help='Seconds a file must have been unreferenced (default 600).')
+def gc_storage_command(full, delete_orphans, dry_run, grace):
+    """Remove unreferenced blobs, and optionally reconcile uploads/ with the database."""
+    options = {} if grace is None else {'grace': grace}
+    if full:
+        summary = reconcile(blob_store, delete_orphans=delete_orphans, dry_run=dry_run, **options)
+        click.echo(f"{summary['refs_fixed']} ref counts fixed, "
+                   f"{summary['orphan_files']} orphaned files ({summary['orphan_bytes']} bytes)"
+                   f"{' deleted' if delete_orphans and not dry_run else ''}, "
+                   f"{summary['temp_files']} stale temp files", err=True)
+        if summary['missing_blobs'] or summary['missing_images']:
+            click.echo(f"Missing files: blobs {summary['missing_blobs']}, "
+                       f"images {summary['missing_images']}", err=True)
+    if not dry_run:
+        removed = collect_unreferenced(blob_store, **options)
+        expired = expire_upload_sessions(blob_store)
+        click.echo(f"{removed} unreferenced blobs removed, {expired} stale uploads expired", err=True)
+
 # Serve uploaded files
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def serve_uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_immutable(app.config['UPLOAD_FOLDER'], filename)
 
 if __name__ == '__main__':
     print("🚀 Starting ENHANCED Notebook App...")
@@ -1506,5 +1269,6 @@ if __name__ == '__main__':
     print("      • Auto-save every 2 seconds")
     print("   4. 📤 FAST IMAGE UPLOAD with progress bar")
     print("   5. 🖼️ INSTANT IMAGE PREVIEW when uploading")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # extra_files: the reloader also restarts on frontend edits, which re-hashes them
+    app.run(debug=True, host='0.0.0.0', port=5000, extra_files=assets.paths())
    
\ No newline at end of file
@@ -0,0 +1,1232 @@
+let currentFolderId = null;
+let pendingDeleteFolderId = null;
+let pendingDeleteImageId = null;
+
+// Load folders on page load
+document.addEventListener('DOMContentLoaded', () => {
+    loadFolders();
+    connectLiveUpdates();
+});
+
+// Load folders page by page (newest first) as the sidebar scrolls
+const FOLDER_PAGE_SIZE = 60;
+let nextFolderPage = null;  // async () => next page of folders, null once all are shown
+let folderPageLoading = false;
+let folderPageObserver = null;
+
+function renderFolderItems(folders) {
+    return folders.map(folder => `
+            <li class="folder-item${folder.id === currentFolderId ? ' active' : ''}" data-folder-id="${folder.id}" data-date="${folder.date}" onclick="loadFolder(${folder.id})">
+                <div class="folder-header">
+                    <span class="folder-date">${folder.date}</span>
+                    <span class="folder-image-count">${folder.image_count || 0} images</span>
+                </div>
+                <div class="image-indicator">
+                    <i class="fas fa-circle"></i> images
+                </div>
+            </li>
+        `).join('');
+}
+
+async function fetchFolderPage(cursor) {
+    let url = `/api/folder=;?view=summary&limit=${FOLDER_PAGE_SIZE}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    const response = await fetch(url);
+    return response.json();
+}
+
+function serverFolderPages(cursor) {
+    return cursor ? async () => {
+        const data = await fetchFolderPage(cursor);
+        nextFolderPage = serverFolderPages(data.next_cursor);
+        return data.folders || [];
+    } : null;
+}
+
+function showFolderList(folders) {
+    const folderList = document.getElementById('folderList');
+    if (folders.length === 0) {
+        folderList.innerHTML = '<div style="color: #8e8e93; text-align: center; padding: 20px;">No folders yet. Create one!</div>';
+        return;
+    }
+    folderList.innerHTML = renderFolderItems(folders);
+    observeFolderListEnd();
+}
+
+// Load all folders: from the local replica when there is one (instant, then
+// caught up with the change feed), else page by page from the server
+async function loadFolders() {
+    try {
+        if (await openReplica()) {
+            await renderFoldersFromReplica();
+            if (await syncChanges()) await renderFoldersFromReplica();
+            return;
+        }
+        
+        const folderList = document.getElementById('folderList');
+        folderList.innerHTML = '<div style="color: #8e8e93; text-align: center; padding: 20px;"><i class="fas fa-spinner fa-spin"></i> Loading folders...</div>';
+        
+        const data = await fetchFolderPage(null);
+        // Server already returns folders newest first
+        nextFolderPage = serverFolderPages(data.next_cursor);
+        showFolderList(data.folders || []);
+        
+    } catch (error) {
+        console.error('Error loading folders:', error);
+        showMessage('Error loading folders', 'error');
+    }
+}
+
+// After a folder was created or deleted: apply just that change
+async function refreshFolders() {
+    if (!(await openReplica())) return loadFolders();
+    try {
+        await syncChanges();
+        await renderFoldersFromReplica();
+    } catch (error) {
+        console.error('Error syncing folders:', error);
+        loadFolders();
+    }
+}
+
+// Show the next page when the end of the sidebar list scrolls into view
+function observeFolderListEnd() {
+    if (folderPageObserver) folderPageObserver.disconnect();
+    if (!nextFolderPage) return;
+    
+    const folderList = document.getElementById('folderList');
+    const sentinel = document.createElement('li');
+    sentinel.id = 'folderListEnd';
+    folderList.appendChild(sentinel);
+    
+    folderPageObserver = new IntersectionObserver(async (entries) => {
+        if (!entries[0].isIntersecting || folderPageLoading || !nextFolderPage) return;
+        folderPageLoading = true;
+        try {
+            const folders = await nextFolderPage();
+            sentinel.remove();
+            folderList.insertAdjacentHTML('beforeend', renderFolderItems(folders));
+            observeFolderListEnd();
+        } catch (error) {
+            console.error('Error loading more folders:', error);
+        } finally {
+            folderPageLoading = false;
+        }
+    });
+    folderPageObserver.observe(sentinel);
+}
+
+// ===== LOCAL REPLICA =====
+// Folder summaries and images mirrored in IndexedDB and kept current from
+// GET /api/changes;, so after a write or a reload only the changes since the
+// stored cursor are fetched, not whole lists.
+const REPLICA_DB_NAME = 'notebook-replica';
+let replicaDb = null;  // IDBDatabase, or false when IndexedDB isn't usable
+let syncChain = Promise.resolve(0);
+
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function openReplica() {
+    if (replicaDb !== null) return replicaDb;
+    try {
+        const request = indexedDB.open(REPLICA_DB_NAME, 1);
+        request.onupgradeneeded = () => {
+            const idb = request.result;
+            idb.createObjectStore('folders', { keyPath: 'id' });
+            idb.createObjectStore('images', { keyPath: 'id' }).createIndex('folder_id', 'folder_id');
+            idb.createObjectStore('meta');
+        };
+        replicaDb = await idbRequest(request);
+    } catch (error) {
+        // Private browsing, blocked storage...: use the API directly
+        console.warn('Local replica unavailable:', error);
+        replicaDb = false;
+    }
+    return replicaDb;
+}
+
+function replicaStore(name) {
+    return replicaDb.transaction(name, 'readonly').objectStore(name);
+}
+
+// One page of the feed, applied atomically together with its cursor
+function applyChangePage(page) {
+    return new Promise((resolve, reject) => {
+        const tx = replicaDb.transaction(['folders', 'images', 'meta'], 'readwrite');
+        if (page.reset) {
+            tx.objectStore('folders').clear();
+            tx.objectStore('images').clear();
+        }
+        for (const change of page.changes) {
+            const store = tx.objectStore(change.kind === 'folder' ? 'folders' : 'images');
+            // Live events and feed pages can cross; never go back to an older seq
+            const existing = store.get(change.id);
+            existing.onsuccess = () => {
+                if (existing.result && existing.result._seq > change.seq) return;
+                if (change.deleted) {
+                    store.delete(change.id);
+                } else {
+                    store.put({ ...change.data, _seq: change.seq });
+                }
+            };
+        }
+        if (page.cursor !== undefined) {
+            tx.objectStore('meta').put({ cursor: page.cursor, epoch: page.epoch }, 'sync');
+        }
+        tx.oncomplete = () => resolve();
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function runSync() {
+    const state = (await idbRequest(replicaStore('meta').get('sync'))) || { cursor: 0, epoch: null };
+    let { cursor, epoch } = state;
+    let applied = 0;
+    for (;;) {
+        let url = `/api/changes;?since=${cursor}`;
+        if (epoch) url += `&epoch=${encodeURIComponent(epoch)}`;
+        const response = await fetch(url);
+        const page = await response.json();
+        if (!page.success) throw new Error(page.error);
+        await applyChangePage(page);
+        applied += page.changes.length + (page.reset ? 1 : 0);
+        cursor = page.cursor;
+        epoch = page.epoch;
+        if (!page.more) return applied;
+    }
+}
+
+// Catch the replica up with the server; resolves to the number of changes
+// applied. Calls queue behind each other, so one started after a write
+// always sees that write.
+function syncChanges() {
+    syncChain = syncChain.catch(() => 0).then(runSync);
+    return syncChain;
+}
+
+async function renderFoldersFromReplica() {
+    const folders = await idbRequest(replicaStore('folders').getAll());
+    folders.sort((a, b) => (a.date < b.date ? 1 : a.date > b.date ? -1 : 0));
+    let shown = Math.min(FOLDER_PAGE_SIZE, folders.length);
+    const nextLocalPage = async () => {
+        const page = folders.slice(shown, shown + FOLDER_PAGE_SIZE);
+        shown += page.length;
+        if (shown >= folders.length) nextFolderPage = null;
+        return page;
+    };
+    nextFolderPage = shown < folders.length ? nextLocalPage : null;
+    showFolderList(folders.slice(0, shown));
+}
+
+async function replicaFolderImages(folderId) {
+    const images = await idbRequest(replicaStore('images').index('folder_id').getAll(folderId));
+    // Same order as the server: newest upload first
+    return images.sort((a, b) => (a.uploaded_at < b.uploaded_at ? 1 : a.uploaded_at > b.uploaded_at ? -1 : b.id - a.id));
+}
+
+// ===== LIVE UPDATES =====
+// GET /api/events; pushes every folder/image change as it commits (from any
+// tab or device); each one patches the sidebar and the open gallery in place.
+// Missed events (reconnects, "resync") are caught up through the change feed.
+const LIVE_PING_TIMEOUT = 40000;  // server pings every 15 s
+let liveUpdates = false;
+let liveSource = null;
+let liveWatchdog = null;
+let liveConnectedBefore = false;
+
+function connectLiveUpdates() {
+    if (!window.EventSource) return;
+    liveSource = new EventSource('/api/events;');
+    liveSource.addEventListener('open', () => {
+        liveUpdates = true;
+        resetLiveWatchdog();
+        // Whatever changed while we were disconnected
+        if (liveConnectedBefore) catchUpLive();
+        liveConnectedBefore = true;
+    });
+    liveSource.addEventListener('error', () => {
+        // EventSource reconnects by itself; poll again meanwhile
+        liveUpdates = false;
+    });
+    liveSource.addEventListener('ping', resetLiveWatchdog);
+    liveSource.addEventListener('resync', () => {
+        resetLiveWatchdog();
+        catchUpLive();
+    });
+    liveSource.addEventListener('change', (e) => {
+        resetLiveWatchdog();
+        applyLiveChange(JSON.parse(e.data));
+    });
+}
+
+// A proxy can leave a dead connection open; no ping for a while means reconnect
+function resetLiveWatchdog() {
+    clearTimeout(liveWatchdog);
+    liveWatchdog = setTimeout(() => {
+        liveSource.close();
+        liveUpdates = false;
+        connectLiveUpdates();
+    }, LIVE_PING_TIMEOUT);
+}
+
+function catchUpLive() {
+    refreshFolders();
+    refreshImages();
+}
+
+async function applyLiveChange(change) {
+    if (await openReplica()) {
+        // Queued behind any sync in flight; no cursor, the feed stays authoritative
+        syncChain = syncChain.catch(() => 0).then(() => applyChangePage({ changes: [change] }));
+    }
+    if (change.kind === 'folder') {
+        patchFolderItem(change);
+    } else if (change.folder_id === currentFolderId) {
+        patchGalleryItem(change);
+    }
+}
+
+function patchFolderItem(change) {
+    const folderList = document.getElementById('folderList');
+    const item = folderList.querySelector(`[data-folder-id="${change.id}"]`);
+    if (change.deleted) {
+        if (item) item.remove();
+        if (change.id === currentFolderId) {
+            currentFolderId = null;
+            document.getElementById('contentArea').innerHTML = `
+                <div style="text-align: center; padding: 60px 20px; color: #8e8e93;">
+                    <i class="fas fa-trash" style="font-size: 48px; margin-bottom: 20px;"></i>
+                    <h2>This folder was deleted</h2>
+                    <p>Select another folder from the sidebar</p>
+                </div>
+            `;
+        }
+        return;
+    }
+    if (item) {
+        item.outerHTML = renderFolderItems([change.data]);
+        return;
+    }
+    // New folder: slot it in by date among the items already shown
+    const items = folderList.querySelectorAll('[data-folder-id]');
+    const before = Array.from(items).find(other => other.dataset.date < change.data.date);
+    if (before) {
+        before.insertAdjacentHTML('beforebegin', renderFolderItems([change.data]));
+    } else if (!nextFolderPage) {
+        // Oldest of all; otherwise a later page will bring it
+        if (items.length === 0) folderList.innerHTML = '';
+        const end = document.getElementById('folderListEnd');
+        if (end) {
+            end.insertAdjacentHTML('beforebegin', renderFolderItems([change.data]));
+        } else {
+            folderList.insertAdjacentHTML('beforeend', renderFolderItems([change.data]));
+        }
+    }
+}
+
+function patchGalleryItem(change) {
+    const gallery = document.getElementById('imageGallery');
+    if (!gallery) return;
+    const tile = gallery.querySelector(`[data-image-id="${change.id}"]`);
+    if (change.deleted) {
+        if (tile) tile.remove();
+    } else if (tile) {
+        tile.outerHTML = renderImageItem(change.data);
+    } else {
+        if (!gallery.querySelector('[data-image-id]')) gallery.innerHTML = '';
+        gallery.insertAdjacentHTML('afterbegin', renderImageItem(change.data));
+    }
+    const count = gallery.querySelectorAll('[data-image-id]').length;
+    document.getElementById('imageCount').textContent = count;
+    if (count === 0) {
+        gallery.innerHTML = '<div style="color: #8e8e93; text-align: center; padding: 40px; grid-column: 1/-1;">No images yet</div>';
+    }
+}
+
+// Full-text search over notes (debounced while typing)
+let searchTimeout;
+function searchNotes() {
+    clearTimeout(searchTimeout);
+    searchTimeout = setTimeout(async () => {
+        const q = document.getElementById('searchInput').value.trim();
+        const results = document.getElementById('searchResults');
+        if (!q) {
+            results.style.display = 'none';
+            results.innerHTML = '';
+            return;
+        }
+        
+        try {
+            const response = await fetch(`/api/search;?q=${encodeURIComponent(q)}`);
+            const data = await response.json();
+            results.innerHTML = (data.results || []).length === 0
+                ? '<div style="color: #8e8e93; text-align: center; padding: 10px;">No matches</div>'
+                : data.results.map(result => `
+                    <li class="folder-item" onclick="loadFolder(${result.id})">
+                        <div class="folder-header">
+                            <span class="folder-date">${result.date}</span>
+                        </div>
+                        <div class="search-snippet">${result.snippet}</div>
+                    </li>
+                `).join('');
+            results.style.display = 'block';
+        } catch (error) {
+            console.error('Error searching notes:', error);
+        }
+    }, 250);
+}
+
+// Image fields the gallery actually renders (sparse fieldset for the bundle);
+// set by the server (BUNDLE_IMAGE_FIELDS in run.py), which warms this URL
+const BUNDLE_IMAGE_FIELDS = document.body.dataset.bundleImageFields;
+
+// Load a specific folder
+async function loadFolder(folderId) {
+    try {
+        currentFolderId = folderId;
+        
+        // Update active state
+        document.querySelectorAll('.folder-item').forEach(item => {
+            item.classList.remove('active');
+        });
+        event.currentTarget.classList.add('active');
+        
+        // Show loading state
+        const contentArea = document.getElementById('contentArea');
+        contentArea.innerHTML = `
+            <div style="text-align: center; padding: 40px;">
+                <i class="fas fa-spinner fa-spin" style="font-size: 24px; color: #007aff;"></i>
+                <p style="margin-top: 15px; color: #8e8e93;">Loading folder content...</p>
+            </div>
+        `;
+        
+        // Folder, notes and images in one request
+        const response = await fetch(`/api/folder=./${folderId}/bundle;?fields[image]=${BUNDLE_IMAGE_FIELDS}`);
+        const data = await response.json();
+        if (!data.success) throw new Error(data.error);
+        
+        // Render the folder content
+        renderFolderContent(data.folder, data.images);
+        resetNotesState(data.folder);
+        
+    } catch (error) {
+        console.error('Error loading folder:', error);
+        showMessage('Error loading folder content', 'error');
+    }
+}
+
+// Render folder content with rich text editor
+function renderFolderContent(folder, images) {
+    const contentArea = document.getElementById('contentArea');
+    
+    contentArea.innerHTML = `
+        <h1 style="margin-bottom: 10px;">${folder.date}</h1>
+        <p style="color: #8e8e93; margin-bottom: 30px; font-size: 14px;">
+            Created: ${new Date(folder.created_at).toLocaleDateString()}
+        </p>
+        
+        <hr>
+        
+        <div style="margin: 25px 0;">
+            <h2>Images (<span id="imageCount">${images.length}</span>)</h2>
+            
+            <div style="margin: 15px 0;">
+                <button class="btn upload-btn" onclick="uploadImage()">
+                    <i class="fas fa-plus"></i> Add Image
+                </button>
+            </div>
+            
+            <!-- Upload Progress -->
+            <div class="upload-progress" id="uploadProgress">
+                <div class="progress-bar">
+                    <div class="progress-fill" id="progressFill"></div>
+                </div>
+                <div class="upload-status" id="uploadStatus">Uploading...</div>
+            </div>
+            
+            <div class="image-gallery" id="imageGallery">
+                ${images.length > 0 ? renderImagesFast(images) : 
+                '<div style="color: #8e8e93; text-align: center; padding: 40px; grid-column: 1/-1;">No images yet</div>'}
+            </div>
+        </div>
+        
+        <hr>
+        
+        <div style="margin: 25px 0;">
+            <h2>Notes</h2>
+            
+            <div class="notes-controls">
+                <button class="btn btn-danger" onclick="clearNotes()">
+                    <i class="fas fa-eraser"></i> Clear
+                </button>
+                <button class="btn" onclick="toggleNotesHistory(${folder.id})">
+                    <i class="fas fa-history"></i> History
+                </button>
+                <button class="btn btn-danger" onclick="showDeleteFolderModal(${folder.id})">
+                    <i class="fas fa-trash"></i> Delete Folder
+                </button>
+            </div>
+            
+            <!-- Rich Text Editor -->
+            <div class="editor-container">
+                <div class="editor-toolbar" id="toolbar">
+                    <button class="toolbar-btn" onclick="formatText('bold')" title="Bold">
+                        <i class="fas fa-bold"></i>
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('italic')" title="Italic">
+                        <i class="fas fa-italic"></i>
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('underline')" title="Underline">
+                        <i class="fas fa-underline"></i>
+                    </button>
+                    
+                    <div class="toolbar-separator"></div>
+                    
+                    <button class="toolbar-btn" onclick="formatText('justifyLeft')" title="Align Left">
+                        <i class="fas fa-align-left"></i>
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('justifyCenter')" title="Center">
+                        <i class="fas fa-align-center"></i>
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('justifyRight')" title="Align Right">
+                        <i class="fas fa-align-right"></i>
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('justifyFull')" title="Justify">
+                        <i class="fas fa-align-justify"></i>
+                    </button>
+                    
+                    <div class="toolbar-separator"></div>
+                    
+                    <button class="toolbar-btn" onclick="formatText('insertUnorderedList')" title="Bullet List">
+                        <i class="fas fa-list-ul"></i>
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('insertOrderedList')" title="Numbered List">
+                        <i class="fas fa-list-ol"></i>
+                    </button>
+                    
+                    <div class="toolbar-separator"></div>
+                    
+                    <button class="toolbar-btn" onclick="formatText('formatBlock', '<h1>')" title="Heading 1">
+                        H1
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('formatBlock', '<h2>')" title="Heading 2">
+                        H2
+                    </button>
+                    <button class="toolbar-btn" onclick="formatText('formatBlock', '<h3>')" title="Heading 3">
+                        H3
+                    </button>
+                </div>
+                
+                <div class="editor-content" id="editor" contenteditable="true" oninput="autoSave()">
+                    ${folder.notes_html || ''}
+                </div>
+            </div>
+            
+            <div class="notes-history" id="notesHistory" style="display: none;"></div>
+            
+            <div class="save-section">
+                <button class="btn btn-save" onclick="saveNotes(${folder.id})">
+                    <i class="fas fa-save"></i> Save Notes
+                </button>
+            </div>
+        </div>
+        
+        <div class="api-section">
+            <h2>API Endpoints</h2>
+            <div style="color: #8e8e93; margin-bottom: 15px;">
+                Available backend endpoints for this application
+            </div>
+            
+            <div class="api-endpoint">GET /api/folder=;</div>
+            <div class="api-endpoint">GET /api/folder=./:id;</div>
+            <div class="api-endpoint">PUT /api/folder=./:id;</div>
+            <div class="api-endpoint">POST /api/images;</div>
+            <div class="api-endpoint">PUT /api/folder=./:do;</div>
+            <div class="api-endpoint">PATCH /api/folder=./:do;</div>
+            <div class="api-endpoint">DELETE /api/folder=./:do;</div>
+            <div class="api-endpoint">PUT /api/images=./:do;</div>
+            <div class="api-endpoint">DELETE /api/images=./:do;</div>
+        </div>
+        
+        <div id="statusMessage" class="status-message"></div>
+    `;
+    
+    // Initialize toolbar button states
+    updateToolbarButtons();
+}
+
+// Render images with fast loading
+function renderImagesFast(images) {
+    scheduleProcessingPoll(images);
+    return images.map(renderImageItem).join('');
+}
+
+// "4032×3024 · 3.1 MB" from the metadata the upload job stores
+function imageDetails(image) {
+    const parts = [];
+    if (image.width && image.height) parts.push(`${image.width}×${image.height}`);
+    if (image.byte_size) {
+        parts.push(image.byte_size >= 1048576
+            ? `${(image.byte_size / 1048576).toFixed(1)} MB`
+            : `${Math.max(1, Math.round(image.byte_size / 1024))} KB`);
+    }
+    return parts.join(' · ');
+}
+
+// The ~20px placeholder from the image JSON, scaled up under the <img>
+// until the real thumbnail arrives; no extra request either way
+function imagePlaceholderStyle(image) {
+    const color = `background-color: ${image.dominant_color || '#e5e5e7'};`;
+    return image.placeholder
+        ? `${color} background-image: url(${image.placeholder}); background-size: cover; background-position: center;`
+        : color;
+}
+
+// Local fallback for a thumbnail that failed to load (no external service)
+const BROKEN_IMAGE_SRC = 'data:image/svg+xml,' + encodeURIComponent(
+    '<svg xmlns="http://www.w3.org/2000/svg" width="180" height="120" viewBox="0 0 180 120">' +
+    '<rect width="180" height="120" fill="#e5e5e7"/>' +
+    '<text x="90" y="64" font-family="sans-serif" font-size="13" fill="#8e8e93" text-anchor="middle">Image error</text>' +
+    '</svg>');
+
+function imageLoadFailed(img) {
+    img.onerror = null;
+    img.removeAttribute('srcset');
+    img.src = img.dataset.placeholder || BROKEN_IMAGE_SRC;
+}
+
+function renderImageItem(image) {
+    return image.processing_status === 'pending' ? `
+        <div class="image-item" data-image-id="${image.id}">
+            <div class="image-preview image-placeholder"></div>
+            <div class="image-info">
+                <div class="image-name">${image.filename}</div>
+                <div class="image-date">Processing...</div>
+            </div>
+        </div>
+    ` : `
+        <div class="image-item" data-image-id="${image.id}">
+            <img src="${image.thumb_url || image.url}" class="image-preview" 
+                 ${image.width && image.height ? `width="${image.width}" height="${image.height}"` : ''}
+                 style="${imagePlaceholderStyle(image)}"
+                 data-placeholder="${image.placeholder || ''}"
+                 srcset="${image.srcset || ''}"
+                 sizes="(max-width: 600px) 50vw, 240px"
+                 alt="${image.filename}"
+                 loading="lazy"
+                 onload="this.style.backgroundImage = 'none'"
+                 onerror="imageLoadFailed(this)">
+            <div class="image-info">
+                <div class="image-name">${image.filename}</div>
+                <div class="image-date">
+                    ${new Date(image.taken_at || image.uploaded_at).toLocaleDateString()}
+                </div>
+                <div class="image-date">${imageDetails(image)}</div>
+                <button onclick="showDeleteImageModal(${image.id}, event)" 
+                        style="margin-top: 8px; padding: 4px 8px; background: #ff3b30; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 12px;">
+                    <i class="fas fa-trash"></i> Delete
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+// Re-check the gallery while thumbnails are still being generated;
+// the images endpoint answers 304 until something actually changes
+let processingPollTimer = null;
+function scheduleProcessingPoll(images) {
+    clearTimeout(processingPollTimer);
+    // With live updates the "ready" event patches the tile instead
+    if (liveUpdates) return;
+    if (images.some(image => image.processing_status === 'pending')) {
+        processingPollTimer = setTimeout(refreshImages, 1500);
+    }
+}
+
+// Rich text editor functions
+function formatText(command, value = null) {
+    document.execCommand(command, false, value);
+    document.getElementById('editor').focus();
+    updateToolbarButtons();
+}
+
+function updateToolbarButtons() {
+    const buttons = document.querySelectorAll('.toolbar-btn');
+    buttons.forEach(btn => btn.classList.remove('active'));
+    
+    // Check for bold
+    if (document.queryCommandState('bold')) {
+        document.querySelector('[onclick*="bold"]').classList.add('active');
+    }
+    
+    // Check for italic
+    if (document.queryCommandState('italic')) {
+        document.querySelector('[onclick*="italic"]').classList.add('active');
+    }
+    
+    // Check for underline
+    if (document.queryCommandState('underline')) {
+        document.querySelector('[onclick*="underline"]').classList.add('active');
+    }
+}
+
+// Create new folder
+async function createNewFolder() {
+    const date = prompt('Enter date (YYYY-MM-DD):', new Date().toISOString().split('T')[0]);
+    
+    if (!date) return;
+    
+    try {
+        const response = await fetch('/api/folder=;', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                date: date,
+                notes_html: ''
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            showMessage('New folder created!', 'success');
+            refreshFolders();
+            // Load the new folder
+            setTimeout(() => {
+                loadFolder(data.folder.id);
+            }, 100);
+        } else {
+            showMessage('Error: ' + data.error, 'error');
+        }
+        
+    } catch (error) {
+        console.error('Error creating folder:', error);
+        showMessage('Error creating folder', 'error');
+    }
+}
+
+// Upload image with progress tracking
+async function uploadImage() {
+    if (!currentFolderId) {
+        showMessage('Please select a folder first', 'error');
+        return;
+    }
+    
+    const fileInput = document.getElementById('fileInput');
+    fileInput.onchange = async (e) => {
+        const files = e.target.files;
+        const uploadProgress = document.getElementById('uploadProgress');
+        const progressFill = document.getElementById('progressFill');
+        const uploadStatus = document.getElementById('uploadStatus');
+        
+        // Show progress bar
+        uploadProgress.style.display = 'block';
+        progressFill.style.width = '0%';
+        
+        let uploadedCount = 0;
+        const totalFiles = files.length;
+        let doneFiles = 0;
+        
+        const imageGallery = document.getElementById('imageGallery');
+        const images = [];
+        for (const file of files) {
+            if (!file.type.startsWith('image/')) {
+                showMessage(`Skipping non-image: ${file.name}`, 'error');
+                doneFiles++;
+                continue;
+            }
+            images.push(file);
+            
+            // Show image placeholder immediately
+            const placeholderHtml = `
+                <div class="image-item">
+                    <div class="image-preview image-placeholder"></div>
+                    <div class="image-info">
+                        <div class="image-name">${file.name}</div>
+                        <div class="image-date">Uploading...</div>
+                    </div>
+                </div>
+            `;
+            imageGallery.insertAdjacentHTML('afterbegin', placeholderHtml);
+        }
+        
+        const setProgress = (fraction) => {
+            progressFill.style.width = `${Math.round(fraction * 100)}%`;
+        };
+        
+        // Large originals go up one by one in resumable chunks
+        for (const file of images.filter(f => f.size > CHUNKED_UPLOAD_THRESHOLD)) {
+            uploadStatus.textContent = `Uploading ${file.name}... (${doneFiles + 1}/${totalFiles})`;
+            try {
+                const data = await uploadFileChunked(file, (fraction) => {
+                    setProgress((doneFiles + fraction) / totalFiles);
+                });
+                if (data.success) {
+                    uploadedCount++;
+                } else {
+                    showMessage(`Failed: ${data.error}`, 'error');
+                }
+            } catch (error) {
+                console.error('Upload error:', error);
+                showMessage('Upload failed', 'error');
+            }
+            doneFiles++;
+            setProgress(doneFiles / totalFiles);
+        }
+        
+        // Everything else goes in as few batch requests as fit the size limit
+        for (const batch of makeUploadBatches(images.filter(f => f.size <= CHUNKED_UPLOAD_THRESHOLD))) {
+            uploadStatus.textContent = `Uploading ${batch.length} image(s)... (${doneFiles + batch.length}/${totalFiles})`;
+            
+            const formData = new FormData();
+            batch.forEach(file => formData.append('files', file));
+            formData.append('folder_id', currentFolderId);
+            
+            try {
+                const response = await fetch('/api/images/batch;', {
+                    method: 'POST',
+                    body: formData
+                });
+                const data = await response.json();
+                
+                if (data.success) {
+                    uploadedCount += data.uploaded;
+                    data.results.filter(r => !r.success).forEach(r => {
+                        showMessage(`Failed: ${r.filename}: ${r.error}`, 'error');
+                    });
+                } else {
+                    showMessage(`Failed: ${data.error}`, 'error');
+                }
+            } catch (error) {
+                console.error('Upload error:', error);
+                showMessage('Upload failed', 'error');
+            }
+            doneFiles += batch.length;
+            setProgress(doneFiles / totalFiles);
+        }
+        
+        uploadStatus.textContent = `Upload complete! ${uploadedCount}/${totalFiles} uploaded`;
+        progressFill.style.width = '100%';
+        
+        if (uploadedCount > 0) {
+            // FAST RELOAD: Just the new images, not the whole folder
+            refreshImages();
+        }
+        setTimeout(() => {
+            uploadProgress.style.display = 'none';
+        }, 2000);
+        
+        // Reset file input
+        fileInput.value = '';
+    };
+    
+    fileInput.click();
+}
+
+// Group files into batches that stay under the server's request size limit
+const BATCH_UPLOAD_MAX_BYTES = 12 * 1024 * 1024;
+
+function makeUploadBatches(files) {
+    const batches = [];
+    let batch = [];
+    let batchBytes = 0;
+    for (const file of files) {
+        if (batch.length > 0 && batchBytes + file.size > BATCH_UPLOAD_MAX_BYTES) {
+            batches.push(batch);
+            batch = [];
+            batchBytes = 0;
+        }
+        batch.push(file);
+        batchBytes += file.size;
+    }
+    if (batch.length > 0) batches.push(batch);
+    return batches;
+}
+
+// Resumable upload: create a session, PUT numbered chunks (each retried
+// with backoff), then complete. The server always says which chunk it
+// expects next, so a retry after a lost response just moves on.
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
+async function uploadFileChunked(file, onProgress) {
+    const createResponse = await fetch('/api/uploads;', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            folder_id: currentFolderId,
+            filename: file.name,
+            size: file.size
+        })
+    });
+    const created = await createResponse.json();
+    if (!created.success) return created;
+    
+    const uploadId = created.upload.id;
+    const chunkSize = created.chunk_size;
+    const totalChunks = Math.max(1, Math.ceil(file.size / chunkSize));
+    let index = created.upload.next_chunk;
+    
+    while (index < totalChunks) {
+        const chunk = file.slice(index * chunkSize, (index + 1) * chunkSize);
+        let data = null;
+        for (let attempt = 0; attempt < 5 && !data; attempt++) {
+            try {
+                const response = await fetch(`/api/uploads=./${uploadId}/${index};`, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                    },
+                    body: chunk
+                });
+                data = await response.json();
+            } catch (error) {
+                await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+            }
+        }
+        if (!data) return { success: false, error: 'Upload interrupted' };
+        if (data.next_chunk === undefined) return data;
+        
+        index = data.next_chunk;
+        onProgress(index / totalChunks);
+    }
+    
+    const completeResponse = await fetch(`/api/uploads=./${uploadId}/complete;`, {
+        method: 'POST'
+    });
+    return completeResponse.json();
+}
+
+// FAST: Refresh only images without reloading entire folder
+async function refreshImages() {
+    if (!currentFolderId) return;
+    
+    try {
+        let images;
+        if (await openReplica()) {
+            // Only the upload/delete that just happened comes over the wire
+            await syncChanges();
+            images = await replicaFolderImages(currentFolderId);
+            renderFoldersFromReplica();  // image counts in the sidebar
+        } else {
+            const imagesResponse = await fetch(`/api/folder=./${currentFolderId}/images;`);
+            const imagesData = await imagesResponse.json();
+            images = imagesData.images || [];
+        }
+        
+        // Update only the image gallery
+        const imageGallery = document.getElementById('imageGallery');
+        if (imageGallery) {
+            imageGallery.innerHTML = images.length > 0 ? renderImagesFast(images) : 
+                '<div style="color: #8e8e93; text-align: center; padding: 40px; grid-column: 1/-1;">No images yet</div>';
+        }
+        
+    } catch (error) {
+        console.error('Error refreshing images:', error);
+    }
+}
+
+// Delete image with confirmation modal
+function showDeleteImageModal(imageId, event) {
+    event.stopPropagation();
+    pendingDeleteImageId = imageId;
+    document.getElementById('deleteModal').style.display = 'flex';
+    document.getElementById('modalTitle').textContent = 'Delete Image';
+    document.getElementById('modalMessage').textContent = 'Are you sure you want to delete this image?';
+}
+
+// Delete folder with confirmation modal
+function showDeleteFolderModal(folderId) {
+    pendingDeleteFolderId = folderId;
+    document.getElementById('deleteModal').style.display = 'flex';
+    document.getElementById('modalTitle').textContent = 'Delete Folder';
+    document.getElementById('modalMessage').textContent = 'Are you sure you want to delete this folder? All images and notes will be permanently deleted.';
+}
+
+function closeDeleteModal() {
+    document.getElementById('deleteModal').style.display = 'none';
+    pendingDeleteFolderId = null;
+    pendingDeleteImageId = null;
+}
+
+async function confirmDelete() {
+    if (pendingDeleteImageId) {
+        await deleteImage(pendingDeleteImageId);
+    } else if (pendingDeleteFolderId) {
+        await deleteFolderAction(pendingDeleteFolderId);
+    }
+    closeDeleteModal();
+}
+
+async function deleteImage(imageId) {
+    try {
+        const response = await fetch(`/api/images=./delete;`, {
+            method: 'DELETE',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ id: imageId })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            showMessage('Image deleted!', 'success');
+            // FAST: Refresh only images
+            refreshImages();
+        } else {
+            showMessage('Error: ' + data.error, 'error');
+        }
+        
+    } catch (error) {
+        console.error('Error deleting image:', error);
+        showMessage('Error deleting image', 'error');
+    }
+}
+
+// Clear notes
+function clearNotes() {
+    if (confirm('Clear all notes?')) {
+        document.getElementById('editor').innerHTML = '';
+        document.getElementById('editor').focus();
+    }
+}
+
+// Auto-save notes
+let saveTimeout;
+function autoSave() {
+    clearTimeout(saveTimeout);
+    saveTimeout = setTimeout(() => {
+        saveNotes(currentFolderId, true);
+    }, 2000);
+}
+
+// Last notes the server acknowledged, so saves only send what changed
+let notesState = { folderId: null, revision: 0, html: '' };
+
+function resetNotesState(folder) {
+    notesState = { folderId: folder.id, revision: folder.notes_revision || 0, html: folder.notes_html || '' };
+}
+
+// One splice covering everything between the common prefix and suffix.
+// Offsets are JS string (UTF-16) indices, which is what the server expects.
+function makeNotesPatch(oldText, newText) {
+    const minLength = Math.min(oldText.length, newText.length);
+    let start = 0;
+    while (start < minLength && oldText[start] === newText[start]) start++;
+    let end = 0;
+    while (end < minLength - start &&
+           oldText[oldText.length - 1 - end] === newText[newText.length - 1 - end]) end++;
+    return [{
+        at: start,
+        remove: oldText.length - start - end,
+        insert: newText.slice(start, newText.length - end)
+    }];
+}
+
+// Save notes
+async function saveNotes(folderId, auto = false, overwrite = false) {
+    try {
+        const notes = document.getElementById('editor').innerHTML;
+        
+        if (notesState.folderId === folderId && notes === notesState.html && !overwrite) {
+            if (!auto) showMessage('Notes saved successfully!', 'success');
+            return;
+        }
+        
+        const body = overwrite
+            ? { base_revision: notesState.revision, notes_html: notes }
+            : { base_revision: notesState.revision, patch: makeNotesPatch(notesState.html, notes) };
+        
+        const response = await fetch(`/api/folder=./${folderId}/notes;`, {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(body)
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            // Pasted images come back as urls: adopt the server's copy, and
+            // show it too unless the user kept typing during the save
+            const html = data.notes_html !== undefined ? data.notes_html : notes;
+            const editor = document.getElementById('editor');
+            if (html !== notes && editor.innerHTML === notes) editor.innerHTML = html;
+            notesState = { folderId: folderId, revision: data.notes_revision, html: html };
+            if (!auto) {
+                showMessage('Notes saved successfully!', 'success');
+            }
+        } else if (data.conflict) {
+            // Someone else saved first; never overwrite silently
+            if (confirm('These notes were changed in another window. Overwrite them with your version?')) {
+                notesState.revision = data.notes_revision;
+                await saveNotes(folderId, auto, true);
+            } else {
+                showMessage('Notes not saved: changed elsewhere. Reload the folder to see the latest.', 'error');
+            }
+        } else {
+            showMessage('Error: ' + data.error, 'error');
+        }
+        
+    } catch (error) {
+        console.error('Error saving notes:', error);
+        showMessage('Error saving notes', 'error');
+    }
+}
+
+// Notes history: list revisions, preview one in the editor, restore it
+async function toggleNotesHistory(folderId) {
+    const panel = document.getElementById('notesHistory');
+    if (panel.style.display === 'block') {
+        panel.style.display = 'none';
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/folder=./${folderId}/revisions;?limit=50`);
+        const data = await response.json();
+        if (!data.success) {
+            showMessage('Error: ' + data.error, 'error');
+            return;
+        }
+        
+        panel.innerHTML = data.revisions.length === 0
+            ? '<div style="color: #8e8e93; padding: 10px;">No history yet</div>'
+            : data.revisions.map(rev => `
+                <div class="history-entry">
+                    <span>Revision ${rev.revision} &middot; ${new Date(rev.created_at + 'Z').toLocaleString()}</span>
+                    <span>
+                        <button class="btn" onclick="previewRevision(${folderId}, ${rev.revision})">Preview</button>
+                        <button class="btn btn-save" onclick="restoreRevision(${folderId}, ${rev.revision})">Restore</button>
+                    </span>
+                </div>
+            `).join('');
+        panel.style.display = 'block';
+    } catch (error) {
+        console.error('Error loading history:', error);
+        showMessage('Error loading history', 'error');
+    }
+}
+
+async function previewRevision(folderId, revision) {
+    const response = await fetch(`/api/folder=./${folderId}/revisions=./${revision};`);
+    const data = await response.json();
+    if (data.success) {
+        // Shown only; nothing is saved unless the user edits or restores
+        clearTimeout(saveTimeout);
+        document.getElementById('editor').innerHTML = data.notes_html;
+    }
+}
+
+async function restoreRevision(folderId, revision) {
+    if (!confirm(`Restore notes to revision ${revision}?`)) return;
+    
+    const response = await fetch(`/api/folder=./${folderId}/revisions=./${revision}/restore;`, {
+        method: 'POST'
+    });
+    const data = await response.json();
+    if (data.success) {
+        clearTimeout(saveTimeout);
+        document.getElementById('editor').innerHTML = data.folder.notes_html;
+        resetNotesState(data.folder);
+        document.getElementById('notesHistory').style.display = 'none';
+        showMessage(data.message, 'success');
+    } else {
+        showMessage('Error: ' + data.error, 'error');
+    }
+}
+
+// Delete folder action
+async function deleteFolderAction(folderId) {
+    try {
+        const response = await fetch(`/api/folder=./delete;`, {
+            method: 'DELETE',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ id: folderId })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            showMessage('Folder deleted!', 'success');
+            refreshFolders();
+            
+            // Clear content area
+            document.getElementById('contentArea').innerHTML = `
+                <div style="text-align: center; padding: 60px 20px; color: #8e8e93;">
+                    <i class="fas fa-check-circle" style="font-size: 48px; margin-bottom: 20px;"></i>
+                    <h2>Folder deleted successfully</h2>
+                    <p>Select another folder from the sidebar</p>
+                </div>
+            `;
+        } else {
+            showMessage('Error: ' + data.error, 'error');
+        }
+        
+    } catch (error) {
+        console.error('Error deleting folder:', error);
+        showMessage('Error deleting folder', 'error');
+    }
+}
+
+// Show status message
+function showMessage(message, type = 'success') {
+    const statusDiv = document.getElementById('statusMessage');
+    if (!statusDiv) return;
+    
+    statusDiv.textContent = message;
+    statusDiv.className = `status-message status-${type}`;
+    statusDiv.style.display = 'block';
+    
+    setTimeout(() => {
+        statusDiv.style.display = 'none';
+    }, 3000);
+}
+
+// Keyboard shortcuts for rich text editor
+document.addEventListener('keydown', (e) => {
+    if ((e.ctrlKey || e.metaKey) && document.activeElement.id === 'editor') {
+        switch(e.key.toLowerCase()) {
+            case 'b':
+                e.preventDefault();
+                formatText('bold');
+                break;
+            case 'i':
+                e.preventDefault();
+                formatText('italic');
+                break;
+            case 'u':
+                e.preventDefault();
+                formatText('underline');
+                break;
+            case 'l':
+                e.preventDefault();
+                formatText('justifyLeft');
+                break;
+            case 'e':
+                e.preventDefault();
+                formatText('justifyCenter');
+                break;
+            case 'r':
+                e.preventDefault();
+                formatText('justifyRight');
+                break;
+            case 's':
+                e.preventDefault();
+                if (currentFolderId) saveNotes(currentFolderId);
+                break;
+        }
+    }
+});
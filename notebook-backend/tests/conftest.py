@@ -0,0 +1,57 @@
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# run.py builds the app (and creates its tables) on import; point it at a
+# throwaway database and upload folder before anything imports it
+_data_dir = tempfile.mkdtemp(prefix="notebook-tests-")
+os.environ["NOTEBOOK_DB_PATH"] = os.path.join(_data_dir, "notebook.db")
+os.environ["UPLOAD_FOLDER"] = os.path.join(_data_dir, "uploads")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app():
+    import run
+    return run.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db_session(app):
+    from app import db
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+
+
+@pytest.fixture
+def capture_sql():
+    """Context manager collecting (statement, parameters) for each SQL
+    statement this thread sends, on any engine (writer or reader)."""
+    @contextlib.contextmanager
+    def capture():
+        thread = threading.get_ident()
+        statements = []
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            # The cache warm-up and job workers run on their own threads
+            if threading.get_ident() == thread:
+                statements.append((statement, parameters))
+
+        event.listen(Engine, "before_cursor_execute", on_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, "before_cursor_execute", on_execute)
+    return capture
@@ -0,0 +1,50 @@
+from datetime import date
+
+import pytest
+
+import run
+from app.models import Folder
+
+
+@pytest.fixture
+def two_folders(db_session):
+    """Ids of the folders for 1990-01-01 and 1990-01-02 (the database is shared across tests)."""
+    ids = []
+    for day in (date(1990, 1, 1), date(1990, 1, 2)):
+        folder = Folder.query.filter_by(date=day).first()
+        if folder is None:
+            folder = Folder(date=day)
+            db_session.add(folder)
+            db_session.flush()
+        ids.append(folder.id)
+    db_session.commit()
+    return ids
+
+
+def test_rename_onto_existing_date_is_409(client, two_folders):
+    first, _ = two_folders
+    response = client.put("/api/folder=./rename;", json={"id": first, "new_date": "1990-01-02"})
+    assert response.status_code == 409
+    assert response.get_json()["error"] == "Folder for that date already exists"
+
+
+def test_update_onto_existing_date_is_409(client, two_folders):
+    first, _ = two_folders
+    response = client.put(f"/api/folder=./{first};", json={"date": "1990-01-02"})
+    assert response.status_code == 409
+    # The folder kept its date and the session is usable again
+    assert client.get(f"/api/folder=./{first};").get_json()["date"] == "1990-01-01"
+
+
+def test_rename_race_is_409(client, two_folders, monkeypatch):
+    # Another writer takes the day after the check: the UNIQUE index decides
+    first, _ = two_folders
+    monkeypatch.setattr(run, "date_taken", lambda folder, day: False)
+    response = client.put("/api/folder=./rename;", json={"id": first, "new_date": "1990-01-02"})
+    assert response.status_code == 409
+
+
+def test_rename_to_own_date_is_allowed(client, two_folders):
+    first, _ = two_folders
+    response = client.put("/api/folder=./rename;", json={"id": first, "new_date": "1990-01-01"})
+    assert response.status_code == 200
@@ -0,0 +1,33 @@
+from datetime import date
+
+from app.models import Folder
+
+
+def add_folder(db_session, day):
+    folder = Folder(date=day)
+    db_session.add(folder)
+    db_session.flush()
+    folder_id = folder.id
+    db_session.commit()
+    return folder_id
+
+
+def remove_folder(db_session, folder_id):
+    db_session.delete(db_session.get(Folder, folder_id))
+    db_session.commit()
+
+
+def test_reused_folder_id_does_not_match_old_etag(client, db_session):
+    old_id = add_folder(db_session, date(1980, 1, 1))
+    old_etag = client.get(f"/api/folder=./{old_id};").headers["ETag"]
+    remove_folder(db_session, old_id)
+
+    # SQLite hands the rowid of a deleted newest row to the next insert
+    new_id = add_folder(db_session, date(1980, 1, 2))
+    assert new_id == old_id
+    try:
+        response = client.get(f"/api/folder=./{new_id};", headers={"If-None-Match": old_etag})
+        assert response.status_code == 200
+        assert response.get_json()["date"] == "1980-01-02"
+    finally:
+        remove_folder(db_session, new_id)
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models import Folder, Image
+
+
+def add_folders(session, count, images_per_folder=2):
+    start = date(2000, 1, 1) + timedelta(days=session.query(Folder).count())
+    for offset in range(count):
+        folder = Folder(date=start + timedelta(days=offset))
+        session.add(folder)
+        session.flush()
+        for n in range(images_per_folder):
+            session.add(Image(filename=f"{folder.id}_{n}.jpg", url=f"/uploads/{folder.id}_{n}.jpg",
+                              folder_id=folder.id))
+    session.commit()
+
+
+def list_queries(capture_sql, session, **kwargs):
+    session.expunge_all()
+    with capture_sql() as statements:
+        folders = Folder.list_with_image_counts(**kwargs)
+    return len(statements), folders
+
+
+@pytest.fixture
+def empty_journal(db_session):
+    db_session.query(Image).delete()
+    db_session.query(Folder).delete()
+    db_session.commit()
+    return db_session
+
+
+@pytest.mark.parametrize("summary", [False, True])
+def test_list_with_image_counts_query_count_is_constant(capture_sql, empty_journal, summary):
+    add_folders(empty_journal, 3)
+    small, folders = list_queries(capture_sql, empty_journal, summary=summary)
+    assert len(folders) == 3
+    assert all(folder["image_count"] == 2 for folder in folders)
+
+    add_folders(empty_journal, 297)
+    large, folders = list_queries(capture_sql, empty_journal, summary=summary)
+    assert len(folders) == 300
+    assert all(folder["image_count"] == 2 for folder in folders)
+
+    assert small == large == 1
+
+
+def test_list_with_image_counts_never_loads_images(empty_journal):
+    add_folders(empty_journal, 3)
+    empty_journal.expunge_all()
+    Folder.list_with_image_counts()
+    assert not [obj for obj in empty_journal.identity_map.values() if isinstance(obj, Image)]
+
+
+def test_folder_list_endpoint_query_count_is_constant(client, capture_sql, empty_journal):
+    import run
+
+    def request_queries():
+        run.response_cache.clear()
+        with capture_sql() as statements:
+            response = client.get("/api/folder=;")
+        assert response.status_code == 200
+        return len(statements), response.get_json()["folders"]
+
+    client.get("/api/folder=;")  # first request starts workers / warm-up; not counted
+    add_folders(empty_journal, 3)
+    small, folders = request_queries()
+    assert len(folders) == 3
+
+    add_folders(empty_journal, 297)
+    large, folders = request_queries()
+    assert len(folders) == 300
+    assert small == large
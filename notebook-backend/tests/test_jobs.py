@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Job
+from app.utils.jobs import JobQueue, CLAIM_TIMEOUT
+
+
+def test_start_requeues_only_stale_claims(app, db_session):
+    now = datetime.utcnow()
+    # run_after keeps the app's own workers from claiming them again
+    later = now + timedelta(days=1)
+    stale = Job(kind="test", status="running", run_after=later)
+    live = Job(kind="test", status="running", run_after=later)
+    db_session.add_all([stale, live])
+    db_session.flush()
+    stale_id, live_id = stale.id, live.id
+    db_session.execute(db.update(Job).where(Job.id == stale_id)
+                       .values(updated_at=now - timedelta(seconds=CLAIM_TIMEOUT + 60)))
+    db_session.commit()
+
+    JobQueue(app, workers=0).start()
+    statuses = dict(db_session.query(Job.id, Job.status).filter(Job.id.in_([stale_id, live_id])))
+    assert statuses == {stale_id: "queued", live_id: "running"}
+    db_session.query(Job).filter(Job.id.in_([stale_id, live_id])).delete()
+    db_session.commit()
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from datetime import date
+
+import pytest
+
+from app.models import Folder
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def folder_id(db_session):
+    folder = Folder.query.filter_by(date=date(1992, 1, 1)).first()
+    if folder is None:
+        folder = Folder(date=date(1992, 1, 1))
+        db_session.add(folder)
+        db_session.flush()
+    folder_id = folder.id
+    db_session.commit()
+    return folder_id
+
+
+def revision(client, folder_id):
+    return client.get(f"/api/folder=./{folder_id};").get_json()["notes_revision"]
+
+
+def save(client, folder_id, base, html):
+    return client.patch(f"/api/folder=./{folder_id}/notes;", json={"base_revision": base, "notes_html": html})
+
+
+def test_stale_base_revision_is_409(client, folder_id):
+    base = revision(client, folder_id)
+    assert save(client, folder_id, base, "<p>first</p>").status_code == 200
+    response = save(client, folder_id, base, "<p>second</p>")
+    assert response.status_code == 409
+    assert response.get_json()["notes_revision"] == base + 1
+
+
+def test_unknown_folder_is_404(client):
+    assert save(client, 999999, 0, "<p>x</p>").status_code == 404
+
+
+def test_unchanged_save_keeps_revision(client, folder_id):
+    base = revision(client, folder_id)
+    assert save(client, folder_id, base, "<p>same</p>").status_code == 200
+    response = save(client, folder_id, base + 1, "<p>same</p>")
+    assert response.get_json()["unchanged"] is True
+    assert revision(client, folder_id) == base + 1
+
+
+def test_concurrent_saves_from_two_processes(client, folder_id):
+    """Two server processes PATCH the same base: exactly one wins."""
+    base = revision(client, folder_id)
+    script = textwrap.dedent(f"""
+        import sys, time
+        sys.path.insert(0, {BACKEND_DIR!r})
+        import run
+        client = run.app.test_client()
+        # Start both saves at the same moment
+        time.sleep(max(0, float(sys.argv[1]) - time.time()))
+        response = client.patch("/api/folder=./{folder_id}/notes;",
+                                json={{"base_revision": {base}, "notes_html": sys.argv[2]}})
+        print(response.status_code)
+    """)
+    start = str(time.time() + 3)  # after both have imported run.py
+    procs = [subprocess.Popen([sys.executable, "-c", script, start, f"<p>writer {n}</p>"],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                              cwd=BACKEND_DIR)
+             for n in range(2)]
+    codes = sorted(int(proc.communicate(timeout=60)[0].strip().splitlines()[-1]) for proc in procs)
+    assert codes == [200, 409]
+    assert revision(client, folder_id) == base + 1
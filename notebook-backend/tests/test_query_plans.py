@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models import Folder, Image
+
+GALLERY_INDEX = "ix_images_folder_id_uploaded_at"
+DATE_INDEX = "ix_folders_date"
+
+
+def query_plans(statements, table):
+    """EXPLAIN QUERY PLAN lines of every captured SELECT that reads from table."""
+    plans = []
+    # The session's own connection: the writer pool has just one
+    conn = db.session.connection()
+    for statement, parameters in statements:
+        if not statement.lstrip().upper().startswith("SELECT") or f"FROM {table}" not in statement:
+            continue
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        plans.append(" | ".join(row[-1] for row in rows))
+    assert plans, f"no SELECT from {table} was run"
+    return plans
+
+
+@pytest.fixture
+def folder_id(db_session):
+    folder = Folder.query.filter_by(date=date(2024, 5, 6)).first()
+    if folder is None:
+        folder = Folder(date=date(2024, 5, 6))
+        db_session.add(folder)
+        db_session.flush()
+        for n in range(3):
+            db_session.add(Image(filename=f"plan_{n}.jpg", url=f"/uploads/plan_{n}.jpg", folder_id=folder.id))
+    folder_id = folder.id
+    # Releases the writer connection for the requests under test (an id, not
+    # the instance: touching it after commit would open a transaction again)
+    db_session.commit()
+    return folder_id
+
+
+def test_gallery_query_uses_folder_uploaded_at_index(client, capture_sql, folder_id):
+    with capture_sql() as statements:
+        response = client.get(f"/api/folder=./{folder_id}/images;")
+    assert response.status_code == 200
+    plans = query_plans(statements, "images")
+    assert any(f"USING INDEX {GALLERY_INDEX} (folder_id=?)" in plan for plan in plans), plans
+    # Already in uploaded_at order, no sort step
+    assert not any("TEMP B-TREE" in plan for plan in plans), plans
+
+
+def test_bundle_join_uses_folder_uploaded_at_index(client, capture_sql, folder_id):
+    with capture_sql() as statements:
+        response = client.get(f"/api/folder=./{folder_id}/bundle;")
+    assert response.status_code == 200
+    plans = query_plans(statements, "folders LEFT OUTER JOIN images")
+    assert any(GALLERY_INDEX in plan for plan in plans), plans
+
+
+def test_date_lookup_uses_unique_date_index(db_session, capture_sql, folder_id):
+    with capture_sql() as statements:
+        assert Folder.query.filter_by(date=date(2024, 5, 6)).first() is not None
+    plans = query_plans(statements, "folders")
+    assert any(f"USING INDEX {DATE_INDEX} (date=?)" in plan for plan in plans), plans
+
+
+def test_date_index_is_unique(db_session):
+    indexes = db.session.execute(db.text("PRAGMA index_list(folders)")).mappings().all()
+    assert {index["name"]: index["unique"] for index in indexes}.get(DATE_INDEX) == 1
+
+
+@pytest.mark.parametrize("query", ["year=2024&month=5", "year=2024"])
+def test_month_and_year_listing_is_a_date_range_scan(client, capture_sql, folder_id, query):
+    with capture_sql() as statements:
+        response = client.get(f"/api/folder=;?{query}")
+    assert response.status_code == 200
+    assert [f["id"] for f in response.get_json()["folders"]] == [folder_id]
+    plans = query_plans(statements, "folders")
+    assert any(f"USING INDEX {DATE_INDEX} (date>? AND date<?)" in plan for plan in plans), plans
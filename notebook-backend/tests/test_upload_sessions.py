@@ -0,0 +1,116 @@
+import io
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import run
+from app import db
+from app.models import Folder, UploadSession
+from app.utils.storage_gc import expire_upload_sessions, UPLOAD_SESSION_MAX_AGE
+
+
+@pytest.fixture
+def folder_id(db_session):
+    folder = Folder.query.filter_by(date=datetime(1991, 1, 1).date()).first()
+    if folder is None:
+        folder = Folder(date=datetime(1991, 1, 1).date())
+        db_session.add(folder)
+        db_session.flush()
+    folder_id = folder.id
+    db_session.commit()
+    return folder_id
+
+
+@pytest.mark.parametrize("size", ["10", -1, 1.5, True, [1]])
+def test_create_session_rejects_invalid_size(client, folder_id, size):
+    response = client.post("/api/uploads;", json={"folder_id": folder_id, "filename": "a.jpg", "size": size})
+    assert response.status_code == 400
+
+
+def start_upload(client, folder_id):
+    response = client.post("/api/uploads;", json={"folder_id": folder_id, "filename": "a.jpg", "size": 3})
+    assert response.status_code == 201
+    upload_id = response.get_json()["upload"]["id"]
+    assert client.put(f"/api/uploads=./{upload_id}/0;", data=b"abc").status_code == 200
+    return upload_id
+
+
+def test_stale_sessions_expire_with_their_temp_files(client, db_session, folder_id):
+    stale_id, live_id = start_upload(client, folder_id), start_upload(client, folder_id)
+    stale = db_session.get(UploadSession, stale_id)
+    stale_path, live_path = stale.temp_path, db_session.get(UploadSession, live_id).temp_path
+    idle_since = datetime.utcnow() - timedelta(seconds=UPLOAD_SESSION_MAX_AGE + 60)
+    db_session.execute(db.update(UploadSession).where(UploadSession.id == stale_id)
+                       .values(updated_at=idle_since))
+    db_session.commit()
+
+    assert expire_upload_sessions(run.blob_store) == 1
+    assert db_session.get(UploadSession, stale_id) is None
+    assert not os.path.exists(stale_path)
+    assert db_session.get(UploadSession, live_id) is not None
+    assert os.path.exists(live_path)
+    assert client.delete(f"/api/uploads=./{live_id};").status_code == 200
+
+
+def test_reconcile_keeps_temp_files_of_open_sessions(client, db_session, folder_id):
+    from app.utils.storage_gc import reconcile, TEMP_MAX_AGE
+    upload_id = start_upload(client, folder_id)
+    temp_path = db_session.get(UploadSession, upload_id).temp_path
+    orphan = run.blob_store.new_temp()
+    old = datetime.utcnow().timestamp() - TEMP_MAX_AGE - 60
+    for path in (temp_path, orphan):
+        os.utime(path, (old, old))
+
+    reconcile(run.blob_store)
+    assert os.path.exists(temp_path)
+    assert not os.path.exists(orphan)
+    assert client.delete(f"/api/uploads=./{upload_id};").status_code == 200
+
+
+class SlowBody(io.BytesIO):
+    """Request body that stalls until released, like a client on a slow link."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.release = threading.Event()
+
+    def read(self, size=-1):
+        self.release.wait(10)
+        return super().read(size)
+
+    def readinto(self, buffer):
+        self.release.wait(10)
+        return super().readinto(buffer)
+
+
+def in_thread(app, method, url, **kwargs):
+    """Send a request from its own thread, so it gets its own app context and session."""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(
+        getattr(app.test_client(), method)(url, **kwargs)))
+    thread.start()
+    return thread, results
+
+
+def test_slow_chunk_does_not_hold_the_writer(app, client, db_session, folder_id):
+    response = client.post("/api/uploads;", json={"folder_id": folder_id, "filename": "a.jpg", "size": 3})
+    upload_id = response.get_json()["upload"]["id"]
+    base = client.get(f"/api/folder=./{folder_id};").get_json()["notes_revision"]
+    db_session.close()  # requests from this thread share the test's session
+    body = SlowBody(b"abc")
+    chunk, chunk_results = in_thread(app, "put", f"/api/uploads=./{upload_id}/0;",
+                                     input_stream=body, content_length=3)
+    try:
+        time.sleep(0.2)  # the chunk request is now waiting on its body
+        notes, notes_results = in_thread(app, "patch", f"/api/folder=./{folder_id}/notes;",
+                                         json={"base_revision": base, "notes_html": f"<p>{upload_id}</p>"})
+        notes.join(5)
+        assert notes_results and notes_results[0].status_code == 200
+    finally:
+        body.release.set()
+        chunk.join()
+    assert chunk_results[0].get_json()["next_chunk"] == 1
+    assert client.post(f"/api/uploads=./{upload_id}/complete;").status_code == 200